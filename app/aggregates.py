@@ -0,0 +1,239 @@
+"""
+Running game statistics, maintained as challenges start and finish.
+
+/api/stats and /api/session-stats used to scan every stored challenge or
+download every challenge-events row of a session. Instead, counters are
+updated incrementally: challenges started, challenges finished, successes and
+the sum of successful durations, globally and per session, plus a quantile
+sketch of successful durations for percentiles. Reads are constant time.
+
+Like the challenge store there are two backends: in-process ("memory") and a
+SQLite table shared by all workers ("sqlite"); create_aggregates picks the
+one matching challenge.store.backend. In-process counts start from zero on
+every restart, and both backends forget the least recently active sessions
+beyond max_sessions.
+"""
+
+import os
+import math
+import time
+import sqlite3
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GLOBAL_SCOPE = "global"
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch) with a bounded relative error.
+
+    Values are counted in buckets whose bounds grow by a factor gamma, so any
+    reported quantile is within relative_accuracy of the true value while memory
+    stays at a few hundred buckets for durations from milliseconds to hours.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-3):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+
+    def bucket(self, value: float) -> int:
+        return math.ceil(math.log(max(value, self.min_value)) / self.log_gamma)
+
+    def bucket_value(self, bucket: int) -> float:
+        """Representative value of a bucket (midpoint in relative terms)"""
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def quantile(self, buckets: List[Tuple[int, int]], q: float) -> Optional[float]:
+        """q-quantile (0-1) from (bucket, count) pairs sorted by bucket"""
+        total = sum(count for _, count in buckets)
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen > rank:
+                return self.bucket_value(bucket)
+        return self.bucket_value(buckets[-1][0])
+
+
+class GameAggregates(ABC):
+    """Incrementally maintained challenge counters and duration percentiles"""
+
+    PERCENTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, max_sessions: int = 50000, relative_accuracy: float = 0.01):
+        self.max_sessions = max_sessions
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    @abstractmethod
+    def _add(self, scope: str, started: int, finished: int, successes: int, duration_sum: float) -> None:
+        """Add deltas to a scope's counters, creating it if needed."""
+
+    @abstractmethod
+    def _add_duration(self, bucket: int) -> None:
+        """Count one successful duration in a sketch bucket."""
+
+    @abstractmethod
+    def _get(self, scope: str) -> Dict[str, Any]:
+        """Counters of a scope (zeros if unknown)."""
+
+    @abstractmethod
+    def _buckets(self) -> List[Tuple[int, int]]:
+        """Sketch buckets as sorted (bucket, count) pairs."""
+
+    def record_started(self, session_id: str) -> None:
+        """A challenge was created"""
+        self._add(GLOBAL_SCOPE, 1, 0, 0, 0.0)
+        self._add("session:" + session_id, 1, 0, 0, 0.0)
+
+    def record_finished(self, session_id: str, success: bool, duration: float) -> None:
+        """A challenge was completed (success) or ran out of time (failure)"""
+        duration_sum = duration if success else 0.0
+        self._add(GLOBAL_SCOPE, 0, 1, int(success), duration_sum)
+        self._add("session:" + session_id, 0, 1, int(success), duration_sum)
+        if success:
+            self._add_duration(self.sketch.bucket(duration))
+
+    def global_stats(self) -> Dict[str, Any]:
+        counters = self._get(GLOBAL_SCOPE)
+        buckets = self._buckets()
+        percentiles = {
+            f"p{int(q * 100)}_completion_time": self.sketch.quantile(buckets, q) for q in self.PERCENTILES
+        }
+        return {**counters, **{k: round(v, 2) if v is not None else None for k, v in percentiles.items()}}
+
+    def session_stats(self, session_id: str) -> Dict[str, Any]:
+        return self._get("session:" + session_id)
+
+    def close(self) -> None:
+        """Release resources"""
+
+
+class MemoryAggregates(GameAggregates):
+    """Aggregates for this process only"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # scope -> [started, finished, successes, duration_sum]; sessions in LRU order
+        self._scopes: "OrderedDict[str, List]" = OrderedDict()
+        self._sketch_counts: Dict[int, int] = {}
+
+    def _add(self, scope: str, started: int, finished: int, successes: int, duration_sum: float) -> None:
+        counters = self._scopes.get(scope)
+        if counters is None:
+            counters = self._scopes[scope] = [0, 0, 0, 0.0]
+        counters[0] += started
+        counters[1] += finished
+        counters[2] += successes
+        counters[3] += duration_sum
+        self._scopes.move_to_end(scope)
+        # +1 for the global scope, which is never evicted
+        while len(self._scopes) > self.max_sessions + 1:
+            oldest = next(iter(self._scopes))
+            if oldest == GLOBAL_SCOPE:
+                self._scopes.move_to_end(GLOBAL_SCOPE)
+                continue
+            del self._scopes[oldest]
+
+    def _add_duration(self, bucket: int) -> None:
+        self._sketch_counts[bucket] = self._sketch_counts.get(bucket, 0) + 1
+
+    def _get(self, scope: str) -> Dict[str, Any]:
+        return counters_dict(self._scopes.get(scope, [0, 0, 0, 0.0]))
+
+    def _buckets(self) -> List[Tuple[int, int]]:
+        return sorted(self._sketch_counts.items())
+
+
+class SQLiteAggregates(GameAggregates):
+    """Aggregates in SQLite, shared by all worker processes (same file as the challenge store)"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS aggregates (
+            scope TEXT PRIMARY KEY,
+            started INTEGER NOT NULL DEFAULT 0,
+            finished INTEGER NOT NULL DEFAULT 0,
+            successes INTEGER NOT NULL DEFAULT 0,
+            duration_sum REAL NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS aggregates_updated ON aggregates (updated_at);
+        CREATE TABLE IF NOT EXISTS duration_sketch (
+            bucket INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = ".cache/challenges.sqlite3", **kwargs):
+        super().__init__(**kwargs)
+        self.path = path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._since_prune = 0
+
+    def _add(self, scope: str, started: int, finished: int, successes: int, duration_sum: float) -> None:
+        # Counting session rows on every update would be a table scan; prune periodically
+        self._since_prune += 1
+        if self._since_prune >= 1000:
+            self._since_prune = 0
+            self._prune()
+        self._conn.execute(
+            "INSERT INTO aggregates VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(scope) DO UPDATE SET "
+            "started = started + excluded.started, finished = finished + excluded.finished, "
+            "successes = successes + excluded.successes, duration_sum = duration_sum + excluded.duration_sum, "
+            "updated_at = excluded.updated_at",
+            (scope, started, finished, successes, duration_sum, time.time())
+        )
+
+    def _add_duration(self, bucket: int) -> None:
+        self._conn.execute(
+            "INSERT INTO duration_sketch VALUES (?, 1) ON CONFLICT(bucket) DO UPDATE SET count = count + 1",
+            (bucket,)
+        )
+
+    def _get(self, scope: str) -> Dict[str, Any]:
+        row = self._conn.execute(
+            "SELECT started, finished, successes, duration_sum FROM aggregates WHERE scope = ?", (scope,)
+        ).fetchone()
+        return counters_dict(row or (0, 0, 0, 0.0))
+
+    def _buckets(self) -> List[Tuple[int, int]]:
+        return self._conn.execute("SELECT bucket, count FROM duration_sketch ORDER BY bucket").fetchall()
+
+    def _prune(self) -> None:
+        """Keep only the most recently updated max_sessions session rows"""
+        self._conn.execute(
+            "DELETE FROM aggregates WHERE scope IN (SELECT scope FROM aggregates WHERE scope != ? "
+            "ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (GLOBAL_SCOPE, self.max_sessions)
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def counters_dict(counters) -> Dict[str, Any]:
+    """Public view of (started, finished, successes, duration_sum)"""
+    started, finished, successes, duration_sum = counters
+    return {
+        "started": started,
+        "finished": finished,
+        "successes": successes,
+        "average_duration": duration_sum / successes if successes else 0.0
+    }
+
+
+def create_aggregates(store_config: Dict, config: Dict) -> GameAggregates:
+    """Build aggregates matching the challenge store backend (challenge.store in config.yaml)."""
+    if store_config.get("backend", "memory") == "sqlite":
+        return SQLiteAggregates(path=store_config.get("path", ".cache/challenges.sqlite3"), **config)
+    return MemoryAggregates(**config)
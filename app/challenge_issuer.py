@@ -0,0 +1,77 @@
+"""
+Choosing the items a session plays and how its challenges are scored.
+
+Each session draws from a shuffled deck of the catalog (optionally only one
+difficulty), so no item repeats until every item has been played, and a new
+deck never starts with the item that ended the previous one. Decks are kept
+per worker process; with several workers a session can occasionally see an
+item again sooner.
+
+challenge.difficulty_levels scales each item's time limit (time_multiplier,
+kept within challenge.time.min_duration..max_duration) and the points its
+match earns (points_multiplier).
+"""
+
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from .challenge_store import LRUDict
+
+
+class ChallengeIssuer:
+    """Per-session no-repeat item decks and per-difficulty time limits and points"""
+
+    def __init__(self, items: List[Dict], difficulty_levels: Dict[str, Dict[str, float]], default_duration: int,
+                 min_duration: int, max_duration: int, max_sessions: int = 50000):
+        self.items = items
+        self.difficulty_levels = difficulty_levels
+        self.default_duration = default_duration
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        # (session_id, difficulty or None) -> items left in the current deck, next one last
+        self._decks: Dict[Tuple[str, Optional[str]], List[Dict]] = LRUDict(max_sessions)
+        # session_id -> id of the last item issued
+        self._last: Dict[str, int] = LRUDict(max_sessions)
+        self.issued = 0
+        self.reshuffles = 0
+
+    def difficulties(self) -> List[str]:
+        return sorted({item["difficulty"] for item in self.items})
+
+    def time_limit(self, item: Dict) -> int:
+        multiplier = self.difficulty_levels.get(item["difficulty"], {}).get("time_multiplier", 1.0)
+        return min(self.max_duration, max(self.min_duration, round(self.default_duration * multiplier)))
+
+    def points_multiplier(self, item: Dict) -> float:
+        return self.difficulty_levels.get(item["difficulty"], {}).get("points_multiplier", 1.0)
+
+    def _shuffled(self, difficulty: Optional[str], last_id: Optional[int]) -> List[Dict]:
+        deck = [item for item in self.items if difficulty is None or item["difficulty"] == difficulty]
+        random.shuffle(deck)
+        # The deck is popped from the end: don't open it with the item just played
+        if len(deck) > 1 and deck[-1]["id"] == last_id:
+            deck[0], deck[-1] = deck[-1], deck[0]
+        self.reshuffles += 1
+        return deck
+
+    def next_items(self, session_id: str, count: int = 1, difficulty: Optional[str] = None) -> List[Dict]:
+        """
+        The next count items for the session (raises ValueError for a difficulty no item has).
+        """
+        if difficulty is not None and difficulty not in self.difficulties():
+            raise ValueError(f"Unknown difficulty '{difficulty}' (one of: {', '.join(self.difficulties())})")
+        key = (session_id, difficulty)
+        deck = self._decks.get(key) or []
+        issued = []
+        for _ in range(count):
+            if not deck:
+                deck = self._shuffled(difficulty, self._last.get(session_id))
+            item = deck.pop()
+            self._last[session_id] = item["id"]
+            issued.append(item)
+        self._decks[key] = deck
+        self.issued += len(issued)
+        return issued
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sessions": len(self._last), "items_issued": self.issued, "reshuffles": self.reshuffles}
@@ -0,0 +1,379 @@
+"""
+Storage for live challenges and the user -> session mapping.
+
+Challenges are only needed until they run out (plus a grace period for late
+status polls), so a background sweeper removes them after
+start_time + time_limit + grace_period, and a hard capacity evicts the oldest
+entries if the sweeper cannot keep up. Memory therefore stays flat no matter
+how long the process runs.
+
+Two backends are available, selected by challenge.store.backend:
+
+- "memory": a dict in this process. Only correct with a single uvicorn worker.
+- "sqlite": a SQLite database in WAL mode shared by every worker process on
+  the machine, so a challenge created by one worker can be answered by another.
+
+Completing a challenge is a compare-and-set (complete()), so two photos for
+the same challenge resolving at once can only award it once, in either backend.
+Prefetched challenges are stored unstarted and start_challenge() (also a
+compare-and-set) begins their clock. A player may only reach the last of a
+prefetched batch after playing the others, so until they start they are kept
+for unstarted_ttl seconds after being issued instead.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+from .models import ChallengeRecord
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LRUDict(OrderedDict):
+    """Dict that forgets its least recently written keys beyond max_entries"""
+
+    def __init__(self, max_entries: int):
+        super().__init__()
+        self.max_entries = max_entries
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.max_entries:
+            self.popitem(last=False)
+
+
+class ChallengeStore(ABC):
+    """Bounded, TTL-evicting store of ChallengeRecords keyed by challenge id"""
+
+    backend = "base"
+
+    def __init__(self, capacity: int = 50000, grace_period: float = 300, sweep_interval: float = 30,
+                 max_sessions: int = 50000, unstarted_ttl: float = 3600):
+        self.capacity = capacity
+        self.grace_period = grace_period
+        self.unstarted_ttl = unstarted_ttl
+        self.sweep_interval = sweep_interval
+        self.max_sessions = max_sessions
+        self._sweeper: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.evicted = 0
+
+    @abstractmethod
+    def add(self, record: ChallengeRecord) -> None:
+        """Store a new challenge, evicting the oldest ones if over capacity."""
+
+    @abstractmethod
+    def get(self, challenge_id: str) -> Optional[ChallengeRecord]:
+        """Return a snapshot of the challenge, or None if unknown or swept."""
+
+    @abstractmethod
+    def complete(self, challenge_id: str, success: bool, completed_at: Optional[float] = None) -> bool:
+        """
+        Mark the challenge completed if it is not already (compare-and-set).
+
+        Returns True only for the caller that made the transition.
+        """
+
+    @abstractmethod
+    def start_challenge(self, challenge_id: str, now: Optional[float] = None) -> Optional[ChallengeRecord]:
+        """
+        Start the clock of an unstarted challenge (compare-and-set).
+
+        Returns the started challenge only for the caller that made the transition.
+        """
+
+    @abstractmethod
+    def open_challenges(self, session_id: str, now: Optional[float] = None) -> List[ChallengeRecord]:
+        """Started challenges of a session that are neither completed nor out of time, oldest first."""
+
+    @abstractmethod
+    def values(self) -> Iterator[ChallengeRecord]:
+        """Snapshot of all stored challenges"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def remember_session(self, user_id: str, session_id: str) -> None:
+        """Record the current session of a user (dev reference only)."""
+
+    @abstractmethod
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Remove challenges past their time limit plus the grace period, and unstarted
+        ones issued more than unstarted_ttl ago; returns how many.
+        """
+
+    def expires_at(self, record: ChallengeRecord) -> float:
+        """When the sweeper may remove the challenge"""
+        if record.started:
+            return record.deadline + self.grace_period
+        return record.start_time + self.unstarted_ttl
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+
+    async def start(self) -> None:
+        """Start the background sweeper (called from the app lifespan)."""
+        self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "live_challenges": len(self),
+            "capacity": self.capacity,
+            "expired": self.expired,
+            "evicted": self.evicted
+        }
+
+
+class MemoryChallengeStore(ChallengeStore):
+    """Challenges held in this process (single worker only)"""
+
+    backend = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Insertion order is creation order, so the oldest challenge is always first
+        self._challenges: "OrderedDict[str, ChallengeRecord]" = OrderedDict()
+        # session_id -> ids of its stored challenges (in creation order)
+        self._by_session: Dict[str, Dict[str, None]] = {}
+        # user_id -> {"session_id": ...}
+        self.sessions: LRUDict = LRUDict(self.max_sessions)
+
+    def add(self, record: ChallengeRecord) -> None:
+        self._challenges[record.challenge_id] = record
+        self._by_session.setdefault(record.session_id, {})[record.challenge_id] = None
+        while len(self._challenges) > self.capacity:
+            _, evicted = self._challenges.popitem(last=False)
+            self._unindex(evicted)
+            self.evicted += 1
+
+    def _unindex(self, record: ChallengeRecord) -> None:
+        challenge_ids = self._by_session.get(record.session_id)
+        if challenge_ids is not None:
+            challenge_ids.pop(record.challenge_id, None)
+            if not challenge_ids:
+                del self._by_session[record.session_id]
+
+    def get(self, challenge_id: str) -> Optional[ChallengeRecord]:
+        return self._challenges.get(challenge_id)
+
+    def complete(self, challenge_id: str, success: bool, completed_at: Optional[float] = None) -> bool:
+        record = self._challenges.get(challenge_id)
+        if record is None or record.completed:
+            return False
+        record.completed = True
+        record.success = success
+        record.completed_at = time.time() if completed_at is None else completed_at
+        return True
+
+    def start_challenge(self, challenge_id: str, now: Optional[float] = None) -> Optional[ChallengeRecord]:
+        record = self._challenges.get(challenge_id)
+        if record is None or record.started:
+            return None
+        record.started = True
+        record.start_time = time.time() if now is None else now
+        return record
+
+    def open_challenges(self, session_id: str, now: Optional[float] = None) -> List[ChallengeRecord]:
+        now = time.time() if now is None else now
+        records = (self._challenges.get(challenge_id) for challenge_id in self._by_session.get(session_id, ()))
+        return [
+            record for record in records
+            if record is not None and record.started and not record.completed and record.deadline >= now
+        ]
+
+    def values(self) -> Iterator[ChallengeRecord]:
+        return iter(list(self._challenges.values()))
+
+    def __len__(self) -> int:
+        return len(self._challenges)
+
+    def remember_session(self, user_id: str, session_id: str) -> None:
+        self.sessions[user_id] = {"session_id": session_id}
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        expired_ids = [
+            challenge_id for challenge_id, record in self._challenges.items()
+            if self.expires_at(record) < now
+        ]
+        for challenge_id in expired_ids:
+            self._unindex(self._challenges.pop(challenge_id))
+        self.expired += len(expired_ids)
+        return len(expired_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "sessions": len(self.sessions)}
+
+
+class SQLiteChallengeStore(ChallengeStore):
+    """
+    Challenges in a SQLite database in WAL mode, shared by all worker processes.
+
+    Every statement is a single short transaction on local disk (tens of
+    microseconds), so calls are made directly from the event loop.
+    """
+
+    backend = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS challenges (
+            challenge_id TEXT PRIMARY KEY,
+            item TEXT NOT NULL,
+            start_time REAL NOT NULL,
+            time_limit INTEGER NOT NULL,
+            user_id TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0,
+            success INTEGER NOT NULL DEFAULT 0,
+            completed_at REAL,
+            started INTEGER NOT NULL DEFAULT 1
+        );
+        CREATE INDEX IF NOT EXISTS challenges_expiry ON challenges (start_time);
+        CREATE INDEX IF NOT EXISTS challenges_session ON challenges (session_id, completed);
+        CREATE TABLE IF NOT EXISTS user_sessions (
+            user_id TEXT PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = ".cache/challenges.sqlite3", **kwargs):
+        super().__init__(**kwargs)
+        self.path = path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        # Databases created before prefetching have no started column (all their challenges are started)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(challenges)")}
+        if "started" not in columns:
+            self._conn.execute("ALTER TABLE challenges ADD COLUMN started INTEGER NOT NULL DEFAULT 1")
+        self._since_capacity_check = 0
+
+    @staticmethod
+    def _record(row) -> ChallengeRecord:
+        return ChallengeRecord(
+            challenge_id=row[0],
+            item=json.loads(row[1]),
+            start_time=row[2],
+            time_limit=row[3],
+            user_id=row[4],
+            session_id=row[5],
+            completed=bool(row[6]),
+            success=bool(row[7]),
+            completed_at=row[8],
+            started=bool(row[9])
+        )
+
+    def add(self, record: ChallengeRecord) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO challenges VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (record.challenge_id, json.dumps(record.item), record.start_time, record.time_limit,
+             record.user_id, record.session_id, int(record.completed), int(record.success), record.completed_at,
+             int(record.started))
+        )
+        # Counting rows on every insert would be a table scan; check capacity periodically
+        self._since_capacity_check += 1
+        if self._since_capacity_check >= 100:
+            self._since_capacity_check = 0
+            self._enforce_capacity()
+
+    def _enforce_capacity(self) -> None:
+        excess = len(self) - self.capacity
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM challenges WHERE rowid IN (SELECT rowid FROM challenges ORDER BY start_time LIMIT ?)",
+                (excess,)
+            )
+            self.evicted += excess
+
+    def get(self, challenge_id: str) -> Optional[ChallengeRecord]:
+        row = self._conn.execute("SELECT * FROM challenges WHERE challenge_id = ?", (challenge_id,)).fetchone()
+        return self._record(row) if row else None
+
+    def complete(self, challenge_id: str, success: bool, completed_at: Optional[float] = None) -> bool:
+        cursor = self._conn.execute(
+            "UPDATE challenges SET completed = 1, success = ?, completed_at = ? "
+            "WHERE challenge_id = ? AND completed = 0",
+            (int(success), time.time() if completed_at is None else completed_at, challenge_id)
+        )
+        return cursor.rowcount == 1
+
+    def start_challenge(self, challenge_id: str, now: Optional[float] = None) -> Optional[ChallengeRecord]:
+        cursor = self._conn.execute(
+            "UPDATE challenges SET started = 1, start_time = ? WHERE challenge_id = ? AND started = 0",
+            (time.time() if now is None else now, challenge_id)
+        )
+        return self.get(challenge_id) if cursor.rowcount == 1 else None
+
+    def open_challenges(self, session_id: str, now: Optional[float] = None) -> List[ChallengeRecord]:
+        rows = self._conn.execute(
+            "SELECT * FROM challenges WHERE session_id = ? AND completed = 0 AND started = 1 "
+            "AND start_time + time_limit >= ? ORDER BY start_time",
+            (session_id, time.time() if now is None else now)
+        )
+        return [self._record(row) for row in rows]
+
+    def values(self) -> Iterator[ChallengeRecord]:
+        return iter([self._record(row) for row in self._conn.execute("SELECT * FROM challenges")])
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM challenges").fetchone()[0]
+
+    def remember_session(self, user_id: str, session_id: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO user_sessions VALUES (?, ?, ?)", (user_id, session_id, time.time())
+        )
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        removed = self._conn.execute(
+            "DELETE FROM challenges WHERE (started = 1 AND start_time + time_limit + ? < ?) "
+            "OR (started = 0 AND start_time + ? < ?)",
+            (self.grace_period, now, self.unstarted_ttl, now)
+        ).rowcount
+        # Keep only the most recently used max_sessions user -> session mappings
+        self._conn.execute(
+            "DELETE FROM user_sessions WHERE user_id IN "
+            "(SELECT user_id FROM user_sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,)
+        )
+        self._enforce_capacity()
+        self.expired += removed
+        return removed
+
+    async def stop(self) -> None:
+        await super().stop()
+        self._conn.close()
+
+
+def create_challenge_store(config: Dict) -> ChallengeStore:
+    """Build the store configured under challenge.store ("memory" or "sqlite" backend)."""
+    options = dict(config)
+    backend = options.pop("backend", "memory")
+    if backend == "memory":
+        options.pop("path", None)
+        return MemoryChallengeStore(**options)
+    if backend == "sqlite":
+        return SQLiteChallengeStore(**options)
+    raise ValueError(f"Unknown challenge.store.backend: {backend}")
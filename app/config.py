@@ -1,10 +1,155 @@
+"""
+Application configuration, loaded once from config.yaml.
+
+The file is read from the project root (or CONFIG_PATH) rather than the
+working directory, and validated into typed Settings the first time it is
+needed. CONFIG is the validated data as a plain dict, for the existing
+CONFIG["section"]["key"] lookups; SETTINGS is the typed view. Unknown keys
+are kept, so an option can be added to config.yaml before it gets a field.
+"""
+
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Literal, Optional
+
 import yaml
-from typing import Dict, Any
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.environ.get("CONFIG_PATH") or os.path.join(PROJECT_ROOT, "config.yaml")
+
+
+class Section(BaseModel):
+    """A config.yaml section: typed known keys, other keys passed through"""
+
+    model_config = ConfigDict(extra="allow")
+
+
+class AppSettings(Section):
+    title: str
+    description: str = ""
+    version: str
+    debug: bool = False
+    host: str = "0.0.0.0"
+    port: int = Field(8000, gt=0, lt=65536)
+    workers: int = Field(1, ge=1)
+
+
+class LoggingSettings(Section):
+    level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "INFO"
+    format: Literal["text", "json"] = "text"
+
+
+class PointsSettings(Section):
+    max_per_challenge: int = Field(gt=0)
+    goal: int = Field(gt=0)
+    time_multiplier: float = Field(ge=0, le=1)
+
+
+class TimeSettings(Section):
+    default_duration: int = Field(gt=0)
+    min_duration: int = Field(gt=0)
+    max_duration: int = Field(gt=0)
+
+    @model_validator(mode="after")
+    def check_order(self) -> "TimeSettings":
+        if not self.min_duration <= self.default_duration <= self.max_duration:
+            raise ValueError("need min_duration <= default_duration <= max_duration")
+        return self
+
+
+class StoreSettings(Section):
+    backend: Literal["memory", "sqlite"] = "memory"
+
+
+class IssuanceSettings(Section):
+    max_batch: int = Field(5, ge=1)
+
+
+class DifficultyLevel(Section):
+    time_multiplier: float = Field(1.0, gt=0)
+    points_multiplier: float = Field(1.0, ge=0)
+
+
+class ChallengeSettings(Section):
+    points: PointsSettings
+    time: TimeSettings
+    store: StoreSettings = StoreSettings()
+    issuance: IssuanceSettings = IssuanceSettings()
+    difficulty_levels: Dict[str, DifficultyLevel] = {}
+
+
+class ContentPaths(Section):
+    images_dir: str
+    static_dir: str
+
+
+class Item(Section):
+    id: int
+    name: str
+    image: str
+    difficulty: str = "medium"
+
+
+class VariantSettings(Section):
+    output_dir: str = "app/static/variants"
+    url_prefix: str = "/static/variants"
+    widths: List[int] = Field([320, 640], min_length=1)
+    formats: List[Literal["webp", "jpeg"]] = Field(["webp", "jpeg"], min_length=1)
+    quality: int = Field(75, ge=1, le=100)
+    static_max_age: int = Field(3600, ge=0)
+
+    @field_validator("widths")
+    @classmethod
+    def positive_widths(cls, widths: List[int]) -> List[int]:
+        if any(width <= 0 for width in widths):
+            raise ValueError("content.variants.widths must be positive")
+        return widths
+
+
+class ContentSettings(Section):
+    paths: ContentPaths
+    items: List[Item] = Field(min_length=1)
+    variants: VariantSettings = VariantSettings()
+
+    @field_validator("items")
+    @classmethod
+    def unique_ids(cls, items: List[Item]) -> List[Item]:
+        if len({item.id for item in items}) != len(items):
+            raise ValueError("content.items ids must be unique")
+        return items
+
+
+class ImageRecognitionSettings(Section):
+    confidence_threshold: float = Field(0.7, ge=0, le=1)
+    timeout: float = Field(5, gt=0)
+    backend: Literal["openai", "local", "cascade"] = "openai"
+
+
+class Settings(Section):
+    app: AppSettings
+    logging: LoggingSettings = LoggingSettings()
+    challenge: ChallengeSettings
+    content: ContentSettings
+    image_recognition: ImageRecognitionSettings = ImageRecognitionSettings()
+    database: Dict[str, Any] = {}
+    ui: Dict[str, Any] = {}
+    profiling: Dict[str, Any] = {}
+    offline: Dict[str, Any] = {}
+
+
+@lru_cache(maxsize=None)
+def load_settings(path: Optional[str] = None) -> Settings:
+    """Parse and validate config.yaml (once per path; raises pydantic.ValidationError)"""
+    with open(path or CONFIG_PATH, "r") as config_file:
+        return Settings.model_validate(yaml.safe_load(config_file))
+
 
 def load_config() -> Dict[str, Any]:
     """Load configuration from config.yaml"""
-    with open("config.yaml", "r") as config_file:
-        return yaml.safe_load(config_file)
+    return load_settings().model_dump()
+
 
 # Global config instance
-CONFIG = load_config() 
\ No newline at end of file
+SETTINGS = load_settings()
+CONFIG = SETTINGS.model_dump()
@@ -0,0 +1,169 @@
+"""
+Async data-access layer for Supabase.
+
+The sync supabase client blocked the event loop on every query, so one slow
+database round trip stalled every other request. SupabaseDatabase wraps the
+async client instead, backed by one keep-alive connection pool shared by all
+queries, and bounds every call with a timeout. It is created at import but
+only connects in the app lifespan (start/stop); routes use the shared instance
+from supabase_client.py. With backend "memory" or
+"sqlite" it talks to the local OfflineDatabaseClient instead (see offline.py).
+"""
+
+import time
+import asyncio
+import sqlite3
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import httpx
+
+if TYPE_CHECKING:
+    from supabase import AsyncClient
+
+from .metrics import STAGE_SECONDS
+from .offline import OfflineDatabaseClient
+from .resilience import LatencyTracker
+
+# PostgREST connection/pool errors, and SQLSTATE classes worth retrying: connection exception,
+# transaction rollback (deadlock, serialization), insufficient resources, operator intervention
+# (statement timeout, shutdown) and system error
+TRANSIENT_POSTGREST_CODES = ("PGRST000", "PGRST001", "PGRST002", "PGRST003")
+TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57", "58")
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Whether a failed database call may succeed if retried: timeouts, connection
+    errors and 5xx responses. Constraint and validation errors are not.
+    """
+    if isinstance(error, (TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(error, sqlite3.OperationalError):
+        return "locked" in str(error) or "busy" in str(error)
+    # postgrest.APIError carries the SQLSTATE / PostgREST code, or the HTTP status for a non-JSON reply
+    code = str(getattr(error, "code", None) or "")
+    if len(code) == 3:
+        return code.startswith("5")
+    if len(code) == 5:
+        return code[:2] in TRANSIENT_SQLSTATE_CLASSES
+    return code in TRANSIENT_POSTGREST_CODES
+
+
+class SupabaseDatabase:
+    """Pooled async Supabase client with per-call timeouts"""
+
+    def __init__(self, url: Optional[str], key: Optional[str], timeout: float = 5.0, max_connections: int = 20,
+                 max_keepalive_connections: int = 10, keepalive_expiry: float = 30, backend: str = "supabase",
+                 offline_options: Optional[Dict] = None):
+        self.url = url
+        self.key = key
+        self.backend = backend
+        self.offline_options = offline_options or {}
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self._http: Optional[httpx.AsyncClient] = None
+        self._client: Optional["AsyncClient"] = None
+        self._offline: Optional[OfflineDatabaseClient] = None
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    async def start(self) -> None:
+        """Open the connection pool (called from the app lifespan)."""
+        if self.backend in ("memory", "sqlite"):
+            path = ":memory:"
+            if self.backend == "sqlite":
+                path = self.offline_options.get("path", ".cache/offline_db.sqlite3")
+            self._offline = OfflineDatabaseClient(path, self.offline_options.get("latency"))
+            self._client = self._offline
+            return
+        # Imported here: the supabase package is slow to import and unused offline
+        from supabase import AsyncClientOptions, acreate_client
+
+        # Hard cap slightly above the per-call deadline so asyncio.wait_for reports the timeout
+        self._http = httpx.AsyncClient(limits=self.limits, timeout=self.timeout + 1)
+        self._client = await acreate_client(
+            self.url, self.key, options=AsyncClientOptions(httpx_client=self._http)
+        )
+
+    async def stop(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+        if self._offline is not None:
+            self._offline.close()
+        self._offline = None
+        self._http = None
+        self._client = None
+
+    @property
+    def client(self) -> "AsyncClient":
+        if self._client is None:
+            raise RuntimeError("Database not started; it is opened in the app lifespan")
+        return self._client
+
+    def table(self, name: str):
+        """Query builder for a table; run it with execute()"""
+        return self.client.table(name)
+
+    async def execute(self, query, timeout: Optional[float] = None):
+        """Run a query builder with a deadline (raises TimeoutError when exceeded)."""
+        self.calls += 1
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(query.execute(), timeout=timeout or self.timeout)
+        except TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            self.latency.record(elapsed)
+            STAGE_SECONDS.labels("db_query").observe(elapsed)
+
+    async def insert(self, table: str, rows: Any, timeout: Optional[float] = None,
+                     on_conflict: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Insert one row (dict) or many (list of dicts). With on_conflict (a unique
+        column), rows whose key already exists are skipped (ON CONFLICT DO NOTHING).
+        """
+        if on_conflict:
+            query = self.table(table).upsert(rows, on_conflict=on_conflict, ignore_duplicates=True)
+        else:
+            query = self.table(table).insert(rows)
+        result = await self.execute(query, timeout)
+        return result.data
+
+    async def select(self, table: str, columns: str = "*", filters: Optional[Dict[str, Any]] = None,
+                     timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Rows of `table` whose columns equal the given filter values"""
+        query = self.table(table).select(columns)
+        for column, value in (filters or {}).items():
+            query = query.eq(column, value)
+        result = await self.execute(query, timeout)
+        return result.data
+
+    async def update(self, table: str, values: Dict[str, Any], filters: Dict[str, Any],
+                     timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        query = self.table(table).update(values)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        result = await self.execute(query, timeout)
+        return result.data
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "connected": self._client is not None,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "latency_seconds_p50": self.latency.percentile(50),
+            "latency_seconds_p95": self.latency.percentile(95)
+        }
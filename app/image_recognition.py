@@ -11,178 +11,997 @@ or use a pre-trained model with TensorFlow/PyTorch.
 For now, we'll implement a simple simulated version.
 """
 
-import io
-import random
-import yaml
 import os
 import base64
 import json
-from typing import Dict, Tuple, List
-from PIL import Image
-import numpy as np
-from PIL import Image
-import requests
+import time
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Dict, Tuple, List, Optional
+import httpx
+
+from .config import CONFIG
+from .preprocessing import PreprocessedImage, preprocess_image, preprocess_image_async
+from .recognition_cache import RecognitionCache
+from .recognition_backends import RecognitionBackend, CascadeBackend
+from .micro_batcher import MicroBatcher
+from .resilience import CircuitBreaker, CircuitOpenError, HedgeStats, LatencyTracker, hedged
+from .offline import ReplayVisionClient, SyncReplayVisionClient, VisionRecorder, offline_setting
+from .metrics import (
+    VISION_CALL_SECONDS, VISION_IN_FLIGHT, record_token_usage, register_stats, time_stage
+)
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
 load_dotenv()
 
-# Use OpenAI API instead of CLIP
-from openai import OpenAI
+# Use OpenAI API instead of CLIP (the SDK is imported on first use, it is slow to import)
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
 
-# Initialize OpenAI client
-client = OpenAI()  # Uses OPENAI_API_KEY environment variable
-
-# Load configuration from config.yaml relative to project root
-CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.yaml')
-def load_config():
-    with open(CONFIG_PATH, 'r') as f:
-        return yaml.safe_load(f)
-CONFIG = load_config()
 IMGREC_CONFIG = CONFIG.get('image_recognition', {})
 POINTS_CONFIG = CONFIG.get('challenge', {}).get('points', {})
+MODELS_CONFIG = IMGREC_CONFIG.get('models', {})
+# Cheapest model first; later tiers are only asked when an earlier answer is uncertain
+MODEL_TIERS: List[Dict] = MODELS_CONFIG.get('tiers') or [{'name': IMGREC_CONFIG.get('model', 'gpt-4o'), 'max_tokens': 300}]
+UNCERTAINTY_BAND = MODELS_CONFIG.get('uncertainty_band', 0.15)
+PREPROCESS_CONFIG = IMGREC_CONFIG.get('preprocessing', {})
+CACHE_CONFIG = IMGREC_CONFIG.get('cache', {})
+QUALITY_CONFIG = IMGREC_CONFIG.get('quality_gate', {})
+LOCAL_CONFIG = IMGREC_CONFIG.get('local', {})
+RESILIENCE_CONFIG = IMGREC_CONFIG.get('resilience', {})
+SWEEP_CONFIG = IMGREC_CONFIG.get('sweep', {})
+BATCH_CONFIG = IMGREC_CONFIG.get('batching', {})
+HEDGE_CONFIG = RESILIENCE_CONFIG.get('hedge', {})
+VISION_TIMEOUT = IMGREC_CONFIG.get('timeout', 5)
+OFFLINE_CONFIG = CONFIG.get('offline', {})
+# "openai", or "replay" to answer from recorded responses without network (see offline.py)
+VISION_BACKEND = offline_setting(CONFIG, 'vision', 'VISION_BACKEND', 'openai')
 
+# Real vision responses are appended here for later replay when recording is on
+vision_recorder: Optional[VisionRecorder] = None
+if VISION_BACKEND == 'openai' and (os.getenv('VISION_RECORD') or OFFLINE_CONFIG.get('record', False)):
+    vision_recorder = VisionRecorder(OFFLINE_CONFIG.get('recordings', '.cache/vision_recordings.jsonl'))
 
-def analyze_image(image_data: bytes, image_label: str, confidence_threshold: float = None) -> Dict:
+# Perceptual-hash result cache in front of the vision call (None when disabled)
+recognition_cache: Optional[RecognitionCache] = None
+if CACHE_CONFIG.get('enabled', True):
+    recognition_cache = RecognitionCache(
+        max_entries=CACHE_CONFIG.get('max_entries', 1024),
+        ttl=CACHE_CONFIG.get('ttl', 300),
+        max_distance=CACHE_CONFIG.get('max_distance', 4)
+    )
+
+# Shared clients and concurrency limit, created on first use (the async ones bind
+# to the running event loop, see get_async_client / close_async_client)
+_client: Optional["OpenAI"] = None
+_async_client: Optional["AsyncOpenAI"] = None
+_vision_semaphore: Optional[asyncio.Semaphore] = None
+# Model name -> micro-batcher packing concurrent single-item checks into one request
+_vision_batchers: Dict[str, MicroBatcher] = {}
+
+
+def replay_client_options() -> Dict:
+    return {
+        'recordings': OFFLINE_CONFIG.get('recordings', '.cache/vision_recordings.jsonl'),
+        'latency': OFFLINE_CONFIG.get('latency', {}),
+        'match_rate': OFFLINE_CONFIG.get('match_rate', 0.8)
+    }
+
+
+def get_client() -> "OpenAI":
+    """Return the blocking OpenAI client (uses the OPENAI_API_KEY environment variable)."""
+    global _client
+    if _client is None and VISION_BACKEND == 'replay':
+        _client = SyncReplayVisionClient(**replay_client_options())
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI()
+    return _client
+
+
+def get_async_client() -> "AsyncOpenAI":
     """
-    Analyze the submitted image using OpenAI's Vision API to determine if it matches the target object.
+    Return the shared AsyncOpenAI client, backed by one pooled keep-alive HTTP connection pool.
     """
-    threshold = confidence_threshold
+    global _async_client
+    if _async_client is None and VISION_BACKEND == 'replay':
+        _async_client = ReplayVisionClient(**replay_client_options())
+    if _async_client is None:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        http_config = IMGREC_CONFIG.get('http', {})
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=http_config.get('max_connections', 20),
+                max_keepalive_connections=http_config.get('max_keepalive_connections', 10),
+                keepalive_expiry=http_config.get('keepalive_expiry', 30),
+            )
+        )
+        # Deadlines and retries are handled by call_vision_model (timeout + hedging)
+        _async_client = AsyncOpenAI(
+            http_client=http_client,
+            timeout=VISION_TIMEOUT,
+            max_retries=RESILIENCE_CONFIG.get('max_retries', 0)
+        )
+    return _async_client
+
+
+def get_vision_semaphore() -> asyncio.Semaphore:
+    """Return the semaphore capping concurrent in-flight vision calls."""
+    global _vision_semaphore
+    if _vision_semaphore is None:
+        _vision_semaphore = asyncio.Semaphore(IMGREC_CONFIG.get('max_concurrency', 8))
+    return _vision_semaphore
+
+
+async def close_async_client() -> None:
+    """Close the shared async client and its connection pool (called on app shutdown)."""
+    global _async_client, _vision_semaphore
+    if _async_client is not None:
+        await _async_client.close()
+    _async_client = None
+    _vision_semaphore = None
+    _vision_batchers.clear()
+
+
+# Messages shown to the player when the quality gate rejects a photo, by reason
+QUALITY_REJECTION_MESSAGES = {
+    "too_small": "That photo is too small for me to see anything. Try taking it again!",
+    "too_dark": "That photo is too dark. Turn on a light and try again!",
+    "too_bright": "That photo is too bright. Move away from the light and try again!",
+    "uniform": "I can't see anything in that photo. Point the camera at the item and try again!",
+    "blurry": "That photo is blurry. Hold the camera still and try again!",
+}
+
+# How many photos the quality gate has checked and rejected (per reason)
+quality_gate_stats: Dict[str, int] = {"checked": 0, **{reason: 0 for reason in QUALITY_REJECTION_MESSAGES}}
+
+
+def check_image_quality(prepared: PreprocessedImage) -> Optional[str]:
+    """
+    Cheap local pre-check for photos the vision model could never match.
+
+    Runs on the downsized grayscale frame from preprocessing and takes a few milliseconds.
+    Returns the rejection reason (a key of QUALITY_REJECTION_MESSAGES) or None if the
+    photo is usable. Thresholds come from image_recognition.quality_gate in config.yaml.
+    """
+    if not QUALITY_CONFIG.get('enabled', True) or prepared.gray is None:
+        return None
+
+    import cv2  # deferred: OpenCV adds ~100 ms to startup
+
+    quality_gate_stats["checked"] += 1
+    reason = None
+    if min(prepared.original_size) < QUALITY_CONFIG.get('min_side', 64):
+        reason = "too_small"
+    else:
+        mean, stddev = cv2.meanStdDev(prepared.gray)
+        brightness = float(mean[0][0])
+        contrast = float(stddev[0][0])
+        if brightness < QUALITY_CONFIG.get('min_brightness', 35):
+            reason = "too_dark"
+        elif brightness > QUALITY_CONFIG.get('max_brightness', 245):
+            reason = "too_bright"
+        elif contrast < QUALITY_CONFIG.get('min_contrast', 8):
+            reason = "uniform"
+        elif cv2.Laplacian(prepared.gray, cv2.CV_64F).var() < QUALITY_CONFIG.get('min_sharpness', 30):
+            reason = "blurry"
+
+    if reason is not None:
+        quality_gate_stats[reason] += 1
+    return reason
+
+
+def build_rejection_result(reason: str, threshold: float) -> Dict:
+    """Result for a photo rejected by the quality gate, in the same shape as a vision verdict."""
+    logger.info("Photo rejected by quality gate: %s", reason, extra={"reason": reason})
+    return {
+        "is_match": False,
+        "confidence": 0.0,
+        "message": QUALITY_REJECTION_MESSAGES[reason],
+        "debug_info": {
+            "rejected": reason,
+            "threshold_used": threshold
+        }
+    }
+
+
+# Schema the vision models must answer with (OpenAI structured outputs)
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "is_match": {"type": "boolean"},
+        "confidence": {"type": "number"},
+        "primary_object": {"type": "string"},
+        "reasoning": {"type": "string"}
+    },
+    "required": ["is_match", "confidence", "primary_object", "reasoning"],
+    "additionalProperties": False
+}
+
+ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "item_check", "strict": True, "schema": ANALYSIS_SCHEMA}
+}
+
+# How many calls each model tier answered, how often we escalated, and unparseable replies
+tier_stats: Dict[str, int] = {"escalations": 0, "parse_failures": 0}
+
+
+def build_image_messages(image_data: bytes, prompt: str) -> List[Dict]:
+    """Chat messages sending prompt together with the (JPEG) image"""
+    # Convert image data to base64 for OpenAI API
+    base64_image = base64.b64encode(image_data).decode('utf-8')
+    
+    return [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": prompt
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{base64_image}",
+                        "detail": "low"
+                    }
+                }
+            ]
+        }
+    ]
+
+
+def build_vision_messages(image_data: bytes, image_label: str) -> List[Dict]:
+    """Build the chat messages asking the vision model whether the image shows image_label."""
+    # Short prompt: the JSON schema carries the output format, so no example is needed
+    prompt = (
+        f"Does this photo clearly show a {image_label}? Be strict: it should be recognisable "
+        f"and a main subject of the photo. confidence: probability (0.0-1.0) that it is a "
+        f"{image_label}. primary_object: the main object you see. reasoning: at most 12 words."
+    )
+    return build_image_messages(image_data, prompt)
+
+
+# Schema for a batch of numbered photos, each checked against its own item
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "item_check_batch",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "answers": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"photo": {"type": "integer"}, **ANALYSIS_SCHEMA["properties"]},
+                        "required": ["photo", *ANALYSIS_SCHEMA["required"]],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["answers"],
+            "additionalProperties": False
+        }
+    }
+}
+
+
+def build_batch_messages(pairs: List[Tuple[bytes, str]]) -> List[Dict]:
+    """Build one request checking several (image, label) pairs, with the photos numbered from 1."""
+    items = "; ".join(f"photo {number}: a {label}" for number, (_, label) in enumerate(pairs, 1))
+    content = [{
+        "type": "text",
+        "text": (
+            f"Check each numbered photo for its own item ({items}). Be strict: the item should be "
+            f"recognisable and a main subject of that photo; judge every photo on its own. Answer for "
+            f"every photo: photo (its number), is_match, confidence: probability (0.0-1.0) that it shows "
+            f"its item, primary_object: the main object you see, reasoning: at most 12 words."
+        )
+    }]
+    for number, (image_data, _) in enumerate(pairs, 1):
+        content.append({"type": "text", "text": f"Photo {number}:"})
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:image/jpeg;base64,{base64.b64encode(image_data).decode('utf-8')}",
+                "detail": "low"
+            }
+        })
+    return [{"role": "user", "content": content}]
+
+
+def parse_batch_response(response_text: Optional[str], count: int) -> Dict[int, Dict]:
+    """Analyses from a batch reply by 0-based position; unanswered or unparseable photos are left out."""
+    logger.debug("Batch response: %s", response_text)
+    try:
+        answers = json.loads(response_text or "")["answers"]
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        logger.warning("Failed to parse batch response as JSON: %s", e)
+        tier_stats["parse_failures"] += 1
+        return {}
+    analyses = {}
+    for answer in answers:
+        if isinstance(answer, dict) and isinstance(answer.get("photo"), int) and 1 <= answer["photo"] <= count:
+            analyses[answer.pop("photo") - 1] = answer
+    return analyses
+
+
+def build_tier_request(tier: Dict, messages: List[Dict], **overrides) -> Dict:
+    """Keyword arguments for chat.completions.create for one model tier (overrides replace defaults)"""
+    request = {
+        "model": tier["name"],
+        "messages": messages,
+        "max_tokens": tier.get("max_tokens", 80),
+        "temperature": 0.1,  # Low temperature for more consistent results
+        "response_format": ANALYSIS_RESPONSE_FORMAT
+    }
+    request.update(overrides)
+    return request
+
+
+def build_sweep_response_format(image_labels: List[str]) -> Dict:
+    """Structured output for a sweep: presence and confidence for each asked label"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "item_sweep",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "primary_object": {"type": "string"},
+                    "items": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {"type": "string", "enum": image_labels},
+                                "present": {"type": "boolean"},
+                                "confidence": {"type": "number"}
+                            },
+                            "required": ["name", "present", "confidence"],
+                            "additionalProperties": False
+                        }
+                    }
+                },
+                "required": ["primary_object", "items"],
+                "additionalProperties": False
+            }
+        }
+    }
+
+
+def build_sweep_messages(image_data: bytes, image_labels: List[str]) -> List[Dict]:
+    """Build the chat messages asking which of image_labels the image shows."""
+    prompt = (
+        f"Which of these items does this photo clearly show: {'; '.join(image_labels)}? Be strict: an "
+        f"item must be recognisable and plainly visible, though several may share the photo. Answer for "
+        f"every item: present, and confidence: probability (0.0-1.0) that it is in the photo. "
+        f"primary_object: the main object you see."
+    )
+    return build_image_messages(image_data, prompt)
+
+
+def parse_sweep_response(response_text: Optional[str], image_labels: List[str]) -> Dict[str, Dict]:
+    """
+    Per-label analyses (in the single-item shape) from a sweep reply.
+
+    Labels the reply leaves out, or all of them when it cannot be parsed, are
+    returned as uncertain non-matches marked "parse_failed" so they escalate.
+    """
+    logger.debug("Sweep response: %s", response_text)
+    try:
+        reply = json.loads(response_text or "")
+        answers = {entry["name"]: entry for entry in reply["items"]}
+        primary_object = reply.get("primary_object", "unknown")
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        logger.warning("Failed to parse sweep response as JSON: %s", e)
+        tier_stats["parse_failures"] += 1
+        answers, primary_object = {}, "unknown"
+
+    analyses = {}
+    for label in image_labels:
+        entry = answers.get(label)
+        if entry is None:
+            analyses[label] = {"is_match": False, "confidence": 0.5, "primary_object": primary_object,
+                               "reasoning": "Item missing from the sweep answer", "parse_failed": True}
+            continue
+        analyses[label] = {
+            "is_match": bool(entry.get("present")),
+            "confidence": entry.get("confidence", 0.5),
+            "primary_object": primary_object,
+            "reasoning": f"Sweep over {len(image_labels)} items"
+        }
+    return analyses
+
+
+def needs_escalation(analysis_result: Dict, threshold: Optional[float] = None) -> bool:
+    """
+    True when an answer is too close to the match threshold (default:
+    confidence_threshold) to trust a cheaper tier.
+
+    Parse failures always escalate.
+    """
+    if analysis_result.get("parse_failed"):
+        return True
     if threshold is None:
         threshold = IMGREC_CONFIG.get('confidence_threshold', 0.7)
+    return abs(analysis_result.get("confidence", 0.5) - threshold) <= UNCERTAINTY_BAND
 
-    print(f"Image label: {image_label}")
+
+def parse_vision_response(response_text: Optional[str]) -> Dict:
+    """
+    Parse the model's structured JSON reply, falling back to simple parsing.
+
+    The fallback should only be hit when the reply was truncated or refused; such
+    results carry "parse_failed" so they escalate to the next tier.
+    """
+    logger.debug("Vision response: %s", response_text)
+    response_text = response_text or ""
     
-    # Convert image data to base64 for OpenAI API
-    base64_image = base64.b64encode(image_data).decode('utf-8')
+    try:
+        analysis_result = json.loads(response_text)
+        if not isinstance(analysis_result, dict):
+            raise ValueError("Response is not a JSON object")
+        return analysis_result
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.warning("Failed to parse vision response as JSON: %s", e)
+        tier_stats["parse_failures"] += 1
+        # Fallback: try to extract key information using simple parsing
+        is_match = "true" in response_text.lower() and ("is_match" in response_text.lower())
+        confidence = 0.5  # Default confidence if we can't parse
+        reasoning = response_text[:200] + "..." if len(response_text) > 200 else response_text
+        primary_object = "unknown"
+        
+        return {
+            "is_match": is_match,
+            "confidence": confidence,
+            "reasoning": reasoning,
+            "primary_object": primary_object,
+            "parse_failed": True
+        }
+
+
+def record_tier_answer(tier: Dict, analysis_result: Dict) -> None:
+    """Tag an analysis with the model that produced it and count it."""
+    analysis_result["model"] = tier["name"]
+    tier_stats[tier["name"]] = tier_stats.get(tier["name"], 0) + 1
+
+
+def build_match_result(analysis_result: Dict, image_label: str, threshold: float) -> Dict:
+    """
+    Apply the confidence threshold to a parsed analysis and build the result returned to routes.
+    """
+    # Extract values with defaults
+    is_match = analysis_result.get("is_match", False)
+    api_confidence = analysis_result.get("confidence", 0.5)
+    reasoning = analysis_result.get("reasoning", "Analysis completed")
+    primary_object = analysis_result.get("primary_object", "unknown")
     
-    # Create a detailed prompt for zero-shot classification
-    prompt = f"""
-    Please analyze this image and determine if it contains a {image_label}.
+    logger.debug("Vision verdict for %s: match=%s confidence=%s object=%s reasoning=%s",
+                 image_label, is_match, api_confidence, primary_object, reasoning)
     
-    Respond with a JSON object containing:
-    1. "is_match": true if the image clearly shows a {image_label}, false otherwise
-    2. "confidence": a decimal between 0.0 and 1.0 indicating how confident you are
-    3. "reasoning": a brief explanation of what you see and why you made this determination
-    4. "primary_object": what the main object in the image appears to be
+    # Apply threshold
+    is_correct = is_match and api_confidence > threshold
     
-    Be strict in your evaluation - only return true if you're confident the image shows a {image_label}.
-    Consider lighting, angle, clarity, and whether the object is the main focus of the image.
+    # Generate user-friendly message
+    if is_correct:
+        message = f"Great job! That looks like the right item! (Confidence: {api_confidence:.2f})"
+    else:
+        if not is_match:
+            if primary_object != "unknown" and primary_object.lower() != image_label.lower():
+                message = f"This looks more like a {primary_object} than a {image_label}. Try again!"
+            else:
+                message = f"I'm not confident this is a {image_label}. Try again!"
+        else:
+            message = f"The image might show a {image_label}, but I'm not confident enough. Try again! (Confidence: {api_confidence:.2f})"
     
-    Example response:
-    {{
-        "is_match": true,
-        "confidence": 0.85,
-        "reasoning": "The image clearly shows a [object] in good lighting with clear details visible",
-        "primary_object": "{image_label}"
-    }}
+    return {
+        "is_match": is_correct,
+        "confidence": api_confidence,
+        "message": message,
+        "debug_info": {
+            "api_is_match": is_match,
+            "api_confidence": api_confidence,
+            "reasoning": reasoning,
+            "primary_object": primary_object,
+            "model": analysis_result.get("model"),
+            "threshold_used": threshold
+        }
+    }
+
+
+def build_error_result(error: Exception, threshold: float) -> Dict:
+    """Safe fallback result used when the vision call fails."""
+    logger.error("Error calling the vision API: %r", error)
+    if isinstance(error, TimeoutError):
+        message = "Checking your photo took too long. Please try again!"
+    elif isinstance(error, CircuitOpenError):
+        message = "Photo checking is taking a short break. Please try again in a moment!"
+    else:
+        message = f"Unable to analyze image due to technical error. Please try again."
+    return {
+        "is_match": False,
+        "confidence": 0.0,
+        "message": message,
+        "debug_info": {
+            "error": str(error),
+            "threshold_used": threshold
+        }
+    }
+
+
+def analyze_image(image_data: bytes, image_label: str, confidence_threshold: float = None) -> Dict:
+    """
+    Analyze the submitted image using OpenAI's Vision API to determine if it matches the target object.
+
+    Blocking version, kept for scripts such as the validation harness. Request handlers
+    must use analyze_image_async so the event loop is not held during the API call.
     """
+    threshold = confidence_threshold
+    if threshold is None:
+        threshold = IMGREC_CONFIG.get('confidence_threshold', 0.7)
+
+    logger.debug("Analyzing image for %s", image_label)
+    
+    if PREPROCESS_CONFIG.get('enabled', True):
+        image_data = preprocess_image(
+            image_data,
+            PREPROCESS_CONFIG.get('max_side', 512),
+            PREPROCESS_CONFIG.get('jpeg_quality', 80)
+        ).data
     
     try:
-        # Call OpenAI Vision API
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Use gpt-4o which has vision capabilities
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}",
-                                "detail": "low"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=300,
-            temperature=0.1  # Low temperature for more consistent results
-        )
-        
-        # Parse the response
-        response_text = response.choices[0].message.content
-        print(f"OpenAI response: {response_text}")
-        
-        # Try to extract JSON from the response
+        # Call OpenAI Vision API, escalating through the model tiers while uncertain
+        messages = build_vision_messages(image_data, image_label)
+        for index, tier in enumerate(MODEL_TIERS):
+            request = build_tier_request(tier, messages)
+            response = get_client().chat.completions.create(**request)
+            if vision_recorder is not None:
+                vision_recorder.record(request, response.choices[0].message.content)
+            analysis_result = parse_vision_response(response.choices[0].message.content)
+            record_tier_answer(tier, analysis_result)
+            if index == len(MODEL_TIERS) - 1 or not needs_escalation(analysis_result):
+                break
+            tier_stats["escalations"] += 1
+        return build_match_result(analysis_result, image_label, threshold)
+    except Exception as e:
+        return build_error_result(e, threshold)
+
+
+# Per-call deadline, hedging and circuit breaking around the vision API
+vision_latency: Dict[str, LatencyTracker] = {tier["name"]: LatencyTracker() for tier in MODEL_TIERS}
+hedge_stats = HedgeStats()
+vision_breaker = CircuitBreaker(**RESILIENCE_CONFIG.get('circuit_breaker', {}))
+# Deadline expiries and verdicts served by the fallback while the breaker was open
+resilience_stats: Dict[str, int] = {"timeouts": 0, "degraded": 0}
+
+
+def get_hedge_delay(model: str) -> Optional[float]:
+    """
+    Seconds to wait before hedging a call to model: the configured latency percentile
+    of recent calls, or initial_delay until min_samples calls have been seen.
+    """
+    if not HEDGE_CONFIG.get('enabled', True):
+        return None
+    tracker = vision_latency[model]
+    if len(tracker.samples) < HEDGE_CONFIG.get('min_samples', 20):
+        delay = HEDGE_CONFIG.get('initial_delay', 2.0)
+    else:
+        delay = tracker.percentile(HEDGE_CONFIG.get('percentile', 95))
+    return max(HEDGE_CONFIG.get('min_delay', 0.5), delay)
+
+
+async def call_vision_model(tier: Dict, messages: List[Dict], timeout: Optional[float] = None,
+                            slow_call_seconds: Optional[float] = None, **overrides):
+    """
+    One vision call for a model tier, with the image_recognition.timeout deadline
+    (or timeout) enforced, a hedged duplicate after the p95 delay, and the circuit
+    breaker applied (slow_call_seconds overrides its slow-call threshold).
+    overrides replace request defaults (see build_tier_request).
+    Raises TimeoutError, CircuitOpenError or the API error.
+    """
+    async def attempt():
+        async with get_vision_semaphore():
+            started = time.monotonic()
+            request = build_tier_request(tier, messages, **overrides)
+            VISION_IN_FLIGHT.inc()
+            try:
+                response = await get_async_client().chat.completions.create(**request)
+            except BaseException as e:
+                outcome = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+                VISION_CALL_SECONDS.labels(tier["name"], outcome).observe(time.monotonic() - started)
+                raise
+            finally:
+                VISION_IN_FLIGHT.dec()
+            elapsed = time.monotonic() - started
+            vision_latency[tier["name"]].record(elapsed)
+            VISION_CALL_SECONDS.labels(tier["name"], "ok").observe(elapsed)
+            record_token_usage(tier["name"], getattr(response, "usage", None))
+            if vision_recorder is not None:
+                vision_recorder.record(request, response.choices[0].message.content)
+            return response
+
+    async def deadline_call():
         try:
-            # Find JSON object in the response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            if start_idx != -1 and end_idx != 0:
-                json_str = response_text[start_idx:end_idx]
-                analysis_result = json.loads(json_str)
-            else:
-                raise ValueError("No JSON found in response")
-        except (json.JSONDecodeError, ValueError) as e:
-            print(f"Failed to parse JSON response: {e}")
-            # Fallback: try to extract key information using simple parsing
-            is_match = "true" in response_text.lower() and ("is_match" in response_text.lower())
-            confidence = 0.5  # Default confidence if we can't parse
-            reasoning = response_text[:200] + "..." if len(response_text) > 200 else response_text
-            primary_object = "unknown"
-            
-            analysis_result = {
-                "is_match": is_match,
-                "confidence": confidence,
-                "reasoning": reasoning,
-                "primary_object": primary_object
-            }
-        
-        # Extract values with defaults
-        is_match = analysis_result.get("is_match", False)
-        api_confidence = analysis_result.get("confidence", 0.5)
-        reasoning = analysis_result.get("reasoning", "Analysis completed")
-        primary_object = analysis_result.get("primary_object", "unknown")
-        
-        print(f"API confidence: {api_confidence}")
-        print(f"Reasoning: {reasoning}")
-        print(f"Primary object detected: {primary_object}")
-        
-        # Apply threshold
-        is_correct = is_match and api_confidence > threshold
-        
-        # Generate user-friendly message
-        if is_correct:
-            message = f"Great job! That looks like the right item! (Confidence: {api_confidence:.2f})"
+            return await asyncio.wait_for(hedged(attempt, get_hedge_delay(tier["name"]), hedge_stats),
+                                          timeout or VISION_TIMEOUT)
+        except TimeoutError:
+            resilience_stats["timeouts"] += 1
+            raise
+
+    return await vision_breaker.call(deadline_call, slow_call_seconds)
+
+
+async def request_single(tier: Dict, image_data: bytes, image_label: str, timeout: Optional[float] = None) -> Dict:
+    """One image checked against one label on a model tier, in its own request"""
+    with time_stage("vision_call"):
+        response = await call_vision_model(tier, build_vision_messages(image_data, image_label), timeout=timeout)
+    with time_stage("parse"):
+        return parse_vision_response(response.choices[0].message.content)
+
+
+# Batched requests, and checks that had to be retried individually
+batch_stats: Dict[str, int] = {"batched_calls": 0, "batched_items": 0, "fallbacks": 0}
+
+
+async def request_batch(tier: Dict, pairs: List[Tuple[bytes, str]]) -> List:
+    """
+    Check several (image, label) pairs in one request on a model tier.
+
+    Returns one analysis (or exception) per pair. A batch generates more output
+    than a single check, so its deadline and the breaker's slow-call threshold are
+    scaled by batching.deadline_per_extra_photo for each photo beyond the first.
+    Pairs the batch does not answer, or all of them if it fails, are retried as
+    individual requests within what is left of that deadline; an open circuit
+    breaker is passed straight to every caller.
+    """
+    if len(pairs) == 1:
+        try:
+            return [await request_single(tier, *pairs[0])]
+        except Exception as e:
+            return [e]
+    scale = 1 + BATCH_CONFIG.get('deadline_per_extra_photo', 0.25) * (len(pairs) - 1)
+    deadline = time.monotonic() + VISION_TIMEOUT * scale
+    analyses: Dict[int, Dict] = {}
+    try:
+        with time_stage("vision_call"):
+            response = await call_vision_model(
+                tier,
+                build_batch_messages(pairs),
+                timeout=VISION_TIMEOUT * scale,
+                slow_call_seconds=vision_breaker.slow_call_seconds * scale,
+                max_tokens=tier.get("max_tokens", 80) * len(pairs),
+                response_format=BATCH_RESPONSE_FORMAT
+            )
+        with time_stage("parse"):
+            analyses = parse_batch_response(response.choices[0].message.content, len(pairs))
+        batch_stats["batched_calls"] += 1
+        batch_stats["batched_items"] += len(analyses)
+    except CircuitOpenError as e:
+        return [e] * len(pairs)
+    except Exception as e:
+        logger.warning("Batched vision call for %d photos failed: %r", len(pairs), e)
+    missing = [position for position in range(len(pairs)) if position not in analyses]
+    remaining = deadline - time.monotonic()
+    if missing and remaining <= 0:
+        analyses.update((position, TimeoutError("Batch deadline exceeded")) for position in missing)
+    elif missing:
+        batch_stats["fallbacks"] += len(missing)
+        retried = await asyncio.gather(
+            *(request_single(tier, *pairs[position], timeout=min(remaining, VISION_TIMEOUT)) for position in missing),
+            return_exceptions=True
+        )
+        analyses.update(zip(missing, retried))
+    return [analyses[position] for position in range(len(pairs))]
+
+
+def get_vision_batcher(tier: Dict) -> MicroBatcher:
+    """Return the micro-batcher for a model tier, created on first use (bound to the running loop)."""
+    batcher = _vision_batchers.get(tier["name"])
+    if batcher is None:
+        batcher = MicroBatcher(
+            lambda pairs: request_batch(tier, pairs),
+            window=BATCH_CONFIG.get('window_ms', 25) / 1000,
+            max_batch_size=BATCH_CONFIG.get('max_batch_size', 6)
+        )
+        _vision_batchers[tier["name"]] = batcher
+    return batcher
+
+
+async def request_analysis(image_data: bytes, image_label: str) -> Dict:
+    """
+    Ask the vision models and return the parsed analysis (raises on API errors).
+
+    The first (cheapest) tier answers unless its confidence falls within
+    models.uncertainty_band of the confidence threshold, in which case the next tier
+    is asked and its answer used instead. With image_recognition.batching enabled,
+    concurrent checks on the same tier share one upstream request.
+    """
+    for index, tier in enumerate(MODEL_TIERS):
+        if BATCH_CONFIG.get('enabled', True):
+            analysis_result = await get_vision_batcher(tier).submit((image_data, image_label))
         else:
-            if not is_match:
-                if primary_object != "unknown" and primary_object.lower() != image_label.lower():
-                    message = f"This looks more like a {primary_object} than a {image_label}. Try again!"
-                else:
-                    message = f"I'm not confident this is a {image_label}. Try again!"
+            analysis_result = await request_single(tier, image_data, image_label)
+        record_tier_answer(tier, analysis_result)
+        if index == len(MODEL_TIERS) - 1 or not needs_escalation(analysis_result):
+            return analysis_result
+        tier_stats["escalations"] += 1
+    return analysis_result
+
+
+async def request_sweep(image_data: bytes, image_labels: List[str]) -> Dict[str, Dict]:
+    """
+    Score one image against several labels with one vision call per tier (raises on API errors).
+
+    Only the labels whose answer is uncertain (see needs_escalation) are asked again
+    on the next tier.
+    """
+    analyses: Dict[str, Dict] = {}
+    pending = list(image_labels)
+    for index, tier in enumerate(MODEL_TIERS):
+        with time_stage("vision_call"):
+            response = await call_vision_model(
+                tier,
+                build_sweep_messages(image_data, pending),
+                max_tokens=tier.get("max_tokens", 80) + SWEEP_CONFIG.get('tokens_per_item', 25) * len(pending),
+                response_format=build_sweep_response_format(pending)
+            )
+        with time_stage("parse"):
+            answers = parse_sweep_response(response.choices[0].message.content, pending)
+        tier_stats[tier["name"]] = tier_stats.get(tier["name"], 0) + 1
+        for analysis in answers.values():
+            analysis["model"] = tier["name"]
+        analyses.update(answers)
+        pending = [label for label, analysis in answers.items() if needs_escalation(analysis)]
+        if index == len(MODEL_TIERS) - 1 or not pending:
+            break
+        tier_stats["escalations"] += 1
+    return analyses
+
+
+class OpenAIBackend(RecognitionBackend):
+    """Recognition via the OpenAI vision API"""
+
+    name = "openai"
+
+    async def analyze(self, prepared: PreprocessedImage, image_label: str) -> Dict:
+        return await request_analysis(prepared.data, image_label)
+
+    async def analyze_many(self, prepared: PreprocessedImage, image_labels: List[str]) -> Dict[str, Dict]:
+        # One call per chunk of labels; long lists make the answer (and its latency) grow
+        chunk = max(1, SWEEP_CONFIG.get('max_items_per_call', 20))
+        chunks = [image_labels[i:i + chunk] for i in range(0, len(image_labels), chunk)]
+        analyses: Dict[str, Dict] = {}
+        for answer in await asyncio.gather(*(request_sweep(prepared.data, labels) for labels in chunks)):
+            analyses.update(answer)
+        return analyses
+
+
+def create_recognition_backend(kind: str) -> RecognitionBackend:
+    """Build the backend named by image_recognition.backend ("openai", "local" or "cascade")."""
+    if kind == "openai":
+        return OpenAIBackend()
+    # OpenCV is only loaded when a local backend is used
+    from .local_recognition import LocalReferenceBackend
+    local = LocalReferenceBackend(
+        items=CONFIG["content"]["items"],
+        images_dir=CONFIG["content"]["paths"]["images_dir"],
+        config=LOCAL_CONFIG,
+        max_side=PREPROCESS_CONFIG.get('max_side', 512)
+    )
+    if kind == "local":
+        return local
+    if kind == "cascade":
+        return CascadeBackend(
+            local,
+            OpenAIBackend(),
+            accept_above=LOCAL_CONFIG.get('accept_above', 0.85),
+            reject_below=LOCAL_CONFIG.get('reject_below')
+        )
+    raise ValueError(f"Unknown image_recognition.backend: {kind}")
+
+
+recognition_backend: RecognitionBackend = create_recognition_backend(IMGREC_CONFIG.get('backend', 'openai'))
+
+# Backend answering while the vision circuit breaker is open (None: reply "try again" immediately).
+# Only needed once the breaker opens, so it is prepared in the background after startup.
+USE_FALLBACK = RESILIENCE_CONFIG.get('fallback', 'none') == 'local' and recognition_backend.name != 'local'
+fallback_backend: Optional[RecognitionBackend] = None
+_fallback_ready: Optional[asyncio.Task] = None
+
+
+async def prepare_fallback_backend() -> None:
+    global fallback_backend
+    if isinstance(recognition_backend, CascadeBackend):
+        fallback_backend = recognition_backend.first
+        return
+    backend = await asyncio.to_thread(create_recognition_backend, 'local')
+    await backend.start()
+    fallback_backend = backend
+
+
+async def start_recognition_backend() -> None:
+    """Prepare the configured backend (e.g. build the local reference index) at app startup."""
+    global _fallback_ready
+    await recognition_backend.start()
+    if USE_FALLBACK:
+        _fallback_ready = asyncio.create_task(prepare_fallback_backend())
+
+
+async def get_fallback_backend() -> Optional[RecognitionBackend]:
+    """The fallback backend once it is ready (None when disabled or it failed to start)"""
+    if _fallback_ready is None:
+        return None
+    try:
+        await _fallback_ready
+    except Exception as e:
+        logger.error("Fallback backend failed to start: %s", e)
+        return None
+    return fallback_backend
+
+
+async def analyze_degraded(prepared: PreprocessedImage, image_label: str, threshold: float, error: Exception) -> Dict:
+    """Verdict from the fallback backend while the vision API is unavailable."""
+    if await get_fallback_backend() is None:
+        return build_error_result(error, threshold)
+    resilience_stats["degraded"] += 1
+    logger.warning("Vision API unavailable, using %s backend", fallback_backend.name)
+    result = build_match_result(await fallback_backend.analyze(prepared, image_label), image_label, threshold)
+    result["debug_info"]["degraded"] = True
+    return result
+
+
+async def analyze_image_async(image_data: bytes, image_label: str, confidence_threshold: float = None) -> Dict:
+    """
+    Non-blocking version of analyze_image for use from request handlers.
+
+    The upload is first run through the preprocessing stage in a worker pool and the
+    local quality gate, which answers unusable photos immediately. The analysis is then
+    served from the perceptual-hash cache when a (near) identical frame was recently
+    checked for the same item, otherwise it comes from the configured recognition
+    backend. The OpenAI backend uses the shared pooled AsyncOpenAI client; at most
+    image_recognition.max_concurrency vision calls are in flight at once, the rest wait
+    on the semaphore without blocking the loop.
+    """
+    threshold = confidence_threshold
+    if threshold is None:
+        threshold = IMGREC_CONFIG.get('confidence_threshold', 0.7)
+
+    with time_stage("preprocess"):
+        prepared = await preprocess_image_async(image_data, PREPROCESS_CONFIG)
+    if prepared.processed:
+        logger.debug("Preprocessed image for %s: %s -> %s bytes, %s -> %s", image_label,
+                     prepared.original_bytes, len(prepared.data), prepared.original_size, prepared.size)
+    
+    with time_stage("quality_gate"):
+        rejection = check_image_quality(prepared)
+    if rejection is not None:
+        return build_rejection_result(rejection, threshold)
+    
+    try:
+        with time_stage("recognition"):
+            if recognition_cache is not None and prepared.phash is not None:
+                analysis_result = await recognition_cache.get_or_compute(
+                    (prepared.phash, image_label),
+                    lambda: recognition_backend.analyze(prepared, image_label)
+                )
             else:
-                message = f"The image might show a {image_label}, but I'm not confident enough. Try again! (Confidence: {api_confidence:.2f})"
-        
-        return {
-            "is_match": is_correct,
-            "confidence": api_confidence,
-            "message": message,
-            "debug_info": {
-                "api_is_match": is_match,
-                "api_confidence": api_confidence,
-                "reasoning": reasoning,
-                "primary_object": primary_object,
-                "threshold_used": threshold
-            }
-        }
-        
+                analysis_result = await recognition_backend.analyze(prepared, image_label)
+        return build_match_result(analysis_result, image_label, threshold)
+    except CircuitOpenError as e:
+        return await analyze_degraded(prepared, image_label, threshold, e)
     except Exception as e:
-        print(f"Error calling OpenAI API: {e}")
-        # Fallback to a safe response
-        return {
-            "is_match": False,
-            "confidence": 0.0,
-            "message": f"Unable to analyze image due to technical error. Please try again.",
-            "debug_info": {
-                "error": str(e),
-                "threshold_used": threshold
-            }
+        return build_error_result(e, threshold)
+
+
+def sweep_cache_key(phash: int, label: str) -> Tuple[int, str]:
+    """
+    Cache key of a sweep verdict. Sweeps answer a different prompt ("which of
+    these N items") than single-item checks, so their verdicts are kept apart.
+    """
+    return phash, "sweep:" + label
+
+
+async def analyze_sweep_async(image_data: bytes, image_labels: Optional[List[str]] = None,
+                              confidence_threshold: float = None) -> Dict[str, Dict]:
+    """
+    Score one photo against several items at once ("sweep"), by label.
+
+    image_labels defaults to every item in content.items. Each value has the same
+    shape as an analyze_image_async result. The pipeline is the same too
+    (preprocessing, quality gate, cache, backend), except that every label not
+    already cached is answered by one analyze_many call, which the OpenAI backend
+    turns into a single vision request per tier instead of one per item.
+    """
+    threshold = confidence_threshold
+    if threshold is None:
+        threshold = IMGREC_CONFIG.get('confidence_threshold', 0.7)
+    if image_labels is None:
+        image_labels = [item["name"] for item in CONFIG["content"]["items"]]
+    image_labels = list(dict.fromkeys(image_labels))
+
+    with time_stage("preprocess"):
+        prepared = await preprocess_image_async(image_data, PREPROCESS_CONFIG)
+    
+    with time_stage("quality_gate"):
+        rejection = check_image_quality(prepared)
+    if rejection is not None:
+        result = build_rejection_result(rejection, threshold)
+        return {label: result for label in image_labels}
+    
+    use_cache = recognition_cache is not None and prepared.phash is not None
+    analyses: Dict[str, Dict] = {}
+    try:
+        with time_stage("recognition"):
+            if use_cache:
+                for label in image_labels:
+                    cached = recognition_cache.get(sweep_cache_key(prepared.phash, label))
+                    if cached is not None:
+                        analyses[label] = cached
+            missing = [label for label in image_labels if label not in analyses]
+            if missing:
+                fresh = await recognition_backend.analyze_many(prepared, missing)
+                if use_cache:
+                    for label, analysis in fresh.items():
+                        recognition_cache.put(sweep_cache_key(prepared.phash, label), analysis)
+                analyses.update(fresh)
+        return {label: build_match_result(analyses[label], label, threshold) for label in image_labels}
+    except CircuitOpenError as e:
+        backend = await get_fallback_backend()
+        if backend is None:
+            result = build_error_result(e, threshold)
+            return {label: result for label in image_labels}
+        resilience_stats["degraded"] += 1
+        logger.warning("Vision API unavailable, sweeping with %s backend", backend.name)
+        analyses.update(await backend.analyze_many(prepared, [label for label in image_labels if label not in analyses]))
+        results = {label: build_match_result(analyses[label], label, threshold) for label in image_labels}
+        for result in results.values():
+            result["debug_info"]["degraded"] = True
+        return results
+    except Exception as e:
+        result = build_error_result(e, threshold)
+        return {label: result for label in image_labels}
+
+
+def get_recognition_stats() -> Dict:
+    """Counters from the recognition pipeline stages, for the stats endpoint"""
+    checked = quality_gate_stats["checked"]
+    rejected = sum(v for k, v in quality_gate_stats.items() if k != "checked")
+    return {
+        "backend": recognition_backend.name,
+        "cascade": recognition_backend.stats() if isinstance(recognition_backend, CascadeBackend) else None,
+        "models": dict(tier_stats),
+        "vision_backend": VISION_BACKEND,
+        "replay": _async_client.stats() if isinstance(_async_client, ReplayVisionClient) else None,
+        "recorded": vision_recorder.recorded if vision_recorder is not None else None,
+        "resilience": {
+            **resilience_stats,
+            "circuit_breaker": vision_breaker.stats(),
+            "hedging": hedge_stats.stats(),
+            "hedge_delay": {tier["name"]: get_hedge_delay(tier["name"]) for tier in MODEL_TIERS},
+            "fallback": fallback_backend.name if fallback_backend is not None else None
+        },
+        "cache": recognition_cache.stats() if recognition_cache is not None else None,
+        "batching": {
+            **batch_stats,
+            "tiers": {name: batcher.stats() for name, batcher in _vision_batchers.items()}
+        },
+        "quality_gate": {
+            **quality_gate_stats,
+            "rejection_rate": rejected / checked if checked else 0.0
         }
+    }
+
+
+register_stats("recognition", get_recognition_stats)
+
 
 def get_points_for_match(time_taken: float, max_time: float) -> int:
     """
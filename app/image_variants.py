@@ -0,0 +1,262 @@
+"""
+Pre-rendered, cache-friendly variants of the catalog images.
+
+The catalog photos in content.paths.images_dir are resized to a few widths
+and encoded as WebP and JPEG. Each file name carries a hash of its content
+(sofa-320w.3f2a9c1b0d4e.webp), so a file never changes once published and is
+served with an immutable Cache-Control header. Each source image's variants
+are recorded in manifest.json next to the files, and the API adds them to
+every item it returns (see item_with_variants).
+
+Build step (deployment, or after changing the catalog):
+    python -m app.image_variants
+
+If the manifest is missing or out of date at startup, it is rebuilt in the
+background; until then items are served with their original image.
+"""
+
+import io
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from starlette.staticfiles import StaticFiles
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+
+def project_path(path: str) -> str:
+    """Resolve a config path relative to the project root (not the working directory)"""
+    return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+
+
+def file_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def settings_digest(widths: List[int], formats: List[str], quality: int) -> str:
+    """Identifies the build settings, so changing them invalidates the manifest"""
+    return file_digest(json.dumps([MANIFEST_VERSION, sorted(widths), sorted(formats), quality]).encode())
+
+
+def render_variants(source: bytes, stem: str, widths: List[int], formats: List[str],
+                    quality: int, output_dir: str) -> Dict[str, Any]:
+    """Write the variants of one source image and return its manifest entry."""
+    from PIL import Image, ImageOps  # deferred: only needed when the manifest is rebuilt
+
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(source)))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    # Never upscale: widths above the original collapse into one original-size variant
+    targets = sorted({min(width, image.width) for width in widths})
+    variants = []
+    for width in targets:
+        resized = image if width == image.width else image.resize(
+            (width, max(1, round(image.height * width / image.width))), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            output = io.BytesIO()
+            resized.save(output, format=FORMATS[fmt], quality=quality, optimize=True)
+            data = output.getvalue()
+            filename = f"{stem}-{resized.width}w.{file_digest(data)}.{EXTENSIONS[fmt]}"
+            path = os.path.join(output_dir, filename)
+            if not os.path.exists(path):
+                with open(path, "wb") as f:
+                    f.write(data)
+            variants.append({
+                "file": filename,
+                "format": fmt,
+                "width": resized.width,
+                "height": resized.height,
+                "bytes": len(data)
+            })
+    return {"source_digest": file_digest(source), "width": image.width, "height": image.height, "variants": variants}
+
+
+def load_manifest(output_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(project_path(output_dir), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def is_current(manifest: Optional[Dict[str, Any]], items: List[Dict], images_dir: str, widths: List[int],
+               formats: List[str], quality: int) -> bool:
+    """Whether the manifest covers every catalog image, unchanged, with the current settings"""
+    if manifest is None or manifest.get("settings") != settings_digest(widths, formats, quality):
+        return False
+    images = manifest.get("images", {})
+    for item in items:
+        entry = images.get(item["image"])
+        path = os.path.join(project_path(images_dir), item["image"])
+        if entry is None or not os.path.exists(path):
+            return False
+        with open(path, "rb") as f:
+            if entry["source_digest"] != file_digest(f.read()):
+                return False
+    return True
+
+
+def build_variants(items: List[Dict], images_dir: str, output_dir: str, widths: List[int],
+                   formats: List[str], quality: int = 75) -> Dict[str, Any]:
+    """
+    Render variants of every item image into output_dir, write the manifest and
+    delete variant files the new manifest no longer references.
+    """
+    images_dir, output_dir = project_path(images_dir), project_path(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    previous = load_manifest(output_dir) or {}
+    reusable = previous.get("images", {}) if previous.get("settings") == settings_digest(widths, formats, quality) else {}
+    images = {}
+    for item in items:
+        path = os.path.join(images_dir, item["image"])
+        if not os.path.exists(path):
+            logger.warning("Catalog image %s not found, serving no variants for it", path)
+            continue
+        with open(path, "rb") as f:
+            source = f.read()
+        entry = reusable.get(item["image"])
+        if entry is not None and entry["source_digest"] == file_digest(source) and all(
+                os.path.exists(os.path.join(output_dir, variant["file"])) for variant in entry["variants"]):
+            images[item["image"]] = entry
+            continue
+        stem = os.path.splitext(os.path.basename(item["image"]))[0]
+        images[item["image"]] = render_variants(source, stem, widths, formats, quality, output_dir)
+
+    manifest = {"version": MANIFEST_VERSION, "settings": settings_digest(widths, formats, quality), "images": images}
+    # Per-process name: several workers may rebuild at once
+    temporary = os.path.join(output_dir, f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    with open(temporary, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporary, os.path.join(output_dir, MANIFEST_NAME))
+
+    referenced = {variant["file"] for entry in images.values() for variant in entry["variants"]}
+    for entry in os.scandir(output_dir):
+        # Leave other workers' manifests being written alone
+        if entry.name not in referenced and entry.name != MANIFEST_NAME and not entry.name.endswith(".tmp"):
+            os.remove(entry.path)
+    return manifest
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with a Cache-Control header. Starlette already sends ETag and
+    Last-Modified and answers If-None-Match / If-Modified-Since with a 304.
+    """
+
+    def __init__(self, *args, cache_control: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = self.cache_control
+        return response
+
+
+class ImageVariants:
+    """The variant manifest in use, and the URLs it gives each catalog item"""
+
+    def __init__(self, items: List[Dict], images_dir: str, original_prefix: str, output_dir: str, url_prefix: str,
+                 widths: List[int], formats: List[str], quality: int = 75):
+        self.items = items
+        self.images_dir = images_dir
+        self.original_prefix = original_prefix.rstrip("/")
+        self.output_dir = output_dir
+        self.url_prefix = url_prefix.rstrip("/")
+        self.widths = widths
+        self.formats = formats
+        self.quality = quality
+        self.manifest: Optional[Dict[str, Any]] = None
+        self._build: Optional[asyncio.Task] = None
+        self.builds = 0
+
+    def build(self) -> None:
+        """Build (or refresh) the variants now (blocking)."""
+        self.manifest = build_variants(self.items, self.images_dir, self.output_dir, self.widths, self.formats,
+                                       self.quality)
+        self.builds += 1
+
+    async def _build_in_background(self) -> None:
+        try:
+            await asyncio.to_thread(self.build)
+            logger.info("Built image variants for %d catalog images", len(self.manifest["images"]))
+        except Exception as e:
+            logger.error("Building image variants failed, serving the original images: %s", e)
+
+    async def start(self) -> None:
+        """Load the manifest (called from the app lifespan); a stale one is rebuilt in the background."""
+        # The /static/variants mount needs the directory to exist before the first build
+        os.makedirs(project_path(self.output_dir), exist_ok=True)
+        manifest = await asyncio.to_thread(load_manifest, self.output_dir)
+        current = await asyncio.to_thread(is_current, manifest, self.items, self.images_dir, self.widths,
+                                          self.formats, self.quality)
+        if manifest is not None:
+            self.manifest = manifest
+        if not current:
+            self._build = asyncio.create_task(self._build_in_background())
+
+    async def stop(self) -> None:
+        if self._build is not None:
+            await asyncio.gather(self._build, return_exceptions=True)
+            self._build = None
+
+    def urls(self, image: str) -> Dict[str, Any]:
+        """image_url (smallest JPEG, or the original) and per-format srcset-style variant lists"""
+        entry = (self.manifest or {}).get("images", {}).get(image)
+        if entry is None:
+            return {"image_url": f"{self.original_prefix}/{image}", "image_variants": {}}
+        variants: Dict[str, List[Dict]] = {}
+        for variant in entry["variants"]:
+            variants.setdefault(variant["format"], []).append({
+                "url": f"{self.url_prefix}/{variant['file']}",
+                "width": variant["width"],
+                "height": variant["height"]
+            })
+        fallback = variants.get("jpeg") or next(iter(variants.values()), None)
+        return {
+            "image_url": fallback[0]["url"] if fallback else f"{self.original_prefix}/{image}",
+            "image_variants": variants
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        images = (self.manifest or {}).get("images", {})
+        return {
+            "images": len(images),
+            "variants": sum(len(entry["variants"]) for entry in images.values()),
+            "builds": self.builds,
+            "building": self._build is not None and not self._build.done()
+        }
+
+
+def item_with_variants(item: Dict, variants: ImageVariants) -> Dict:
+    """A catalog item as returned by the API: the stored fields plus its image URLs"""
+    return {**item, **variants.urls(item["image"])}
+
+
+if __name__ == "__main__":
+    from .config import CONFIG
+
+    variants_config = CONFIG["content"]["variants"]
+    manifest = build_variants(
+        CONFIG["content"]["items"],
+        CONFIG["content"]["paths"]["images_dir"],
+        variants_config["output_dir"],
+        variants_config["widths"],
+        variants_config["formats"],
+        variants_config["quality"]
+    )
+    for image, entry in manifest["images"].items():
+        source_bytes = os.path.getsize(os.path.join(project_path(CONFIG["content"]["paths"]["images_dir"]), image))
+        sizes = ", ".join(f"{v['width']}w {v['format']} {v['bytes'] // 1024} KB" for v in entry["variants"])
+        print(f"{image} ({source_bytes // 1024} KB): {sizes}")
@@ -0,0 +1,139 @@
+"""
+Frame-change detection for live-scan mode.
+
+In live-scan mode the client streams small camera frames over a WebSocket
+instead of pressing capture. Sending every frame to the vision API would be
+slow and expensive, so each frame is first reduced to a tiny grayscale
+thumbnail and compared with its predecessor and with the last frame that was
+analysed:
+
+- motion: mean absolute pixel difference to the previous frame. The scene has
+  settled once motion stays below stable_threshold for stable_frames frames
+  in a row (the camera is held still on something).
+- change: difference to the last analysed frame. A settled scene is only
+  analysed again once it differs by at least change_threshold (the child
+  pointed the camera at something else).
+
+ScanBudget caps how many frames per challenge may go upstream at all.
+"""
+
+import io
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional
+
+from .challenge_store import LRUDict
+
+# numpy and Pillow are imported on first use, they add to the app's startup time
+if TYPE_CHECKING:
+    import numpy as np
+
+# Thumbnail the comparisons run on: coarse enough to ignore sensor noise and JPEG artefacts
+THUMBNAIL_SIZE = (32, 24)
+
+
+def frame_thumbnail(frame: bytes) -> Optional["np.ndarray"]:
+    """Tiny grayscale thumbnail of an encoded frame (None if it cannot be decoded)"""
+    import numpy as np
+    from PIL import Image
+
+    try:
+        image = Image.open(io.BytesIO(frame))
+        # Let the JPEG decoder scale down while decoding (DCT scaling), so this stays ~1 ms
+        image.draft("L", (THUMBNAIL_SIZE[0] * 2, THUMBNAIL_SIZE[1] * 2))
+        image = image.convert("L").resize(THUMBNAIL_SIZE, Image.Resampling.BILINEAR)
+    except Exception:
+        return None
+    return np.asarray(image, dtype=np.float32)
+
+
+def frame_difference(a: "np.ndarray", b: "np.ndarray") -> float:
+    """Mean absolute pixel difference (0-255) of two thumbnails, ignoring overall exposure shifts"""
+    return float(abs((a - a.mean()) - (b - b.mean())).mean())
+
+
+@dataclass
+class FrameDecision:
+    """What to do with a frame: analyze it, or why not"""
+    analyze: bool
+    state: str                 # "analyze", "moving", "settling", "unchanged", "throttled" or "invalid"
+    motion: float = 0.0        # Difference to the previous frame
+    change: float = 0.0        # Difference to the last analysed frame
+
+
+class FrameChangeDetector:
+    """Per-connection stability and change detection over a stream of frames"""
+
+    def __init__(self, stable_threshold: float = 6.0, stable_frames: int = 3, change_threshold: float = 12.0,
+                 min_interval: float = 1.0):
+        self.stable_threshold = stable_threshold
+        self.stable_frames = stable_frames
+        self.change_threshold = change_threshold
+        self.min_interval = min_interval
+        self._previous: Optional["np.ndarray"] = None
+        self._analyzed: Optional["np.ndarray"] = None
+        self._steady = 0
+        self._last_analysis = float("-inf")
+
+    def observe(self, thumbnail: Optional["np.ndarray"]) -> FrameDecision:
+        """Update the state with a new frame and decide whether it should be analysed."""
+        if thumbnail is None:
+            return FrameDecision(False, "invalid")
+        motion = frame_difference(thumbnail, self._previous) if self._previous is not None else float("inf")
+        self._previous = thumbnail
+        self._steady = self._steady + 1 if motion <= self.stable_threshold else 0
+        change = frame_difference(thumbnail, self._analyzed) if self._analyzed is not None else float("inf")
+
+        if motion > self.stable_threshold:
+            return FrameDecision(False, "moving", motion, change)
+        if self._steady < self.stable_frames:
+            return FrameDecision(False, "settling", motion, change)
+        if change < self.change_threshold:
+            return FrameDecision(False, "unchanged", motion, change)
+        if time.monotonic() - self._last_analysis < self.min_interval:
+            return FrameDecision(False, "throttled", motion, change)
+        return FrameDecision(True, "analyze", motion, change)
+
+    def mark_analyzed(self, thumbnail: "np.ndarray") -> None:
+        """Remember the frame sent upstream; the scene must change before the next analysis."""
+        self._analyzed = thumbnail
+        self._last_analysis = time.monotonic()
+
+    def forget_analyzed(self) -> None:
+        """The analysis did not happen (e.g. rejected as busy); allow the same scene again."""
+        self._analyzed = None
+        self._last_analysis = float("-inf")
+
+
+class ScanBudget:
+    """Per-challenge cap on live-scan recognition calls (shared by reconnects in this worker)"""
+
+    def __init__(self, max_calls: int = 5, max_challenges: int = 50000):
+        self.max_calls = max_calls
+        self._used: Dict[str, int] = LRUDict(max_challenges)
+        self.granted = 0
+        self.exhausted = 0
+
+    def remaining(self, challenge_id: str) -> int:
+        return max(0, self.max_calls - self._used.get(challenge_id, 0))
+
+    def try_acquire(self, challenge_id: str) -> bool:
+        """Take one call from the challenge's budget; False once it is used up."""
+        used = self._used.get(challenge_id, 0)
+        if used >= self.max_calls:
+            self.exhausted += 1
+            return False
+        self._used[challenge_id] = used + 1
+        self.granted += 1
+        return True
+
+    def release(self, challenge_id: str) -> None:
+        """Give back a call that never reached the vision API."""
+        used = self._used.get(challenge_id, 0)
+        if used > 0:
+            self._used[challenge_id] = used - 1
+            self.granted -= 1
+
+    def stats(self) -> Dict:
+        return {"challenges": len(self._used), "calls_granted": self.granted, "budget_exhausted": self.exhausted}
+
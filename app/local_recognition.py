@@ -0,0 +1,175 @@
+"""
+CPU-only recognition backend that matches photos against the bundled catalog images.
+
+ORB keypoint descriptors are computed once for every content.items image in
+app/static/images and kept in memory (and in an on-disk index so restarts
+skip the work). A submission is scored against every item by counting
+descriptor matches that pass Lowe's ratio test; the verdict for the requested
+item compares its score with the best other item. No network is involved and
+a verdict takes a few tens of milliseconds.
+"""
+
+import os
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from .preprocessing import PreprocessedImage
+from .recognition_backends import RecognitionBackend
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LocalReferenceBackend(RecognitionBackend):
+    """Scores submissions against ORB descriptors of the catalog reference images"""
+
+    name = "local"
+
+    def __init__(self, items: List[Dict], images_dir: str, config: Dict, max_side: int = 512):
+        self.items = items
+        self.images_dir = images_dir if os.path.isabs(images_dir) else os.path.join(PROJECT_ROOT, images_dir)
+        self.index_path = config.get('index_path')
+        if self.index_path and not os.path.isabs(self.index_path):
+            self.index_path = os.path.join(PROJECT_ROOT, self.index_path)
+        self.n_features = config.get('features', 500)
+        self.ratio = config.get('ratio', 0.75)
+        self.strong_score = config.get('strong_score', 0.15)
+        self.max_side = max_side
+        self.descriptors: Dict[str, Optional[np.ndarray]] = {}
+        # OpenCV detectors/matchers are not thread-safe, so each worker thread gets its own
+        self._local = threading.local()
+
+    def _tools(self):
+        if not hasattr(self._local, "orb"):
+            self._local.orb = cv2.ORB_create(nfeatures=self.n_features)
+            self._local.matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+        return self._local.orb, self._local.matcher
+
+    def _describe(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        orb, _ = self._tools()
+        _, descriptors = orb.detectAndCompute(gray, None)
+        return descriptors
+
+    def _load_reference(self, path: str) -> np.ndarray:
+        """Grayscale reference image at the same scale submissions are preprocessed to"""
+        image = ImageOps.exif_transpose(Image.open(path)).convert("L")
+        image.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+        return np.asarray(image)
+
+    def _fingerprint(self) -> str:
+        """Identifies the catalog contents and parameters the index was built from"""
+        digest = hashlib.sha256(f"{self.n_features}:{self.max_side}".encode())
+        for item in self.items:
+            digest.update(item["name"].encode())
+            with open(os.path.join(self.images_dir, item["image"]), "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        return digest.hexdigest()
+
+    def _load_index(self, fingerprint: str) -> bool:
+        """Load descriptors from the on-disk index if it is current (an unreadable one counts as stale)."""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return False
+        try:
+            with np.load(self.index_path, allow_pickle=False) as index:
+                if str(index["fingerprint"]) != fingerprint:
+                    return False
+                self.descriptors = {
+                    item["name"]: index[f"item_{item['id']}"] if f"item_{item['id']}" in index.files else None
+                    for item in self.items
+                }
+        except Exception as e:
+            logger.warning("Local recognition index %s is unreadable, rebuilding it: %s", self.index_path, e)
+            return False
+        logger.info("Loaded local recognition index for %d items", len(self.descriptors))
+        return True
+
+    def build_index(self) -> None:
+        """Load descriptors from the on-disk index if it is current, otherwise compute and save them."""
+        fingerprint = self._fingerprint()
+        if self._load_index(fingerprint):
+            return
+
+        self.descriptors = {
+            item["name"]: self._describe(self._load_reference(os.path.join(self.images_dir, item["image"])))
+            for item in self.items
+        }
+        logger.info("Built local recognition index for %d items", len(self.descriptors))
+        if self.index_path:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            arrays = {
+                f"item_{item['id']}": self.descriptors[item["name"]]
+                for item in self.items
+                if self.descriptors[item["name"]] is not None
+            }
+            # Per-process name, then an atomic rename: every worker builds the index at startup
+            temporary = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                np.savez_compressed(f, fingerprint=np.array(fingerprint), **arrays)
+            os.replace(temporary, self.index_path)
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.build_index)
+
+    def score(self, gray: np.ndarray) -> Dict[str, float]:
+        """Fraction of the submission's descriptors that unambiguously match each item"""
+        query = self._describe(gray)
+        _, matcher = self._tools()
+        scores = {name: 0.0 for name in self.descriptors}
+        if query is None or len(query) < 2:
+            return scores
+        for name, reference in self.descriptors.items():
+            if reference is None or len(reference) < 2:
+                continue
+            good = 0
+            for pair in matcher.knnMatch(query, reference, k=2):
+                if len(pair) == 2 and pair[0].distance < self.ratio * pair[1].distance:
+                    good += 1
+            scores[name] = good / len(query)
+        return scores
+
+    def analyze_sync(self, prepared: PreprocessedImage, image_label: str) -> Dict:
+        return self.analyze_many_sync(prepared, [image_label])[image_label]
+
+    def analyze_many_sync(self, prepared: PreprocessedImage, image_labels: List[str]) -> Dict[str, Dict]:
+        """Verdicts for several labels from a single scoring pass over the catalog"""
+        if prepared.gray is None:
+            return {label: {
+                "is_match": False,
+                "confidence": 0.0,
+                "reasoning": "Image could not be decoded for local matching",
+                "primary_object": "unknown"
+            } for label in image_labels}
+        scores = self.score(prepared.gray)
+        return {label: self._verdict(scores, label) for label in image_labels}
+
+    def _verdict(self, scores: Dict[str, float], image_label: str) -> Dict:
+        label_key = next((name for name in scores if name.lower() == image_label.lower()), None)
+        label_score = scores.get(label_key, 0.0) if label_key else 0.0
+        best_name = max(scores, key=scores.get) if scores else "unknown"
+        best_other = max((v for k, v in scores.items() if k != label_key), default=0.0)
+
+        # Relative evidence against the runner-up, damped when the absolute match count is weak
+        separation = label_score / (label_score + best_other) if label_score > 0 else 0.0
+        confidence = round(separation * min(1.0, label_score / self.strong_score), 3)
+        is_match = label_key is not None and best_name == label_key and label_score > 0
+        return {
+            "is_match": is_match,
+            "confidence": confidence,
+            "reasoning": f"Local reference match score {label_score:.3f} (best other {best_other:.3f})",
+            "primary_object": best_name if scores.get(best_name, 0.0) > 0 else "unknown"
+        }
+
+    async def analyze(self, prepared: PreprocessedImage, image_label: str) -> Dict:
+        # OpenCV releases the GIL, so a worker thread keeps the event loop responsive
+        return await asyncio.to_thread(self.analyze_sync, prepared, image_label)
+
+    async def analyze_many(self, prepared: PreprocessedImage, image_labels: List[str]) -> Dict[str, Dict]:
+        return await asyncio.to_thread(self.analyze_many_sync, prepared, image_labels)
@@ -0,0 +1,113 @@
+"""
+Prometheus metrics for the API (served at /metrics).
+
+- househunt_stage_seconds{stage}: time spent in each stage of a photo
+  submission (upload_read, queue_wait, preprocess, quality_gate, recognition,
+  vision_call, parse, db_query, db_write, total), to find which stage drives p99.
+- househunt_vision_call_seconds{model,outcome} and
+  househunt_vision_tokens_total{model,kind}: per-model latency and token usage.
+- In-flight gauges for submissions and vision calls.
+- househunt_live_scan_frames_total{decision}: streamed live-scan frames that
+  were analysed, or skipped as moving/settling/unchanged/busy.
+- Counters from the existing stats() methods (cache, scheduler, write-behind,
+  challenge store, ...) exported as gauges at scrape time via register_stats,
+  so nothing extra is done on the request path.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory so histograms and counters are aggregated across processes.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+# From sub-millisecond cache hits to slow vision calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "househunt_stage_seconds", "Time spent in each stage of handling a photo", ["stage"], buckets=LATENCY_BUCKETS
+)
+VISION_CALL_SECONDS = Histogram(
+    "househunt_vision_call_seconds", "Vision API call latency", ["model", "outcome"], buckets=LATENCY_BUCKETS
+)
+VISION_TOKENS = Counter("househunt_vision_tokens_total", "Vision API tokens used", ["model", "kind"])
+VISION_IN_FLIGHT = Gauge("househunt_vision_calls_in_flight", "Vision API calls in progress", multiprocess_mode="livesum")
+SUBMISSIONS_IN_FLIGHT = Gauge("househunt_submissions_in_flight", "Photo submissions in progress",
+                              multiprocess_mode="livesum")
+SUBMISSIONS = Counter("househunt_submissions_total", "Photo submissions by outcome", ["outcome"])
+LIVE_SCAN_FRAMES = Counter("househunt_live_scan_frames_total", "Live-scan frames by what was done with them",
+                           ["decision"])
+
+
+@contextmanager
+def time_stage(stage: str) -> Iterator[None]:
+    """Observe the duration of the with-block under househunt_stage_seconds{stage}"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_token_usage(model: str, usage: Any) -> None:
+    """Count prompt/completion tokens from an OpenAI response's usage (if reported)"""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = getattr(usage, kind, None)
+        if value:
+            VISION_TOKENS.labels(model, kind.replace("_tokens", "")).inc(value)
+
+
+def _flatten(prefix: str, stats: Dict[str, Any]) -> Iterator[Tuple[str, float]]:
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, bool):
+            yield name, float(value)
+        elif isinstance(value, (int, float)):
+            yield name, float(value)
+
+
+class StatsCollector:
+    """Exports numeric values of registered stats() dicts as gauges when scraped"""
+
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def collect(self):
+        for source, stats in list(self.sources.items()):
+            try:
+                values = list(_flatten(f"househunt_{source}", stats()))
+            except Exception:
+                continue
+            for name, value in values:
+                metric = GaugeMetricFamily(name.replace("-", "_"), f"{source} stats")
+                metric.add_metric([], value)
+                yield metric
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def register_stats(source: str, stats: Callable[[], Dict[str, Any]]) -> None:
+    """Expose a component's stats() at /metrics as househunt_<source>_<key> gauges."""
+    stats_collector.sources[source] = stats
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Body and content type for the /metrics endpoint"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        # Component stats are per process; report this worker's
+        registry.register(stats_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from dataclasses import dataclass
 from typing import Dict, Any, Optional
 import time
 
@@ -20,7 +21,24 @@ class ChallengeResult(BaseModel):
 class SessionStats(BaseModel):
     total_successful_challenges: int
     average_duration: float
+    total_points: int = 0
 
-# In-memory storage (for development - replace with Redis/database in production)
-active_challenges: Dict[str, Dict] = {}
-user_sessions: Dict[str, Dict[str, Any]] = {} 
\ No newline at end of file
+@dataclass(slots=True)
+class ChallengeRecord:
+    """A live challenge as kept by the ChallengeStore (compact: no per-instance __dict__)"""
+    challenge_id: str
+    item: Dict[str, Any]
+    start_time: float
+    time_limit: int
+    user_id: str
+    session_id: str
+    completed: bool = False
+    success: bool = False
+    completed_at: Optional[float] = None
+    # False for a prefetched challenge whose clock has not started yet (start_time is its issue time)
+    started: bool = True
+
+    @property
+    def deadline(self) -> float:
+        """Wall-clock time at which the challenge runs out"""
+        return self.start_time + self.time_limit
@@ -0,0 +1,341 @@
+"""
+Offline stand-ins for the OpenAI vision API and Supabase.
+
+Benchmarking the service against the real APIs costs money and measures
+someone else's latency. These stand-ins let the full app run on one machine
+with no network:
+
+- ReplayVisionClient answers chat.completions.create with vision responses
+  recorded from real runs (VisionRecorder appends them to a JSONL file), or
+  with synthesized answers when nothing was recorded for the request, after
+  a delay drawn from a configurable latency distribution.
+- OfflineDatabaseClient implements the part of the Supabase client the app
+  uses (table().insert/select/update/eq, then execute) on SQLite, in memory
+  or in a file, including the points-events -> sessions.points trigger.
+
+They are selected with the offline block in config.yaml, or with the
+VISION_BACKEND=replay and DATABASE_BACKEND=memory|sqlite environment variables.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import sqlite3
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def offline_setting(config: Dict, key: str, env: str, default: str) -> str:
+    """A setting from the offline block of config.yaml, overridden by an environment variable"""
+    return os.getenv(env) or config.get("offline", {}).get(key, default)
+
+
+def project_path(path: str) -> str:
+    return path if os.path.isabs(path) or path == ":memory:" else os.path.join(PROJECT_ROOT, path)
+
+
+class LatencyModel:
+    """Simulated service time: lognormal around a median, or uniform, clipped to [min, max]"""
+
+    def __init__(self, distribution: str = "lognormal", median: float = 0.9, sigma: float = 0.35,
+                 min: float = 0.05, max: float = 10.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.distribution = distribution
+        self.median = median
+        self.sigma = sigma
+        self.min = min
+        self.max = max
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.distribution == "uniform":
+            delay = self.random.uniform(self.min, self.max)
+        elif self.distribution == "fixed":
+            delay = self.median
+        else:
+            delay = self.random.lognormvariate(0, self.sigma) * self.median
+        return min(self.max, max(self.min, delay))
+
+    def fails(self) -> bool:
+        return self.error_rate > 0 and self.random.random() < self.error_rate
+
+
+def prompt_text(messages: List[Dict]) -> str:
+    """The text part of a vision request (recordings are keyed by model and prompt, not image)"""
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            return content
+        for part in content or []:
+            if part.get("type") == "text":
+                return part["text"]
+    return ""
+
+
+class VisionRecorder:
+    """Appends real vision responses to a JSONL file for later replay"""
+
+    def __init__(self, path: str):
+        self.path = project_path(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, request: Dict, content: Optional[str]) -> None:
+        line = json.dumps({
+            "model": request.get("model"),
+            "prompt": prompt_text(request.get("messages", [])),
+            "content": content
+        })
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+
+
+class ReplayVisionClient:
+    """
+    Stand-in for AsyncOpenAI: client.chat.completions.create(**request) returns a
+    recorded (or synthesized) response after a simulated delay.
+    """
+
+    # Label in the prompt built by image_recognition.build_vision_messages
+    LABEL_PATTERN = re.compile(r"show an? (.+?)\?")
+    # Numbered labels in the prompt built by image_recognition.build_batch_messages
+    BATCH_LABEL_PATTERN = re.compile(r"photo (\d+): an? (.+?)(?=; photo \d+:|\))")
+
+    def __init__(self, recordings: Optional[str] = None, latency: Optional[Dict] = None,
+                 match_rate: float = 0.8, seed: Optional[int] = None):
+        self.latency = LatencyModel(seed=seed, **(latency or {}))
+        self.match_rate = match_rate
+        self.random = random.Random(seed)
+        # (model, prompt) -> recorded contents, plus prompt -> contents for any model
+        self.recorded: Dict[Tuple[Optional[str], str], List[str]] = {}
+        if recordings and os.path.exists(project_path(recordings)):
+            with open(project_path(recordings)) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recorded.setdefault((entry["model"], entry["prompt"]), []).append(entry["content"])
+                        self.recorded.setdefault((None, entry["prompt"]), []).append(entry["content"])
+        self.calls = 0
+        self.replayed = 0
+        self.synthesized = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _synthesize_sweep(self, labels: List[str]) -> str:
+        """Sweep answer: one of the asked items is seen match_rate of the time"""
+        seen = self.random.choice(labels) if labels and self.random.random() < self.match_rate else None
+        return json.dumps({
+            "primary_object": seen or "something else",
+            "items": [{
+                "name": label,
+                "present": label == seen,
+                "confidence": round(self.random.uniform(0.7, 0.98) if label == seen else self.random.uniform(0.02, 0.3), 2)
+            } for label in labels]
+        })
+
+    def _synthesize_check(self, label: str) -> Dict[str, Any]:
+        is_match = self.random.random() < self.match_rate
+        return {
+            "is_match": is_match,
+            "confidence": round(self.random.uniform(0.7, 0.98) if is_match else self.random.uniform(0.02, 0.45), 2),
+            "primary_object": label if is_match else "something else",
+            "reasoning": "Replayed offline answer."
+        }
+
+    def _synthesize(self, prompt: str, response_format: Optional[Dict] = None) -> str:
+        json_schema = (response_format or {}).get("json_schema", {})
+        if json_schema.get("name") == "item_sweep":
+            labels = json_schema["schema"]["properties"]["items"]["items"]["properties"]["name"]["enum"]
+            return self._synthesize_sweep(labels)
+        if json_schema.get("name") == "item_check_batch":
+            return json.dumps({"answers": [
+                {"photo": int(number), **self._synthesize_check(label)}
+                for number, label in self.BATCH_LABEL_PATTERN.findall(prompt)
+            ]})
+        match = self.LABEL_PATTERN.search(prompt)
+        return json.dumps(self._synthesize_check(match.group(1) if match else "object"))
+
+    def respond(self, request: Dict) -> Tuple[float, Any]:
+        """The simulated delay and response for a request (raises for a simulated API error)"""
+        self.calls += 1
+        delay = self.latency.sample()
+        if self.latency.fails():
+            raise RuntimeError("Simulated vision API error")
+        prompt = prompt_text(request.get("messages", []))
+        contents = self.recorded.get((request.get("model"), prompt)) or self.recorded.get((None, prompt))
+        if contents:
+            self.replayed += 1
+            content = self.random.choice(contents)
+        else:
+            self.synthesized += 1
+            content = self._synthesize(prompt, request.get("response_format"))
+        message = SimpleNamespace(content=content, role="assistant")
+        return delay, SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")],
+                                      model=request.get("model"))
+
+    async def create(self, **request):
+        delay, response = self.respond(request)
+        await asyncio.sleep(delay)
+        return response
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "replayed": self.replayed, "synthesized": self.synthesized}
+
+
+class SyncReplayVisionClient(ReplayVisionClient):
+    """Stand-in for the blocking OpenAI client (used by the validation script)"""
+
+    def create(self, **request):
+        delay, response = self.respond(request)
+        time.sleep(delay)
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+class OfflineQuery:
+    """The table().insert/upsert/select/update + eq query builder subset, executed on SQLite"""
+
+    def __init__(self, db: "OfflineDatabaseClient", table: str):
+        self.db = db
+        self.table = table
+        self.operation = "select"
+        self.payload: Any = None
+        self.columns = "*"
+        self.filters: List[Tuple[str, Any]] = []
+        self.ignore_duplicates = False
+
+    def select(self, columns: str = "*") -> "OfflineQuery":
+        self.operation, self.columns = "select", columns
+        return self
+
+    def insert(self, rows: Any) -> "OfflineQuery":
+        self.operation, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows: Any, on_conflict: str = "", ignore_duplicates: bool = False) -> "OfflineQuery":
+        """Only ignore_duplicates is emulated: rows whose primary key exists are skipped."""
+        if not ignore_duplicates:
+            raise NotImplementedError("The offline database only emulates upsert(..., ignore_duplicates=True)")
+        self.operation, self.payload, self.ignore_duplicates = "insert", rows, True
+        return self
+
+    def update(self, values: Dict[str, Any]) -> "OfflineQuery":
+        self.operation, self.payload = "update", values
+        return self
+
+    def eq(self, column: str, value: Any) -> "OfflineQuery":
+        self.filters.append((column, value))
+        return self
+
+    async def execute(self):
+        if self.db.latency is not None:
+            await asyncio.sleep(self.db.latency.sample())
+        return SimpleNamespace(data=self.db.run(self))
+
+
+class OfflineDatabaseClient:
+    """
+    Schemaless stand-in for the Supabase client: rows are JSON documents per table.
+
+    Selected columns are returned as-is, equality filters compare JSON values,
+    PRIMARY_KEYS are unique (a duplicate rejects the whole insert with
+    sqlite3.IntegrityError, like PostgREST's 409) and inserting into
+    points-events adds to the matching sessions.points (creating the row if
+    needed) like the trigger in DEPLOYMENT.md.
+    """
+
+    PRIMARY_KEYS = {"sessions": "session_id"}
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS offline_rows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS offline_rows_table ON offline_rows (tbl);
+    """
+
+    def __init__(self, path: str = ":memory:", latency: Optional[Dict] = None):
+        self.path = project_path(path)
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        for table, column in self.PRIMARY_KEYS.items():
+            self._conn.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS \"offline_rows_{table}_pk\" "
+                f"ON offline_rows (json_extract(data, '$.\"{column}\"')) WHERE tbl = '{table}'"
+            )
+        self.latency = LatencyModel(**latency) if latency else None
+        self.queries = 0
+
+    def table(self, name: str) -> OfflineQuery:
+        return OfflineQuery(self, name)
+
+    def _where(self, query: OfflineQuery) -> Tuple[str, List]:
+        clause, params = "tbl = ?", [query.table]
+        for column, value in query.filters:
+            clause += " AND json_extract(data, ?) = json_extract(?, '$')"
+            params += [f'$."{column}"', json.dumps(value)]
+        return clause, params
+
+    def run(self, query: OfflineQuery) -> List[Dict[str, Any]]:
+        self.queries += 1
+        if query.operation == "insert":
+            rows = query.payload if isinstance(query.payload, list) else [query.payload]
+            verb = "INSERT OR IGNORE" if query.ignore_duplicates else "INSERT"
+            # One transaction per statement, like PostgREST: a bad row rejects the whole bulk insert
+            self._conn.execute("BEGIN")
+            try:
+                inserted = [row for row in rows if self._conn.execute(
+                    f"{verb} INTO offline_rows (tbl, data) VALUES (?, ?)", (query.table, json.dumps(row))
+                ).rowcount]
+                if query.table == "points-events":
+                    for row in inserted:
+                        self._add_points(row["session_id"], row["user_id"], row["points"])
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return inserted
+        where, params = self._where(query)
+        if query.operation == "update":
+            self._conn.execute(f"UPDATE offline_rows SET data = json_patch(data, ?) WHERE {where}",
+                               [json.dumps(query.payload)] + params)
+        documents = [json.loads(data) for (data,) in
+                     self._conn.execute(f"SELECT data FROM offline_rows WHERE {where} ORDER BY id", params)]
+        if query.columns.strip() == "*":
+            return documents
+        columns = [column.strip() for column in query.columns.split(",")]
+        return [{column: document.get(column) for column in columns} for document in documents]
+
+    def _add_points(self, session_id: str, user_id: str, points: int) -> None:
+        updated = self._conn.execute(
+            "UPDATE offline_rows SET data = json_set(data, '$.points', "
+            "COALESCE(json_extract(data, '$.points'), 0) + ?) "
+            "WHERE tbl = 'sessions' AND json_extract(data, '$.session_id') = ?",
+            (points, session_id)
+        ).rowcount
+        if not updated:
+            self._conn.execute(
+                "INSERT INTO offline_rows (tbl, data) VALUES ('sessions', ?)",
+                (json.dumps({"session_id": session_id, "user_id": user_id, "points": points}),)
+            )
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,114 @@
+"""
+Session points ledger.
+
+Awarding points used to read sessions.points and write back the sum: two round
+trips and a lost update when two photos for one session resolve together.
+The ledger instead appends one row per award to the "points-events" table
+(through the write-behind queue, so it is batched and off the request path);
+a trigger in the database adds each row to sessions.points atomically (see
+DEPLOYMENT.md for the SQL). Current totals are kept in an in-process LRU
+cache that is updated on every award, so reads do not touch the database.
+
+With several worker processes (challenge.store.backend: sqlite) a session's
+awards may land on other workers, so cached totals expire after cache_ttl
+seconds and are re-read from sessions.points. The TTL should exceed the
+write-behind flush interval: an entry is refreshed by each local award, so by
+the time it expires this worker's own awards have been written.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .database import SupabaseDatabase
+from .write_behind import WriteBehindQueue
+
+
+class PointsLedger:
+    """Append-only points awards with a write-through cache of session totals"""
+
+    def __init__(self, database: SupabaseDatabase, write_behind: WriteBehindQueue, max_cached_sessions: int = 50000,
+                 cache_ttl: Optional[float] = None):
+        self.database = database
+        self.write_behind = write_behind
+        self.max_cached_sessions = max_cached_sessions
+        # None: this process makes every award, cached totals never go stale
+        self.cache_ttl = cache_ttl
+        # session_id -> (total, monotonic time it was cached)
+        self._totals: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self.awards = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.expired = 0
+
+    def _cache(self, session_id: str, total: int) -> None:
+        self._totals[session_id] = (total, time.monotonic())
+        self._totals.move_to_end(session_id)
+        while len(self._totals) > self.max_cached_sessions:
+            self._totals.popitem(last=False)
+
+    def _cached(self, session_id: str) -> Optional[int]:
+        """Cached total of the session, None if unknown or expired"""
+        entry = self._totals.get(session_id)
+        if entry is None:
+            return None
+        total, cached_at = entry
+        if self.cache_ttl is not None and time.monotonic() - cached_at > self.cache_ttl:
+            del self._totals[session_id]
+            self.expired += 1
+            return None
+        return total
+
+    def start_session(self, session_id: str) -> None:
+        """A session created by this process starts at zero, no lookup needed."""
+        self._cache(session_id, 0)
+
+    def award(self, session_id: str, user_id: str, points: int, challenge_id: Optional[str] = None) -> Optional[int]:
+        """
+        Record an award and return the session's new total if it is cached.
+
+        The database write is a single queued insert; nothing is awaited.
+        """
+        self.awards += 1
+        self.write_behind.insert("points-events", {
+            "session_id": session_id,
+            "user_id": user_id,
+            "challenge_id": challenge_id,
+            "points": points
+        })
+        total = self._cached(session_id)
+        if total is None:
+            return None
+        self._cache(session_id, total + points)
+        return total + points
+
+    async def _load_total(self, session_id: str) -> int:
+        rows = await self.database.select("sessions", "points", {"session_id": session_id})
+        return rows[0]["points"] if rows else 0
+
+    async def get_total(self, session_id: str) -> int:
+        """
+        Current points of a session: from the cache, or loaded once from sessions.points.
+
+        A session first seen here after a restart may briefly miss awards still
+        sitting in the write-behind buffer.
+        """
+        total = self._cached(session_id)
+        if total is not None:
+            self.cache_hits += 1
+            return total
+        self.cache_misses += 1
+        total = await self._load_total(session_id)
+        # An award may have been cached while we were loading
+        if session_id not in self._totals:
+            self._cache(session_id, total)
+        return self._totals[session_id][0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "awards": self.awards,
+            "cached_sessions": len(self._totals),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_expired": self.expired
+        }
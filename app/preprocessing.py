@@ -0,0 +1,145 @@
+"""
+Image preprocessing stage for the House Hunt Challenge app.
+
+Uploaded photos are decoded, rotated according to their EXIF orientation,
+downsized to the resolution the vision API actually looks at, stripped of
+metadata and re-encoded as JPEG before being sent upstream. The work is
+CPU-bound, so request handlers run it in a thread or process pool via
+preprocess_image_async instead of on the event loop.
+"""
+
+import io
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+# numpy and Pillow are imported on first use, they add to the app's startup time
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# EXIF Orientation
+ORIENTATION_TAG = 0x0112
+
+
+@dataclass
+class PreprocessedImage:
+    """Result of the preprocessing stage"""
+    data: bytes                        # Bytes to send upstream (re-encoded JPEG, or the original upload)
+    size: Tuple[int, int]              # (width, height) of data
+    original_size: Tuple[int, int]     # (width, height) of the upload after EXIF rotation
+    original_bytes: int                # Size of the upload in bytes
+    processed: bool = True             # False when the upload could not be decoded and is passed through
+    phash: Optional[int] = None        # 64-bit perceptual (difference) hash, None if not decoded
+    gray: Optional["np.ndarray"] = field(default=None, repr=False)  # Downsized grayscale pixels for local checks
+
+
+def difference_hash(image: "Image.Image") -> int:
+    """
+    64-bit dHash: compares neighbouring pixels of a 9x8 grayscale thumbnail.
+
+    Near-identical frames (re-encodes, small shifts, exposure changes) hash to values a
+    few bits apart, so Hamming distance works as a similarity measure.
+    """
+    import numpy as np
+    from PIL import Image
+
+    small = np.asarray(image.convert("L").resize((9, 8), Image.Resampling.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def preprocess_image(image_data: bytes, max_side: int = 512, jpeg_quality: int = 80) -> PreprocessedImage:
+    """
+    Decode, orient, downsize and re-encode an uploaded photo.
+
+    The longest side is capped at max_side; smaller images are never upscaled.
+    Saving without exif/icc arguments drops all metadata from the output.
+    """
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(io.BytesIO(image_data))
+        # Full upload size, before draft() scales the decode; orientations 5-8 swap width and height
+        width, height = image.size
+        original_size = (height, width) if image.getexif().get(ORIENTATION_TAG, 1) in (5, 6, 7, 8) else (width, height)
+        # Let the JPEG decoder skip detail we would throw away anyway (DCT scaling)
+        image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+    except Exception as e:
+        logger.warning("Could not decode uploaded image, sending it unchanged: %s", e)
+        return PreprocessedImage(
+            data=image_data,
+            size=(0, 0),
+            original_size=(0, 0),
+            original_bytes=len(image_data),
+            processed=False
+        )
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=jpeg_quality, optimize=True)
+    return PreprocessedImage(
+        data=output.getvalue(),
+        size=image.size,
+        original_size=original_size,
+        original_bytes=len(image_data),
+        phash=difference_hash(image),
+        gray=np.asarray(image.convert("L"))
+    )
+
+
+# Pool shared by all requests, created on first use
+_executor: Optional[Executor] = None
+
+
+def get_executor(config: Dict) -> Executor:
+    """Return the shared preprocessing pool ("thread" or "process", per config)."""
+    global _executor
+    if _executor is None:
+        workers = config.get("workers", 2)
+        if config.get("executor", "thread") == "process":
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preprocess")
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Shut down the preprocessing pool (called on app shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+async def preprocess_image_async(image_data: bytes, config: Dict) -> PreprocessedImage:
+    """
+    Run preprocess_image in the shared pool so the event loop stays free.
+
+    config is the image_recognition.preprocessing block from config.yaml.
+    """
+    if not config.get("enabled", True):
+        return PreprocessedImage(
+            data=image_data,
+            size=(0, 0),
+            original_size=(0, 0),
+            original_bytes=len(image_data),
+            processed=False
+        )
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(config),
+        preprocess_image,
+        image_data,
+        config.get("max_side", 512),
+        config.get("jpeg_quality", 80)
+    )
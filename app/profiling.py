@@ -0,0 +1,160 @@
+"""
+Opt-in request profiling and event-loop stall detection.
+
+ProfilingMiddleware runs a sampling profiler (pyinstrument, an optional
+dependency: pip install pyinstrument) on a random sample_rate share of
+requests, and on any request whose profiling header carries the secret from
+PROFILING_SECRET. Each profile is written as speedscope JSON (open it at
+https://www.speedscope.app for a flame graph) to output_dir, keeping only the
+newest max_files. Rendering and writing happen in a worker thread.
+
+LoopStallWatchdog is a daemon thread that watches a heartbeat the event loop
+updates every few milliseconds. When the loop misses it for longer than
+threshold_ms, something is blocking the loop, and the stack of the loop
+thread at that moment (the blocking callback) is logged.
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Dict, Optional
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    # Profiling is optional; the middleware disables itself without it
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling sampled or explicitly requested HTTP requests"""
+
+    def __init__(self, app, sample_rate: float = 0.0, header: str = "X-Profile", secret: Optional[str] = None,
+                 interval: float = 0.001, output_dir: str = ".cache/profiles", max_files: int = 200,
+                 max_concurrent: int = 1):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode()
+        self.secret = secret.encode() if secret else None
+        self.interval = interval
+        self.output_dir = output_dir if os.path.isabs(output_dir) else os.path.join(PROJECT_ROOT, output_dir)
+        self.max_files = max_files
+        self.max_concurrent = max_concurrent
+        self.active = 0
+        self.profiled = 0
+        if Profiler is None:
+            logger.warning("Profiling enabled but pyinstrument is not installed; requests will not be profiled")
+
+    def _wanted(self, scope) -> bool:
+        if Profiler is None or self.active >= self.max_concurrent:
+            return False
+        if self.secret is not None:
+            for name, value in scope.get("headers", []):
+                if name == self.header and value == self.secret:
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self.active += 1
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            self.active -= 1
+            self.profiled += 1
+            elapsed_ms = 1000 * (time.perf_counter() - started)
+            await asyncio.to_thread(self._save, profiler, scope["method"], scope["path"], elapsed_ms)
+
+    def _save(self, profiler, method: str, path: str, elapsed_ms: float) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:60] or "root"
+        filename = f"{time.strftime('%Y%m%d-%H%M%S')}_{method}_{slug}_{elapsed_ms:.0f}ms.speedscope.json"
+        with open(os.path.join(self.output_dir, filename), "w") as f:
+            f.write(profiler.output(renderer=SpeedscopeRenderer()))
+        logger.info("Profiled %s %s (%.0f ms) -> %s", method, path, elapsed_ms, filename)
+        self._rotate()
+
+    def _rotate(self) -> None:
+        """Delete the oldest profiles beyond max_files"""
+        profiles = sorted(
+            (entry for entry in os.scandir(self.output_dir) if entry.name.endswith(".speedscope.json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in profiles[:max(0, len(profiles) - self.max_files)]:
+            os.remove(entry.path)
+
+
+class LoopStallWatchdog:
+    """Logs the loop thread's stack whenever the event loop is blocked longer than threshold_ms"""
+
+    def __init__(self, threshold_ms: float = 200, heartbeat_interval: float = 0.01):
+        self.threshold = threshold_ms / 1000
+        self.heartbeat_interval = heartbeat_interval
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.stalls = 0
+        self.longest_stall_ms = 0.0
+
+    async def _beat(self) -> None:
+        while True:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def _watch(self) -> None:
+        reported = False
+        while not self._stopped.wait(self.threshold / 2):
+            blocked = time.monotonic() - self._heartbeat
+            if blocked < self.threshold + self.heartbeat_interval:
+                reported = False
+                continue
+            self.longest_stall_ms = max(self.longest_stall_ms, 1000 * blocked)
+            if reported:
+                continue
+            # Report each stall once, with what the loop thread is running right now
+            reported = True
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(stack unavailable)"
+            logger.warning("Event loop blocked for %.0f ms (threshold %.0f ms), loop thread stack:\n%s",
+                           1000 * blocked, 1000 * self.threshold, stack,
+                           extra={"blocked_ms": round(1000 * blocked)})
+
+    async def start(self) -> None:
+        """Start the heartbeat task and watcher thread (called from the app lifespan)."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-stall-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {"stalls": self.stalls, "longest_stall_ms": self.longest_stall_ms}
@@ -0,0 +1,95 @@
+"""
+Pluggable recognition backends for the House Hunt Challenge app.
+
+A backend takes a preprocessed photo and an item label and returns a raw
+analysis dict with the same keys the vision model produces:
+
+    {"is_match": bool, "confidence": float, "reasoning": str, "primary_object": str}
+
+analyze_image_async applies the confidence threshold and builds the player
+message from it, so backends never deal with presentation. The backend in use
+is chosen by image_recognition.backend in config.yaml ("openai", "local" or
+"cascade").
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from .preprocessing import PreprocessedImage
+
+
+class RecognitionBackend(ABC):
+    """Interface implemented by every recognition backend"""
+
+    name = "base"
+
+    async def start(self) -> None:
+        """Prepare the backend (load models, indexes); called from the app lifespan."""
+
+    @abstractmethod
+    async def analyze(self, prepared: PreprocessedImage, image_label: str) -> Dict:
+        """Return the raw analysis of prepared for image_label; raise on backend errors."""
+
+    async def analyze_many(self, prepared: PreprocessedImage, image_labels: List[str]) -> Dict[str, Dict]:
+        """Raw analyses of prepared for several labels, by label (one analyze call each unless overridden)."""
+        analyses = await asyncio.gather(*(self.analyze(prepared, label) for label in image_labels))
+        return dict(zip(image_labels, analyses))
+
+
+class CascadeBackend(RecognitionBackend):
+    """
+    Fast first pass with an escalation path.
+
+    Verdicts from the first backend whose confidence is at least accept_above (a
+    match) or at most reject_below (a rejection, disabled when None) are returned
+    directly; anything in between is ambiguous and is sent to the second backend.
+    """
+
+    name = "cascade"
+
+    def __init__(self, first: RecognitionBackend, second: RecognitionBackend,
+                 accept_above: float = 0.85, reject_below: Optional[float] = None):
+        self.first = first
+        self.second = second
+        self.accept_above = accept_above
+        self.reject_below = reject_below
+        self.answered_locally = 0
+        self.escalated = 0
+
+    async def start(self) -> None:
+        await self.first.start()
+        await self.second.start()
+
+    def _settled(self, analysis: Dict) -> bool:
+        """Whether a first-pass verdict is confident enough to skip the second backend"""
+        confidence = analysis.get("confidence", 0.0)
+        if analysis.get("is_match") and confidence >= self.accept_above:
+            return True
+        return self.reject_below is not None and not analysis.get("is_match") and confidence <= self.reject_below
+
+    async def analyze(self, prepared: PreprocessedImage, image_label: str) -> Dict:
+        analysis = await self.first.analyze(prepared, image_label)
+        if self._settled(analysis):
+            self.answered_locally += 1
+            return analysis
+        self.escalated += 1
+        return await self.second.analyze(prepared, image_label)
+
+    async def analyze_many(self, prepared: PreprocessedImage, image_labels: List[str]) -> Dict[str, Dict]:
+        analyses = await self.first.analyze_many(prepared, image_labels)
+        ambiguous = [label for label in image_labels if not self._settled(analyses[label])]
+        self.answered_locally += len(image_labels) - len(ambiguous)
+        self.escalated += len(ambiguous)
+        if ambiguous:
+            analyses.update(await self.second.analyze_many(prepared, ambiguous))
+        return analyses
+
+    def stats(self) -> Dict:
+        """How many verdicts the first pass settled vs. escalated"""
+        total = self.answered_locally + self.escalated
+        return {
+            "answered_by_" + self.first.name: self.answered_locally,
+            "escalated_to_" + self.second.name: self.escalated,
+            "escalation_rate": self.escalated / total if total else 0.0
+        }
@@ -0,0 +1,151 @@
+"""
+Result cache for image recognition.
+
+Repeated submissions of the same (or a nearly identical) frame for the same
+item are answered from memory instead of making another vision call. Entries
+are keyed by (perceptual hash, item label), expire after a TTL, are evicted
+least-recently-used first, and a lookup also matches stored hashes within a
+small Hamming distance. Concurrent requests for the same key share a single
+upstream call (single-flight).
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+CacheKey = Tuple[int, str]
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return (a ^ b).bit_count()
+
+
+class RecognitionCache:
+    """LRU + TTL cache of raw vision analyses with near-duplicate matching and single-flight"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300, max_distance: int = 4):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        # key -> (expires_at, analysis), oldest first
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict]]" = OrderedDict()
+        # label -> hashes cached for that label, so near-match scans stay per item
+        self._hashes_by_label: Dict[str, set] = {}
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _remove(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+        hashes = self._hashes_by_label.get(key[1])
+        if hashes is not None:
+            hashes.discard(key[0])
+            if not hashes:
+                del self._hashes_by_label[key[1]]
+
+    def _lookup(self, key: CacheKey) -> Optional[Dict]:
+        """Return a live cached analysis for key (exact or within max_distance), refreshing its LRU position."""
+        now = time.monotonic()
+        candidates = [key]
+        if self.max_distance > 0:
+            phash, label = key
+            candidates += [
+                (other, label)
+                for other in self._hashes_by_label.get(label, ())
+                if other != phash and hamming_distance(phash, other) <= self.max_distance
+            ]
+        for candidate in candidates:
+            entry = self._entries.get(candidate)
+            if entry is None:
+                continue
+            expires_at, analysis = entry
+            if expires_at <= now:
+                self._remove(candidate)
+                continue
+            self._entries.move_to_end(candidate)
+            if candidate != key:
+                self.near_hits += 1
+            return analysis
+        return None
+
+    def put(self, key: CacheKey, analysis: Dict) -> None:
+        """Store an analysis, evicting the least recently used entries beyond max_entries."""
+        self._entries[key] = (time.monotonic() + self.ttl, analysis)
+        self._entries.move_to_end(key)
+        self._hashes_by_label.setdefault(key[1], set()).add(key[0])
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def get(self, key: CacheKey) -> Optional[Dict]:
+        """Return the cached analysis for key (exact or near match) without computing one."""
+        cached = self._lookup(key)
+        if cached is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cached
+
+    async def get_or_compute(self, key: CacheKey, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """
+        Return the cached analysis for key, or run compute() once and cache its result.
+
+        Callers arriving while compute() is running for the same key wait for that call
+        instead of starting their own. Exceptions propagate to every waiter and are not cached.
+        """
+        cached = self._lookup(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The leading request was cancelled (client went away); take over the call
+                return await self.get_or_compute(key, compute)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            analysis = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            self.put(key, analysis)
+            future.set_result(analysis)
+            return analysis
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring how many upstream calls the cache saved"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,192 @@
+"""
+Failure handling helpers for calls to external services.
+
+- LatencyTracker keeps a rolling window of call latencies (for hedge delays).
+- hedged() runs a call and, if it has not finished after a delay, a second
+  identical call, returning whichever succeeds first.
+- CircuitBreaker stops sending calls to a service that keeps failing or
+  answering slowly, so requests fail fast instead of piling up.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open"""
+
+
+class LatencyTracker:
+    """Rolling window of recent call durations"""
+
+    def __init__(self, window: int = 200):
+        self.samples: deque = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q-th percentile (0-100) of the window, or None when empty"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class HedgeStats:
+    """How often a hedged second request was sent and how often it won"""
+
+    def __init__(self):
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0
+        }
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], delay: Optional[float], stats: HedgeStats) -> Any:
+    """
+    Run call(); if it is still pending after delay seconds, also start a second call().
+
+    The first successful result wins and the other attempt is cancelled. An attempt
+    that fails while the other is still running is ignored; if both fail, the last
+    error is raised. With delay=None no hedge is sent.
+    """
+    stats.calls += 1
+    primary = asyncio.ensure_future(call())
+    tasks = {primary}
+    error: Optional[BaseException] = None
+    try:
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        stats.hedged += 1
+        backup = asyncio.ensure_future(call())
+        tasks.add(backup)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        stats.hedge_wins += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # Also reached when the caller is cancelled (e.g. by an outer timeout) in either phase
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+class CircuitBreaker:
+    """
+    Closed -> open -> half-open breaker driven by errors and slow calls.
+
+    The last `window` calls are remembered; a call is bad if it raised or took longer
+    than slow_call_seconds. Once at least min_calls are recorded and the bad fraction
+    reaches failure_rate the breaker opens and allow() refuses calls for open_seconds.
+    After that a single probe call is let through (half-open): success closes the
+    breaker, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window: int = 20, min_calls: int = 10, failure_rate: float = 0.5,
+                 slow_call_seconds: float = 4.0, open_seconds: float = 30.0):
+        self.outcomes: deque = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.trips = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may be made now"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self.probe_in_flight:
+                self.rejected += 1
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def record(self, success: bool, seconds: float, slow_call_seconds: Optional[float] = None) -> None:
+        """Record the outcome of a call that allow() let through (slow_call_seconds overrides the default)."""
+        bad = not success or seconds > (slow_call_seconds or self.slow_call_seconds)
+        if self.state == self.HALF_OPEN:
+            self.probe_in_flight = False
+            if bad:
+                self._trip()
+            else:
+                self.state = self.CLOSED
+                self.outcomes.clear()
+            return
+        self.outcomes.append(bad)
+        if (self.state == self.CLOSED and len(self.outcomes) >= self.min_calls
+                and sum(self.outcomes) / len(self.outcomes) >= self.failure_rate):
+            self._trip()
+
+    def _trip(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        self.trips += 1
+        logger.warning("Circuit breaker opened (trip #%d) for %ss", self.trips, self.open_seconds)
+
+    async def call(self, call: Callable[[], Awaitable[Any]], slow_call_seconds: Optional[float] = None) -> Any:
+        """
+        Run call() through the breaker, raising CircuitOpenError when it is open.
+        slow_call_seconds overrides the threshold for calls expected to take longer.
+        """
+        if not self.allow():
+            raise CircuitOpenError("Service temporarily unavailable (circuit open)")
+        started = time.monotonic()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            if self.state == self.HALF_OPEN:
+                self.probe_in_flight = False
+            raise
+        except Exception:
+            self.record(False, time.monotonic() - started, slow_call_seconds)
+            raise
+        self.record(True, time.monotonic() - started, slow_call_seconds)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "trips": self.trips,
+            "rejected_calls": self.rejected,
+            "recent_bad_calls": sum(self.outcomes),
+            "recent_calls": len(self.outcomes)
+        }
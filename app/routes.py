@@ -1,19 +1,119 @@
 import time
 import uuid
-import random
 import os
+import asyncio
+import logging
 from typing import Optional
-from fastapi import APIRouter, Request, Response, Cookie, File, UploadFile, HTTPException
+from fastapi import APIRouter, Request, Response, Cookie, File, UploadFile, HTTPException, Query, WebSocket
+from starlette.websockets import WebSocketDisconnect
 
 from .config import CONFIG
-from .models import Challenge, ChallengeResult, SessionStats, active_challenges, user_sessions
+from .models import ChallengeRecord, ChallengeResult, SessionStats
+from .challenge_store import create_challenge_store
 from .utils import get_user_and_session_ids
-from .supabase_client import supabase
-from .image_recognition import analyze_image, get_points_for_match
+from .supabase_client import database
+from .image_recognition import analyze_image_async, analyze_sweep_async, get_points_for_match, get_recognition_stats
+from .preprocessing import get_executor
+from .live_scan import FrameChangeDetector, ScanBudget, frame_thumbnail
+from .image_variants import ImageVariants, item_with_variants
+from .challenge_issuer import ChallengeIssuer
+from .scheduler import RecognitionScheduler, SchedulerRejectedError, ChallengeExpiredError
+from .write_behind import WriteBehindQueue
+from .points_ledger import PointsLedger
+from .aggregates import create_aggregates
+from .metrics import (
+    LIVE_SCAN_FRAMES, SUBMISSIONS, SUBMISSIONS_IN_FLIGHT, register_stats, render_metrics, time_stage
+)
+
+logger = logging.getLogger(__name__)
 
 # Create router
 router = APIRouter()
 
+# Live challenges, swept after they expire (sweeper started in the app lifespan)
+challenge_store = create_challenge_store(CONFIG["challenge"].get("store", {}))
+
+# Admission control for recognition work (workers started in the app lifespan)
+recognition_scheduler = RecognitionScheduler(**CONFIG["image_recognition"].get("scheduler", {}))
+
+# Supabase writes that don't affect responses are batched off the request path (flusher started in the app lifespan)
+write_behind = WriteBehindQueue(database, **CONFIG.get("database", {}).get("write_behind", {}))
+
+# Atomic, append-only points awards with cached session totals
+POINTS_LEDGER_CONFIG = CONFIG.get("database", {}).get("points_ledger", {})
+points_ledger = PointsLedger(
+    database,
+    write_behind,
+    max_cached_sessions=POINTS_LEDGER_CONFIG.get("max_cached_sessions", 50000),
+    # Workers share sessions only with the sqlite store; then other workers' awards must show up
+    cache_ttl=POINTS_LEDGER_CONFIG.get("shared_cache_ttl", 5.0)
+    if CONFIG["challenge"].get("store", {}).get("backend", "memory") == "sqlite" else None
+)
+
+# Running counters behind /api/stats and /api/session-stats (same backend as the challenge store)
+game_aggregates = create_aggregates(CONFIG["challenge"].get("store", {}), CONFIG["challenge"].get("aggregates", {}))
+
+# Live-scan (WebSocket) settings and the per-challenge cap on its recognition calls
+LIVE_SCAN_CONFIG = CONFIG["image_recognition"].get("live_scan", {})
+scan_budget = ScanBudget(max_calls=LIVE_SCAN_CONFIG.get("max_calls_per_challenge", 5))
+
+# Which items a session plays next (no repeats) and their difficulty-scaled time limits and points
+ISSUANCE_CONFIG = CONFIG["challenge"].get("issuance", {})
+challenge_issuer = ChallengeIssuer(
+    CONFIG["content"]["items"],
+    CONFIG["challenge"].get("difficulty_levels", {}),
+    CONFIG["challenge"]["time"]["default_duration"],
+    CONFIG["challenge"]["time"]["min_duration"],
+    CONFIG["challenge"]["time"]["max_duration"],
+    max_sessions=CONFIG["challenge"].get("store", {}).get("max_sessions", 50000)
+)
+
+# Resized, content-hashed copies of the item images (manifest loaded in the app lifespan)
+VARIANTS_CONFIG = CONFIG["content"]["variants"]
+image_variants = ImageVariants(
+    CONFIG["content"]["items"],
+    CONFIG["content"]["paths"]["images_dir"],
+    "/static/" + os.path.relpath(CONFIG["content"]["paths"]["images_dir"], CONFIG["content"]["paths"]["static_dir"]),
+    VARIANTS_CONFIG["output_dir"],
+    VARIANTS_CONFIG["url_prefix"],
+    VARIANTS_CONFIG["widths"],
+    VARIANTS_CONFIG["formats"],
+    VARIANTS_CONFIG["quality"]
+)
+
+# Component counters exported at /metrics (read at scrape time)
+register_stats("scheduler", recognition_scheduler.stats)
+register_stats("challenge_store", challenge_store.stats)
+register_stats("write_behind", write_behind.stats)
+register_stats("points_ledger", points_ledger.stats)
+register_stats("database", database.stats)
+register_stats("live_scan", scan_budget.stats)
+register_stats("image_variants", image_variants.stats)
+register_stats("challenge_issuer", challenge_issuer.stats)
+
+
+def expire_challenge(challenge: ChallengeRecord, elapsed_time: float) -> dict:
+    """Mark a challenge as timed out, log the failure and build the response"""
+    if challenge_store.complete(challenge.challenge_id, success=False):
+        game_aggregates.record_finished(challenge.session_id, False, elapsed_time)
+        # Log event as failure (only once, by whichever request expired it)
+        write_behind.insert("challenge-events", {
+            "user_id": challenge.user_id,
+            "session_id": challenge.session_id,
+            "success": False,
+            "duration": float(elapsed_time)
+        })
+        return {"status": "failed", "message": "Time expired", "completed": True}
+    return completed_response(challenge.challenge_id)
+
+
+def completed_response(challenge_id: str) -> dict:
+    """Response for a photo submitted to a challenge that another request already finished"""
+    challenge = challenge_store.get(challenge_id)
+    if challenge is not None and challenge.success:
+        return {"status": "success", "message": "You already found this one!", "completed": True}
+    return {"status": "failed", "message": "Time expired", "completed": True}
+
 @router.get("/")
 async def root():
     """API root endpoint - redirects to React frontend"""
@@ -32,7 +132,33 @@ async def get_config():
         "max_points": CONFIG["challenge"]["points"]["goal"],
         "max_points_per_challenge": CONFIG["challenge"]["points"]["max_per_challenge"],
         "ui": CONFIG["ui"],
-        "items": CONFIG["content"]["items"]
+        "items": [item_with_variants(item, image_variants) for item in CONFIG["content"]["items"]]
+    }
+
+def issue_challenge(item: dict, user_id: str, session_id: str, started: bool = True) -> ChallengeRecord:
+    """Create and store a challenge for the item; an unstarted one waits for /api/start-challenge"""
+    challenge = ChallengeRecord(
+        challenge_id=str(uuid.uuid4()),
+        item=item,
+        start_time=time.time(),
+        time_limit=challenge_issuer.time_limit(item),
+        user_id=user_id,
+        session_id=session_id,
+        started=started
+    )
+    challenge_store.add(challenge)
+    if started:
+        game_aggregates.record_started(session_id)
+    return challenge
+
+def challenge_response(challenge: ChallengeRecord) -> dict:
+    return {
+        "challenge_id": challenge.challenge_id,
+        "item": item_with_variants(challenge.item, image_variants),
+        "time_limit": challenge.time_limit,
+        "start_time": challenge.start_time if challenge.started else None,
+        "started": challenge.started,
+        "session_id": challenge.session_id
     }
 
 @router.post("/api/new-challenge")
@@ -43,94 +169,163 @@ async def new_challenge(
     session_id: Optional[str] = Cookie(None)
 ):
     """Create a new challenge. Use user/session IDs."""
-    user_id, session_id = get_user_and_session_ids(request, response, user_id, session_id, user_sessions)
-    
-    # Select a random challenge item
-    challenge_item = random.choice(CONFIG["content"]["items"])
+    is_new_session = not session_id
+    user_id, session_id = get_user_and_session_ids(request, response, user_id, session_id, challenge_store, write_behind)
+    if is_new_session:
+        points_ledger.start_session(session_id)
     
-    # Generate unique challenge id
-    challenge_id = str(uuid.uuid4())
+    # Next item in the session's shuffled deck
+    challenge_item = challenge_issuer.next_items(session_id)[0]
+    challenge = issue_challenge(challenge_item, user_id, session_id)
+    response_data = challenge_response(challenge)
     
-    # Create and store the challenge
-    challenge = Challenge(
-        item_id=challenge_item["id"],
-        start_time=time.time(),
-        time_limit=CONFIG["challenge"]["time"]["default_duration"]
-    )
-    
-    active_challenges[challenge_id] = {
-        "item": challenge_item,
-        "start_time": challenge.start_time,
-        "time_limit": challenge.time_limit,
-        "completed": False,
-        "success": False,
-        "user_id": user_id,
-        "session_id": session_id
-    }
-    
-    response_data = {
-        "challenge_id": challenge_id,
-        "item": challenge_item,
-        "time_limit": challenge.time_limit,
-        "start_time": challenge.start_time,
-        "session_id": session_id
-    }
-    
-    # Debug logging
-    print(f"New challenge response: {response_data}")
+    logger.debug("New challenge response: %s", response_data)
     
     return response_data
 
+@router.post("/api/next-challenges")
+async def next_challenges(
+    request: Request,
+    response: Response,
+    count: int = Query(3, ge=1),
+    difficulty: Optional[str] = None,
+    start: bool = True,
+    user_id: Optional[str] = Cookie(None),
+    session_id: Optional[str] = Cookie(None)
+):
+    """
+    Issue the session's next count challenges in one call, so the client can
+    prefetch them (and their images) while the current one runs. With start,
+    the first challenge's clock starts now; the others (all of them without
+    start) wait for /api/start-challenge/{challenge_id}.
+    """
+    count = min(count, ISSUANCE_CONFIG.get("max_batch", 5))
+    is_new_session = not session_id
+    user_id, session_id = get_user_and_session_ids(request, response, user_id, session_id, challenge_store, write_behind)
+    if is_new_session:
+        points_ledger.start_session(session_id)
+    
+    try:
+        items = challenge_issuer.next_items(session_id, count, difficulty)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    challenges = [
+        issue_challenge(item, user_id, session_id, started=start and index == 0)
+        for index, item in enumerate(items)
+    ]
+    return {"session_id": session_id, "challenges": [challenge_response(challenge) for challenge in challenges]}
+
+@router.post("/api/start-challenge/{challenge_id}")
+async def start_challenge(challenge_id: str):
+    """Start the clock of a prefetched challenge (repeating the call returns it unchanged)"""
+    challenge = challenge_store.start_challenge(challenge_id)
+    if challenge is not None:
+        game_aggregates.record_started(challenge.session_id)
+    else:
+        challenge = challenge_store.get(challenge_id)
+        if challenge is None:
+            raise HTTPException(status_code=404, detail="Challenge not found")
+    return challenge_response(challenge)
+
 @router.post("/api/submit-photo/{challenge_id}")
 async def submit_photo(challenge_id: str, photo: UploadFile = File(...)):
     """Submit a photo for a challenge. Log results to Supabase."""
-    if challenge_id not in active_challenges:
+    outcome = "error"
+    with SUBMISSIONS_IN_FLIGHT.track_inprogress(), time_stage("total"):
+        try:
+            result = await handle_photo(challenge_id, photo)
+            outcome = result["status"] if result.get("completed") else "retry"
+            return result
+        except HTTPException as e:
+            outcome = "rate_limited" if e.status_code == 429 else "not_found"
+            raise
+        finally:
+            SUBMISSIONS.labels(outcome).inc()
+
+
+async def handle_photo(challenge_id: str, photo: UploadFile) -> dict:
+    """Check a photo against its challenge and complete the challenge on a match"""
+    challenge = challenge_store.get(challenge_id)
+    if challenge is None:
         raise HTTPException(status_code=404, detail="Challenge not found")
     
-    challenge = active_challenges[challenge_id]
-    
-    # Check if time has expired
-    elapsed_time = time.time() - challenge["start_time"]
-    if elapsed_time > challenge["time_limit"]:
-        challenge["completed"] = True
-        # Log event as failure
-        supabase.table("challenge-events").insert({
-            "user_id": challenge["user_id"],
-            "session_id": challenge["session_id"],
-            "success": False,
-            "duration": float(elapsed_time)
-        }).execute()
-        return {"status": "failed", "message": "Time expired", "completed": True}
+    closed = closed_challenge_response(challenge)
+    if closed is not None:
+        return closed
+    elapsed_time = time.time() - challenge.start_time
     
     # Read the photo data
-    contents = await photo.read()
+    with time_stage("upload_read"):
+        contents = await photo.read()
     
-    # Use image recognition to analyze the photo
-    analysis_result = analyze_image(
-        contents, 
-        challenge["item"]["name"],
-        confidence_threshold=CONFIG["image_recognition"]["confidence_threshold"]
-    )
+    try:
+        return await judge_photo(challenge, contents, elapsed_time)
+    except SchedulerRejectedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def closed_challenge_response(challenge: ChallengeRecord) -> Optional[dict]:
+    """Response for a photo sent to a finished, timed-out or unstarted challenge (None while it is open)"""
+    if challenge.completed:
+        return completed_response(challenge.challenge_id)
+    if not challenge.started:
+        return {
+            "status": "failed",
+            "message": "This challenge hasn't started yet!",
+            "completed": False
+        }
     
+    # Check if time has expired
+    elapsed_time = time.time() - challenge.start_time
+    if elapsed_time > challenge.time_limit:
+        return expire_challenge(challenge, elapsed_time)
+    return None
+
+
+async def judge_photo(challenge: ChallengeRecord, contents: bytes, elapsed_time: float) -> dict:
+    """Recognize a photo for an open challenge and complete it on a match (raises SchedulerRejectedError)"""
+    # Use image recognition to analyze the photo, queued by how soon the challenge expires
+    try:
+        analysis_result = await recognition_scheduler.submit(
+            challenge.session_id,
+            challenge.deadline,
+            lambda: analyze_image_async(
+                contents, 
+                challenge.item["name"],
+                confidence_threshold=CONFIG["image_recognition"]["confidence_threshold"]
+            )
+        )
+    except ChallengeExpiredError:
+        return expire_challenge(challenge, time.time() - challenge.start_time)
+    return apply_verdict(challenge, analysis_result, elapsed_time)
+
+
+def apply_verdict(challenge: ChallengeRecord, analysis_result: dict, elapsed_time: float) -> dict:
+    """Complete and credit the challenge if the recognition result is a match, and build the response"""
+    challenge_id = challenge.challenge_id
     if analysis_result["is_match"]:
-        challenge["completed"] = True
-        challenge["success"] = True
+        # Only the request that completes the challenge awards points (compare-and-set)
+        completed_at = time.time()
+        if not challenge_store.complete(challenge_id, success=True, completed_at=completed_at):
+            return completed_response(challenge_id)
+        game_aggregates.record_finished(challenge.session_id, True, completed_at - challenge.start_time)
         
-        # Calculate points based on how quickly they found the item
-        points = get_points_for_match(elapsed_time, challenge["time_limit"])
+        # Calculate points based on how quickly they found the item, scaled by its difficulty
+        # (never above the per-challenge maximum the game advertises)
+        points = min(round(get_points_for_match(elapsed_time, challenge.time_limit)
+                           * challenge_issuer.points_multiplier(challenge.item)),
+                     CONFIG["challenge"]["points"]["max_per_challenge"])
         
-        # Update session points in session table
-        prev = supabase.table("sessions").select("points").eq("session_id", challenge["session_id"]).single().execute()
-        curr_points = prev.data["points"] if prev.data else 0
-        supabase.table("sessions").update({"points": curr_points + points}).eq("session_id", challenge["session_id"]).execute()
+        # Add the points to the session total (one queued insert, applied atomically by the database)
+        points_ledger.award(challenge.session_id, challenge.user_id, points, challenge_id)
         
-        # Log event as success
-        supabase.table("challenge-events").insert({
-            "user_id": challenge["user_id"],
-            "session_id": challenge["session_id"],
+        # Log event as success (in the background)
+        write_behind.insert("challenge-events", {
+            "user_id": challenge.user_id,
+            "session_id": challenge.session_id,
             "success": True,
             "duration": float(elapsed_time)
-        }).execute()
+        })
         
         return {
             "status": "success", 
@@ -148,75 +343,285 @@ async def submit_photo(challenge_id: str, photo: UploadFile = File(...)):
             "confidence": analysis_result["confidence"],
             }
 
+@router.post("/api/sweep-photo")
+async def sweep_photo(photo: UploadFile = File(...), session_id: Optional[str] = Cookie(None)):
+    """
+    Sweep mode: one photo is checked against the items of every open challenge in
+    the session with a single recognition call, and each challenge whose item is
+    in the photo is completed and credited.
+    """
+    outcome = "error"
+    with SUBMISSIONS_IN_FLIGHT.track_inprogress(), time_stage("total"):
+        try:
+            result = await handle_sweep(session_id, photo)
+            outcome = "success" if result["credited"] else "retry"
+            return result
+        except HTTPException as e:
+            outcome = "rate_limited" if e.status_code == 429 else "not_found"
+            raise
+        finally:
+            SUBMISSIONS.labels(outcome).inc()
+
+
+async def handle_sweep(session_id: Optional[str], photo: UploadFile) -> dict:
+    """Credit every open challenge of the session whose item the photo shows"""
+    challenges = challenge_store.open_challenges(session_id) if session_id else []
+    if not challenges:
+        raise HTTPException(status_code=404, detail="No open challenges in this session")
+    submitted_at = time.time()
+    
+    with time_stage("upload_read"):
+        contents = await photo.read()
+    
+    # The sweep stays useful while any of the challenges is open, so it is queued by the latest deadline
+    labels = [challenge.item["name"] for challenge in challenges]
+    try:
+        verdicts = await recognition_scheduler.submit(
+            session_id,
+            max(challenge.deadline for challenge in challenges),
+            lambda: analyze_sweep_async(
+                contents,
+                labels,
+                confidence_threshold=CONFIG["image_recognition"]["confidence_threshold"]
+            )
+        )
+    except SchedulerRejectedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ChallengeExpiredError:
+        verdicts = None
+    
+    results = []
+    for challenge in challenges:
+        elapsed_time = submitted_at - challenge.start_time
+        if verdicts is None:
+            result = expire_challenge(challenge, time.time() - challenge.start_time)
+        else:
+            result = apply_verdict(challenge, verdicts[challenge.item["name"]], elapsed_time)
+        results.append({"challenge_id": challenge.challenge_id, "item": challenge.item, **result})
+    
+    credited = [result for result in results if "points" in result]
+    if credited:
+        names = ", ".join(result["item"]["name"] for result in credited)
+        message = f"Great job! You found: {names}!"
+    elif len({result["message"] for result in results}) == 1:
+        # e.g. a quality gate rejection, which is the same for every item
+        message = results[0]["message"]
+    else:
+        message = "None of your items are in this photo. Try again!"
+    return {
+        "status": "success" if credited else "failed",
+        "message": message,
+        "points": sum(result["points"] for result in credited),
+        "credited": len(credited),
+        "results": results
+    }
+
+@router.websocket("/api/live-scan/{challenge_id}")
+async def live_scan(websocket: WebSocket, challenge_id: str):
+    """
+    Live-scan mode: the client streams small JPEG frames as binary messages and
+    gets JSON events back. Only frames where the camera has settled on something
+    new are recognized (see live_scan.py), up to max_calls_per_challenge times.
+
+    Events: ready, scan (state changes: moving/settling/unchanged/...), analyzing,
+    result (same body as submit-photo), busy (retry_after), limit. The server
+    closes the socket once the challenge is finished or the budget is used up.
+    """
+    await websocket.accept()
+    challenge = challenge_store.get(challenge_id)
+    if challenge is None or not LIVE_SCAN_CONFIG.get("enabled", True):
+        await websocket.close(code=4404 if challenge is None else 4403)
+        return
+    
+    detector = FrameChangeDetector(
+        stable_threshold=LIVE_SCAN_CONFIG.get("stable_threshold", 6.0),
+        stable_frames=LIVE_SCAN_CONFIG.get("stable_frames", 3),
+        change_threshold=LIVE_SCAN_CONFIG.get("change_threshold", 12.0),
+        min_interval=LIVE_SCAN_CONFIG.get("min_interval", 1.0)
+    )
+    max_frame_bytes = LIVE_SCAN_CONFIG.get("max_frame_bytes", 262144)
+    preprocess_pool = get_executor(CONFIG["image_recognition"].get("preprocessing", {}))
+    loop = asyncio.get_running_loop()
+    send_lock = asyncio.Lock()
+    analysis: Optional[asyncio.Task] = None
+    last_state = None
+    
+    async def send(event: dict) -> None:
+        # The frame loop and the analysis task both send; keep messages whole
+        async with send_lock:
+            await websocket.send_json(event)
+    
+    async def finish(result: dict) -> None:
+        await send({"type": "result", **result})
+        await websocket.close()
+    
+    async def analyze(frame: bytes) -> None:
+        """Recognize one settled frame and push the verdict as soon as it is known"""
+        current = challenge_store.get(challenge_id) or challenge
+        closed = closed_challenge_response(current)
+        if closed is not None:
+            # Nothing was sent upstream: refund the call
+            scan_budget.release(challenge_id)
+            detector.forget_analyzed()
+            if closed["completed"]:
+                await finish(closed)
+            else:
+                # Not started yet: keep the socket open for frames after the start
+                await send({"type": "result", **closed, "remaining_calls": scan_budget.remaining(challenge_id)})
+            return
+        await send({"type": "analyzing"})
+        outcome = "error"
+        try:
+            with SUBMISSIONS_IN_FLIGHT.track_inprogress(), time_stage("total"):
+                result = await judge_photo(current, frame, time.time() - current.start_time)
+            outcome = result["status"] if result.get("completed") else "retry"
+        except SchedulerRejectedError as e:
+            # Nothing was sent upstream: refund the call and let the same scene be tried again
+            outcome = "rate_limited"
+            scan_budget.release(challenge_id)
+            detector.forget_analyzed()
+            await send({"type": "busy", "message": str(e), "retry_after": e.retry_after})
+            return
+        finally:
+            SUBMISSIONS.labels(outcome).inc()
+        if result["completed"]:
+            await finish(result)
+        else:
+            await send({"type": "result", **result, "remaining_calls": scan_budget.remaining(challenge_id)})
+    
+    try:
+        await send({
+            "type": "ready",
+            "remaining_calls": scan_budget.remaining(challenge_id),
+            "time_remaining": max(0.0, challenge.deadline - time.time()) if challenge.started else challenge.time_limit
+        })
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            frame = message.get("bytes")
+            if not frame:
+                continue
+            
+            # Re-read: a prefetched challenge's clock starts after the socket opened
+            challenge = challenge_store.get(challenge_id) or challenge
+            if challenge.started and time.time() > challenge.deadline:
+                if analysis is not None:
+                    await asyncio.gather(analysis, return_exceptions=True)
+                await finish(closed_challenge_response(challenge_store.get(challenge_id) or challenge)
+                             or completed_response(challenge_id))
+                break
+            # One recognition at a time per connection; frames arriving meanwhile are dropped
+            if analysis is not None and not analysis.done():
+                LIVE_SCAN_FRAMES.labels("busy").inc()
+                continue
+            if len(frame) > max_frame_bytes:
+                LIVE_SCAN_FRAMES.labels("too_large").inc()
+                continue
+            
+            thumbnail = await loop.run_in_executor(preprocess_pool, frame_thumbnail, frame)
+            decision = detector.observe(thumbnail)
+            if not decision.analyze:
+                LIVE_SCAN_FRAMES.labels(decision.state).inc()
+                if decision.state != last_state:
+                    last_state = decision.state
+                    await send({"type": "scan", "state": decision.state})
+                continue
+            
+            if not scan_budget.try_acquire(challenge_id):
+                LIVE_SCAN_FRAMES.labels("limit").inc()
+                await send({"type": "limit", "message": "Live scan limit reached, take a photo instead!"})
+                await websocket.close()
+                break
+            LIVE_SCAN_FRAMES.labels("analyzed").inc()
+            detector.mark_analyzed(thumbnail)
+            last_state = None
+            analysis = asyncio.create_task(analyze(frame))
+    except (WebSocketDisconnect, RuntimeError):
+        # Client went away (RuntimeError: sending on a socket the client already closed)
+        pass
+    finally:
+        # A verdict already being computed still completes the challenge and awards its points
+        if analysis is not None:
+            await asyncio.gather(analysis, return_exceptions=True)
+
 @router.get("/api/challenge-status/{challenge_id}")
 async def challenge_status(challenge_id: str):
     """Get the status of a challenge"""
-    if challenge_id not in active_challenges:
+    challenge = challenge_store.get(challenge_id)
+    if challenge is None:
         raise HTTPException(status_code=404, detail="Challenge not found")
-    
-    challenge = active_challenges[challenge_id]
-    elapsed_time = time.time() - challenge["start_time"]
-    time_remaining = max(0, challenge["time_limit"] - elapsed_time)
+    if not challenge.started:
+        return {
+            "completed": False,
+            "success": False,
+            "started": False,
+            "time_remaining": challenge.time_limit,
+            "item": challenge.item
+        }
+    elapsed_time = time.time() - challenge.start_time
+    time_remaining = max(0, challenge.time_limit - elapsed_time)
     
     # Auto-complete if time expired
-    if time_remaining <= 0 and not challenge["completed"]:
-        challenge["completed"] = True
+    if time_remaining <= 0 and not challenge.completed:
+        if challenge_store.complete(challenge_id, success=False):
+            game_aggregates.record_finished(challenge.session_id, False, elapsed_time)
+        challenge = challenge_store.get(challenge_id) or challenge
     
     return {
-        "completed": challenge["completed"],
-        "success": challenge["success"],
+        "completed": challenge.completed,
+        "success": challenge.success,
+        "started": True,
         "time_remaining": time_remaining,
-        "item": challenge["item"]
+        "item": challenge.item
     }
 
 @router.get("/api/stats")
 async def get_stats():
     """Get overall statistics"""
-    total_challenges = len(active_challenges)
-    successful_challenges = sum(1 for c in active_challenges.values() if c["success"])
-    
-    avg_completion_time = 0
-    if successful_challenges > 0:
-        completion_times = [
-            time.time() - c["start_time"] 
-            for c in active_challenges.values() 
-            if c["success"]
-        ]
-        avg_completion_time = sum(completion_times) / len(completion_times)
+    aggregates = game_aggregates.global_stats()
+    total_challenges = aggregates["started"]
+    successful_challenges = aggregates["successes"]
     
     return {
         "total_challenges": total_challenges,
         "successful_challenges": successful_challenges,
         "success_rate": successful_challenges / total_challenges if total_challenges > 0 else 0,
-        "avg_completion_time": round(avg_completion_time, 2)
+        "avg_completion_time": round(aggregates["average_duration"], 2),
+        "p50_completion_time": aggregates["p50_completion_time"],
+        "p90_completion_time": aggregates["p90_completion_time"],
+        "p99_completion_time": aggregates["p99_completion_time"]
+    }
+
+@router.get("/api/recognition-stats")
+async def recognition_stats():
+    """Get image recognition pipeline counters (cache hits/misses, queue etc.)"""
+    return {
+        **get_recognition_stats(),
+        "scheduler": recognition_scheduler.stats()
     }
 
 @router.get("/api/session-stats/{session_id}")
 async def get_session_stats(session_id: str):
-    """Get statistics for a specific session from Supabase"""
+    """Get statistics for a specific session"""
+    aggregates = game_aggregates.session_stats(session_id)
     try:
-        # Get all successful challenge events for this session
-        events_response = supabase.table("challenge-events").select("duration").eq("session_id", session_id).eq("success", True).execute()
-        
-        if not events_response.data:
-            return {
-                "total_successful_challenges": 0,
-                "average_duration": 0
-            }
-        
-        durations = [event["duration"] for event in events_response.data]
-        avg_duration = sum(durations) / len(durations) if durations else 0
-        
-        return {
-            "total_successful_challenges": len(durations),
-            "average_duration": round(avg_duration, 1)
-        }
+        total_points = await points_ledger.get_total(session_id)
     except Exception as e:
-        # Return default values if there's an error
-        return {
-            "total_successful_challenges": 0,
-            "average_duration": 0
-        }
+        logger.warning("Error loading points for session %s: %s", session_id, e)
+        total_points = 0
+    
+    return {
+        "total_successful_challenges": aggregates["successes"],
+        "average_duration": round(aggregates["average_duration"], 1),
+        "total_points": total_points
+    }
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms, vision usage and component counters"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 @router.get("/debug/env")
 async def debug_env():
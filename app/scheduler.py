@@ -0,0 +1,184 @@
+"""
+Admission control and scheduling for recognition work.
+
+submit_photo hands its recognition job to the RecognitionScheduler instead of
+starting it immediately. Jobs wait in a bounded priority queue ordered by the
+time their challenge expires, so photos for challenges about to run out are
+checked first. A fixed pool of workers drains the queue; jobs whose challenge
+has expired by the time a worker reaches them are dropped. Each session has a
+token bucket limiting how fast it may submit, and a full queue or empty bucket
+is reported to the caller with a suggested retry delay (HTTP 429).
+"""
+
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .metrics import STAGE_SECONDS
+from .resilience import LatencyTracker
+
+
+class SchedulerRejectedError(Exception):
+    """Work was not admitted; retry_after is the suggested wait in whole seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ChallengeExpiredError(Exception):
+    """The challenge ran out of time while its job was waiting in the queue"""
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` burst, refilled at `rate` tokens per second"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; returns 0 on success, otherwise the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+
+class RecognitionScheduler:
+    """Bounded earliest-deadline-first queue with per-session rate limits"""
+
+    def __init__(self, workers: int = 8, max_queue: int = 64, session_burst: float = 5,
+                 session_rate: float = 1.0, max_sessions: int = 10000):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.session_burst = session_burst
+        self.session_rate = session_rate
+        self.max_sessions = max_sessions
+        # (deadline, sequence, future, job factory, enqueued_at)
+        self._queue: List = []
+        self._sequence = itertools.count()
+        self._available: Optional[asyncio.Condition] = None
+        self._tasks: List[asyncio.Task] = []
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.wait_times = LatencyTracker()
+        self.service_times = LatencyTracker()
+        self.submitted = 0
+        self.completed = 0
+        self.dropped_expired = 0
+        self.rejected_full = 0
+        self.rate_limited = 0
+
+    async def start(self) -> None:
+        """Start the worker tasks (called from the app lifespan)."""
+        self._available = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel workers and fail any jobs still queued."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for _, _, future, _, _ in self._queue:
+            if not future.done():
+                future.set_exception(SchedulerRejectedError("Server is shutting down", 1))
+        self._queue = []
+
+    def _retry_after(self) -> int:
+        """Rough time for the current backlog to drain, in whole seconds"""
+        per_job = self.service_times.percentile(50) or 1.0
+        return max(1, math.ceil(len(self._queue) * per_job / max(1, self.workers)))
+
+    def _check_rate_limit(self, session_id: str) -> None:
+        bucket = self._buckets.get(session_id)
+        if bucket is None:
+            bucket = TokenBucket(self.session_burst, self.session_rate)
+            self._buckets[session_id] = bucket
+            if len(self._buckets) > self.max_sessions:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(session_id)
+        wait = bucket.take()
+        if wait > 0:
+            self.rate_limited += 1
+            raise SchedulerRejectedError("Too many photos, slow down a little!", max(1, math.ceil(wait)))
+
+    async def submit(self, session_id: str, deadline: float, job: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Queue job() to run before `deadline` (a time.time() timestamp) and return its result.
+
+        Raises SchedulerRejectedError when the session is over its rate or the queue is
+        full, and ChallengeExpiredError when the deadline passes before a worker is free.
+        """
+        if self._available is None:
+            # Scheduler not started (e.g. scripts): run inline
+            return await job()
+        if deadline <= time.time():
+            self.dropped_expired += 1
+            raise ChallengeExpiredError("Challenge expired before its photo could be checked")
+        self._check_rate_limit(session_id)
+        if len(self._queue) >= self.max_queue:
+            self.rejected_full += 1
+            raise SchedulerRejectedError("Lots of photos are being checked right now, try again shortly!",
+                                         self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (deadline, next(self._sequence), future, job, time.monotonic()))
+        self.submitted += 1
+        async with self._available:
+            self._available.notify()
+        return await future
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._available:
+                await self._available.wait_for(lambda: bool(self._queue))
+                deadline, _, future, job, enqueued_at = heapq.heappop(self._queue)
+            if future.done():
+                # Caller gave up (disconnected) while waiting
+                continue
+            waited = time.monotonic() - enqueued_at
+            self.wait_times.record(waited)
+            STAGE_SECONDS.labels("queue_wait").observe(waited)
+            if deadline <= time.time():
+                self.dropped_expired += 1
+                future.set_exception(ChallengeExpiredError("Challenge expired while its photo was queued"))
+                continue
+            started = time.monotonic()
+            try:
+                result = await job()
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.service_times.record(time.monotonic() - started)
+                self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": len(self._queue),
+            "max_queue": self.max_queue,
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped_expired": self.dropped_expired,
+            "rejected_full": self.rejected_full,
+            "rate_limited": self.rate_limited,
+            "wait_seconds_p50": self.wait_times.percentile(50),
+            "wait_seconds_p95": self.wait_times.percentile(95),
+            "tracked_sessions": len(self._buckets)
+        }
@@ -1,5 +1,9 @@
 import os
-from supabase import create_client, Client
+import logging
+
+from .config import CONFIG
+from .database import SupabaseDatabase
+from .offline import offline_setting
 
 # Try to load .env file only if it exists (for local development)
 try:
@@ -12,26 +16,29 @@ except ImportError:
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 
-# Debug logging for Railway deployment
-print(f"Environment variables check:")
-print(f"SUPABASE_URL loaded: {'Yes' if SUPABASE_URL else 'No'}")
-print(f"SUPABASE_ANON_KEY loaded: {'Yes' if SUPABASE_ANON_KEY else 'No'}")
-
-# Print first few characters for debugging (without exposing full keys)
-if SUPABASE_URL:
-    print(f"SUPABASE_URL starts with: {SUPABASE_URL[:20]}...")
-if SUPABASE_ANON_KEY:
-    print(f"SUPABASE_ANON_KEY starts with: {SUPABASE_ANON_KEY[:20]}...")
-
-# List all environment variables that start with SUPABASE for debugging
-print("All SUPABASE environment variables:")
-for key, value in os.environ.items():
-    if key.startswith("SUPABASE"):
-        print(f"  {key}: {'Set' if value else 'Empty'}")
-
-if not SUPABASE_URL:
-    raise ValueError("SUPABASE_URL environment variable is required")
-if not SUPABASE_ANON_KEY:
-    raise ValueError("SUPABASE_ANON_KEY environment variable is required")
-
-supabase: Client = create_client(supabase_url=SUPABASE_URL, supabase_key=SUPABASE_ANON_KEY)
+logger = logging.getLogger(__name__)
+
+# Debug logging for Railway deployment (first few characters only, without exposing full keys)
+logger.info("SUPABASE_URL loaded: %s", f"yes ({SUPABASE_URL[:20]}...)" if SUPABASE_URL else "no")
+logger.info("SUPABASE_ANON_KEY loaded: %s", f"yes ({SUPABASE_ANON_KEY[:20]}...)" if SUPABASE_ANON_KEY else "no")
+logger.debug("SUPABASE environment variables: %s",
+             {key: "Set" if value else "Empty" for key, value in os.environ.items() if key.startswith("SUPABASE")})
+
+# "supabase", or "memory"/"sqlite" for the offline stand-in (no credentials needed)
+DATABASE_BACKEND = offline_setting(CONFIG, "database", "DATABASE_BACKEND", "supabase")
+
+if DATABASE_BACKEND == "supabase":
+    if not SUPABASE_URL:
+        raise ValueError("SUPABASE_URL environment variable is required")
+    if not SUPABASE_ANON_KEY:
+        raise ValueError("SUPABASE_ANON_KEY environment variable is required")
+
+# Shared async client; its connection pool is opened and closed in the app lifespan
+database = SupabaseDatabase(
+    SUPABASE_URL,
+    SUPABASE_ANON_KEY,
+    backend=DATABASE_BACKEND,
+    offline_options=CONFIG.get("offline", {}).get("database_options", {}),
+    **CONFIG.get("database", {}).get("client", {})
+)
+
@@ -2,7 +2,8 @@ import random
 import os
 from typing import Optional, Tuple, Dict, Any
 from fastapi import Request, Response
-from .supabase_client import supabase
+from .challenge_store import ChallengeStore
+from .write_behind import WriteBehindQueue
 
 def generate_user_id() -> str:
     """Generate a unique user ID"""
@@ -17,7 +18,8 @@ def get_user_and_session_ids(
     response: Response, 
     user_id: Optional[str], 
     session_id: Optional[str],
-    user_sessions: Dict[str, Dict[str, Any]]
+    challenge_store: ChallengeStore,
+    write_behind: WriteBehindQueue
 ) -> Tuple[str, str]:
     """Fetch or create user_id & session_id for this client (cookie-based)"""
     if not user_id:
@@ -27,13 +29,14 @@ def get_user_and_session_ids(
     if not session_id:
         session_id = generate_session_id()
         response.set_cookie(key="session_id", value=session_id, httponly=True)
-        # Create a session entry in Supabase
-        supabase.table("sessions").insert({
+        # Create a session entry in Supabase (queued: nothing reads it on the request path). The
+        # points trigger creates the row if an award gets there first (see DEPLOYMENT.md), so skip it then
+        write_behind.insert("sessions", {
             "session_id": session_id,
             "user_id": user_id,
             "points": 0
-        }).execute()
+        }, on_conflict="session_id")
     
-    # Save mapping for reference (dev only, in-memory)
-    user_sessions[user_id] = {"session_id": session_id}
+    # Save mapping for reference (dev only)
+    challenge_store.remember_session(user_id, session_id)
     return user_id, session_id 
\ No newline at end of file
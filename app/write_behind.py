@@ -0,0 +1,189 @@
+"""
+Write-behind pipeline for Supabase writes that do not affect the response.
+
+Request handlers enqueue challenge-event inserts and session updates and
+return immediately. A background task flushes the buffer when it reaches
+batch_size or every flush_interval seconds: inserts are grouped per table into
+one bulk insert, other operations run in order. Each bulk insert or operation
+is retried with exponential backoff on transient errors (timeouts, connection
+errors, 5xx), and stop() drains whatever is left on shutdown. A bulk insert the
+database rejects (a constraint or validation error) is split in halves until
+the bad rows are isolated, so only those are counted as failed.
+
+Grouping reorders tables within a batch, so tables other rows refer to
+(parent_tables: the sessions row that points-events rows add to) are always
+written first. Across batches the buffer is first in, first out.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .database import SupabaseDatabase, is_transient_error
+from .metrics import time_stage
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """Buffers database writes and flushes them in bulk off the request path"""
+
+    def __init__(self, database: SupabaseDatabase, batch_size: int = 50, flush_interval: float = 1.0, max_backlog: int = 10000,
+                 max_retries: int = 5, retry_base_delay: float = 0.5, retry_max_delay: float = 30.0,
+                 parent_tables: Tuple[str, ...] = ("sessions",)):
+        self.database = database
+        self.parent_tables = parent_tables
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        # ("insert", table, row, on_conflict) or ("call", description, fn, None)
+        self._buffer: Deque[Tuple[str, str, Any, Optional[str]]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.rejected = 0
+        self.failed = 0
+        self.dropped = 0
+        self.last_flush_seconds: Optional[float] = None
+
+    def _push(self, entry: Tuple[str, str, Any, Optional[str]]) -> None:
+        if len(self._buffer) >= self.max_backlog:
+            # Database unreachable for a long time: shed the oldest write rather than grow forever
+            self._buffer.popleft()
+            self.dropped += 1
+        self._buffer.append(entry)
+        self.enqueued += 1
+        if self._wakeup is not None and len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def insert(self, table: str, row: Dict[str, Any], on_conflict: Optional[str] = None) -> None:
+        """
+        Queue a row insert; rows for the same table are sent as one bulk insert.
+        With on_conflict (a unique column) the row is skipped if its key already exists.
+        """
+        self._push(("insert", table, row, on_conflict))
+
+    def call(self, description: str, fn: Callable[[], Awaitable[Any]]) -> None:
+        """Queue an arbitrary database operation (coroutine function), run in order during the flush."""
+        self._push(("call", description, fn, None))
+
+    def _units(self, entries: List[Tuple[str, str, Any, Optional[str]]]) -> List[Callable[[], Awaitable[None]]]:
+        """
+        Split a batch into independently written units: one bulk insert per table
+        and conflict column (parent tables first), then each call.
+        """
+        rows_by_table: Dict[Tuple[str, Optional[str]], List[Dict]] = {}
+        calls = []
+        for kind, target, payload, on_conflict in entries:
+            if kind == "insert":
+                rows_by_table.setdefault((target, on_conflict), []).append(payload)
+            else:
+                calls.append(lambda description=target, fn=payload: self._write_call(description, fn))
+        inserts = [
+            lambda table=table, rows=rows, on_conflict=on_conflict: self._write_rows(table, rows, on_conflict)
+            for (table, on_conflict), rows in sorted(rows_by_table.items(),
+                                                     key=lambda item: item[0][0] not in self.parent_tables)
+        ]
+        return inserts + calls
+
+    async def _write_unit(self, description: str, fn: Callable[[], Awaitable[Any]], count: int) -> bool:
+        """
+        Run one unit, retrying transient errors with backoff. Returns False if the
+        database rejected it (nothing is counted then: the caller decides).
+        """
+        delay = self.retry_base_delay
+        for attempt in range(self.max_retries + 1):
+            try:
+                with time_stage("db_write"):
+                    await fn()
+            except Exception as e:
+                if not is_transient_error(e):
+                    self.rejected += 1
+                    logger.warning("Write-behind '%s' rejected: %s", description, e)
+                    return False
+                if attempt == self.max_retries:
+                    self.failed += count
+                    logger.error("Write-behind gave up on '%s': %s", description, e)
+                    return True
+                self.retries += 1
+                logger.warning("Write-behind '%s' failed (attempt %d), retrying in %.1fs: %s",
+                               description, attempt + 1, delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_max_delay)
+            else:
+                self.written += count
+                return True
+
+    async def _write_rows(self, table: str, rows: List[Dict], on_conflict: Optional[str]) -> None:
+        if await self._write_unit(f"insert {len(rows)} rows into {table}",
+                                  lambda: self.database.insert(table, rows, on_conflict=on_conflict), len(rows)):
+            return
+        if len(rows) == 1:
+            self.failed += 1
+            logger.error("Write-behind dropped a row the database rejected from %s: %s", table, rows[0])
+            return
+        # One bad row rejects the whole bulk insert: bisect so the good rows still get written
+        middle = len(rows) // 2
+        await self._write_rows(table, rows[:middle], on_conflict)
+        await self._write_rows(table, rows[middle:], on_conflict)
+
+    async def _write_call(self, description: str, fn: Callable[[], Awaitable[Any]]) -> None:
+        if not await self._write_unit(description, fn, 1):
+            self.failed += 1
+
+    async def flush(self) -> None:
+        """Write out everything currently buffered, batch_size entries at a time."""
+        while self._buffer:
+            started = time.monotonic()
+            entries = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            for unit in self._units(entries):
+                await unit()
+            self.batches += 1
+            self.last_flush_seconds = time.monotonic() - started
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def start(self) -> None:
+        """Start the background flusher (called from the app lifespan)."""
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher after its current flush and drain the remaining buffer."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        self._wakeup = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backlog": len(self._buffer),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "last_flush_seconds": self.last_flush_seconds
+        }
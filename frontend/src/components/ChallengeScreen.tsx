@@ -10,6 +10,9 @@ import {
 } from '@chakra-ui/react';
 import Webcam from 'react-webcam';
 import { Challenge } from '../types';
+import { imageSrcSet } from '../services/api';
+
+const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
 interface ChallengeScreenProps {
   challenge: Challenge;
@@ -117,14 +120,21 @@ const ChallengeScreen: React.FC<ChallengeScreenProps> = ({
         <Text fontSize="3xl" fontWeight="bold" color="primary.700" mb={4}>
           {challenge.item.name}
         </Text>
-        <Image
-          src={`${process.env.REACT_APP_API_URL || 'http://localhost:8000'}/static/images/${challenge.item.image}`}
-          alt={challenge.item.name}
-          maxH="200px"
-          mx="auto"
-          borderRadius="15px"
-          boxShadow="0 4px 12px rgba(0, 0, 0, 0.2)"
-        />
+        <picture>
+          {challenge.item.image_variants?.webp && (
+            <source type="image/webp" srcSet={imageSrcSet(challenge.item.image_variants.webp)} sizes="320px" />
+          )}
+          <Image
+            src={`${API_URL}${challenge.item.image_url || `/static/images/${challenge.item.image}`}`}
+            srcSet={imageSrcSet(challenge.item.image_variants?.jpeg)}
+            sizes="320px"
+            alt={challenge.item.name}
+            maxH="200px"
+            mx="auto"
+            borderRadius="15px"
+            boxShadow="0 4px 12px rgba(0, 0, 0, 0.2)"
+          />
+        </picture>
       </Box>
 
       {/* Timer */}
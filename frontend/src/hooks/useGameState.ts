@@ -1,6 +1,9 @@
-import { useState, useEffect, useCallback } from 'react';
-import { GameState, ChallengeResult, GameConfig, SessionStats } from '../types';
-import { gameApi } from '../services/api';
+import { useState, useEffect, useCallback, useRef } from 'react';
+import { GameState, Challenge, ChallengeResult, GameConfig, SessionStats } from '../types';
+import { gameApi, preloadChallengeImage } from '../services/api';
+
+// Challenges fetched per /api/next-challenges call; all but the one being played wait, images preloaded
+const PREFETCH_COUNT = 3;
 
 const INITIAL_GAME_STATE: GameState = {
   totalPoints: 0,
@@ -36,7 +39,31 @@ export const useGameState = () => {
     };
   });
 
+  // Prefetched challenges whose clock has not started yet, next one first
+  const upcomingChallenges = useRef<Challenge[]>([]);
+  const prefetching = useRef(false);
+
+  const prefetchChallenges = useCallback(async () => {
+    if (prefetching.current) return;
+    prefetching.current = true;
+    try {
+      const challenges = await gameApi.nextChallenges(PREFETCH_COUNT - 1, false);
+      challenges.forEach(preloadChallengeImage);
+      upcomingChallenges.current.push(...challenges);
+    } catch (error) {
+      // Not critical: the next challenge is then fetched when it is needed
+    } finally {
+      prefetching.current = false;
+    }
+  }, []);
 
+  // Fetch a batch whose first challenge starts now; the rest are kept (images preloaded) for the next rounds
+  const fetchChallengeBatch = useCallback(async (): Promise<Challenge> => {
+    const [first, ...rest] = await gameApi.nextChallenges(PREFETCH_COUNT, true);
+    rest.forEach(preloadChallengeImage);
+    upcomingChallenges.current.push(...rest);
+    return first;
+  }, []);
 
   // Save total points to localStorage whenever it changes
   useEffect(() => {
@@ -91,7 +118,21 @@ export const useGameState = () => {
         feedbackType: 'info',
       }));
 
-      const challenge = await gameApi.startNewChallenge();
+      // Play a prefetched challenge if there is one (its image is already cached)
+      let prefetched: Challenge | null = null;
+      const upcoming = upcomingChallenges.current.shift();
+      if (upcoming) {
+        try {
+          prefetched = await gameApi.startChallenge(upcoming.challenge_id);
+        } catch (error) {
+          // Left unplayed too long and removed by the server: start over with a fresh batch
+          upcomingChallenges.current = [];
+        }
+      }
+      const challenge = prefetched || (await fetchChallengeBatch());
+      if (upcomingChallenges.current.length === 0) {
+        prefetchChallenges();
+      }
       console.log('useGameState: Received challenge:', challenge);
       
       setGameState(prev => ({
@@ -114,7 +155,7 @@ export const useGameState = () => {
         feedbackType: 'error',
       }));
     }
-  }, [gameState.isLoading]);
+  }, [gameState.isLoading, fetchChallengeBatch, prefetchChallenges]);
 
   const fetchSessionStats = useCallback(async (sessionId: string) => {
     try {
@@ -1,8 +1,21 @@
 import axios from 'axios';
-import { Challenge, ChallengeResult } from '../types';
+import { Challenge, ChallengeResult, ImageVariant, LiveScanEvent, SweepResult } from '../types';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 
+// srcset attribute for an item's image variants
+export const imageSrcSet = (variants?: ImageVariant[]) =>
+  variants?.map((variant) => `${API_BASE_URL}${variant.url} ${variant.width}w`).join(', ');
+
+// Have the browser fetch (and cache) the image a challenge will show, before it is shown
+export const preloadChallengeImage = (challenge: Challenge) => {
+  const image = new window.Image();
+  image.sizes = '320px';
+  const variants = challenge.item.image_variants;
+  image.srcset = imageSrcSet(variants?.webp || variants?.jpeg) || '';
+  image.src = `${API_BASE_URL}${challenge.item.image_url || `/static/images/${challenge.item.image}`}`;
+};
+
 const api = axios.create({
   baseURL: API_BASE_URL,
   withCredentials: true, // Important for cookie-based sessions
@@ -33,12 +46,48 @@ export const gameApi = {
     }
   },
 
+  // Issue the next few challenges at once; with start, the first one's clock is already running
+  nextChallenges: async (count: number, start: boolean): Promise<Challenge[]> => {
+    const response = await api.post('/api/next-challenges', null, { params: { count, start } });
+    return response.data.challenges;
+  },
+
+  // Start the clock of a prefetched challenge
+  startChallenge: async (challengeId: string): Promise<Challenge> => {
+    const response = await api.post(`/api/start-challenge/${challengeId}`);
+    return response.data;
+  },
+
   // Submit a photo for the current challenge
   submitPhoto: async (challengeId: string, photoBlob: Blob): Promise<ChallengeResult> => {
     const formData = new FormData();
     formData.append('photo', photoBlob, 'photo.jpg');
     
-    const response = await api.post(`/api/submit-photo/${challengeId}`, formData, {
+    try {
+      const response = await api.post(`/api/submit-photo/${challengeId}`, formData, {
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
+      });
+      return response.data;
+    } catch (error) {
+      // Server is busy or this session is submitting too fast: show its message, keep the challenge open
+      if (axios.isAxiosError(error) && error.response?.status === 429) {
+        return {
+          status: 'failed',
+          message: error.response.data?.detail || 'Too many photos, try again in a moment!',
+          completed: false,
+        };
+      }
+      throw error;
+    }
+  },
+
+  // Sweep mode: check one photo against every open challenge in the session
+  sweepPhoto: async (photoBlob: Blob): Promise<SweepResult> => {
+    const formData = new FormData();
+    formData.append('photo', photoBlob, 'photo.jpg');
+    const response = await api.post('/api/sweep-photo', formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
       },
@@ -46,6 +95,21 @@ export const gameApi = {
     return response.data;
   },
 
+  // Live-scan mode: stream small JPEG frames with sendFrame; verdicts arrive through onEvent
+  openLiveScan: (challengeId: string, onEvent: (event: LiveScanEvent) => void) => {
+    const socket = new WebSocket(`${API_BASE_URL.replace(/^http/, 'ws')}/api/live-scan/${challengeId}`);
+    socket.onmessage = (message) => onEvent(JSON.parse(message.data));
+    return {
+      socket,
+      sendFrame: (frame: Blob) => {
+        if (socket.readyState === WebSocket.OPEN) {
+          socket.send(frame);
+        }
+      },
+      close: () => socket.close(),
+    };
+  },
+
   // Get challenge status
   getChallengeStatus: async (challengeId: string) => {
     const response = await api.get(`/api/challenge-status/${challengeId}`);
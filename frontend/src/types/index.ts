@@ -1,15 +1,26 @@
+// A pre-rendered copy of an item image (content-hashed URL, cacheable forever)
+export interface ImageVariant {
+  url: string;
+  width: number;
+  height: number;
+}
+
 export interface ChallengeItem {
   id: number;
   name: string;
   image: string;
   difficulty: 'easy' | 'medium' | 'hard';
+  image_url?: string;
+  image_variants?: { webp?: ImageVariant[]; jpeg?: ImageVariant[] };
 }
 
 export interface Challenge {
   challenge_id: string;
   item: ChallengeItem;
   time_limit: number;
-  start_time: number;
+  // null until a prefetched challenge is started
+  start_time: number | null;
+  started: boolean;
   session_id: string;
 }
 
@@ -22,6 +33,24 @@ export interface ChallengeResult {
   detected_objects?: string[];
 }
 
+// Response of /api/sweep-photo: one photo checked against every open challenge
+export interface SweepResult {
+  status: 'success' | 'failed';
+  message: string;
+  points: number;
+  credited: number;
+  results: (ChallengeResult & { challenge_id: string; item: ChallengeItem })[];
+}
+
+// Events pushed by the /api/live-scan/{challenge_id} WebSocket
+export type LiveScanEvent =
+  | { type: 'ready'; remaining_calls: number; time_remaining: number }
+  | { type: 'scan'; state: 'moving' | 'settling' | 'unchanged' | 'throttled' | 'invalid' }
+  | { type: 'analyzing' }
+  | ({ type: 'result'; remaining_calls?: number } & ChallengeResult)
+  | { type: 'busy'; message: string; retry_after: number }
+  | { type: 'limit'; message: string };
+
 export interface GameState {
   totalPoints: number;
   currentChallenge: Challenge | null;
@@ -43,4 +72,5 @@ export interface GameConfig {
 export interface SessionStats {
   total_successful_challenges: number;
   average_duration: number;
+  total_points: number;
 } 
\ No newline at end of file
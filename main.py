@@ -1,7 +1,14 @@
+import time
+
+# Startup timing (logged once the lifespan is ready; see validation/startup_benchmark.py)
+IMPORT_STARTED = time.perf_counter()
+
 import os
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
 import uvicorn
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
@@ -10,13 +17,78 @@ load_dotenv()
 
 # Import app modules
 from app.config import CONFIG
-from app.routes import router
+from app.logging_config import configure_logging
+
+# Configure logging before the other modules log at import
+configure_logging(CONFIG.get("logging", {}))
+logger = logging.getLogger("main")
+
+from app.routes import router, recognition_scheduler, challenge_store, write_behind, game_aggregates, image_variants
+from app.supabase_client import database
+from app.image_recognition import close_async_client, start_recognition_backend
+from app.preprocessing import shutdown_executor
+from app.profiling import ProfilingMiddleware, LoopStallWatchdog
+from app.metrics import register_stats
+from app.image_variants import CachedStaticFiles, project_path
+
+PROFILING_CONFIG = CONFIG.get("profiling", {})
+WATCHDOG_CONFIG = PROFILING_CONFIG.get("stall_watchdog", {})
+
+# Logs the stack of anything blocking the event loop for longer than threshold_ms
+loop_watchdog: Optional[LoopStallWatchdog] = None
+if WATCHDOG_CONFIG.get("enabled", True):
+    loop_watchdog = LoopStallWatchdog(threshold_ms=WATCHDOG_CONFIG.get("threshold_ms", 200))
+    register_stats("event_loop", loop_watchdog.stats)
+
+
+def worker_count() -> int:
+    """Worker processes, from WEB_CONCURRENCY (also read by uvicorn and gunicorn) or app.workers"""
+    return int(os.environ.get("WEB_CONCURRENCY", CONFIG["app"].get("workers", 1)))
+
+
+def check_worker_setup() -> None:
+    """Refuse several workers with the per-process challenge store (each would 404 the others' challenges)."""
+    if worker_count() > 1 and CONFIG["challenge"].get("store", {}).get("backend", "memory") == "memory":
+        raise RuntimeError("Multiple workers need challenge.store.backend: sqlite in config.yaml")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks for shared resources"""
+    lifespan_started = time.perf_counter()
+    # Checked here rather than in __main__ so it also applies under `uvicorn main:app`
+    check_worker_setup()
+    if loop_watchdog is not None:
+        await loop_watchdog.start()
+    await database.start()
+    await start_recognition_backend()
+    await recognition_scheduler.start()
+    await challenge_store.start()
+    await write_behind.start()
+    await image_variants.start()
+    logger.info("Startup complete in %.0f ms (imports %.0f ms)",
+                1000 * (time.perf_counter() - IMPORT_STARTED), 1000 * (lifespan_started - IMPORT_STARTED))
+    yield
+    await recognition_scheduler.stop()
+    await image_variants.stop()
+    # Drain buffered database writes before exiting
+    await write_behind.stop()
+    await challenge_store.stop()
+    game_aggregates.close()
+    await database.stop()
+    # Release the pooled OpenAI connections
+    await close_async_client()
+    shutdown_executor()
+    if loop_watchdog is not None:
+        await loop_watchdog.stop()
+
 
 # Create the FastAPI app
 app = FastAPI(
     title=CONFIG["app"]["title"],
     description=CONFIG["app"]["description"],
-    version=CONFIG["app"]["version"]
+    version=CONFIG["app"]["version"],
+    lifespan=lifespan
 )
 
 # Add CORS middleware to allow frontend requests
@@ -32,8 +104,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files (for challenge images)
-app.mount("/static", StaticFiles(directory=CONFIG["content"]["paths"]["static_dir"]), name="static")
+# Opt-in sampling profiler for a share of requests, or any request with the secret header
+if PROFILING_CONFIG.get("enabled", False) or os.environ.get("PROFILING_ENABLED"):
+    app.add_middleware(
+        ProfilingMiddleware,
+        sample_rate=PROFILING_CONFIG.get("sample_rate", 0.0),
+        header=PROFILING_CONFIG.get("header", "X-Profile"),
+        secret=os.environ.get("PROFILING_SECRET"),
+        interval=PROFILING_CONFIG.get("interval", 0.001),
+        output_dir=PROFILING_CONFIG.get("output_dir", ".cache/profiles"),
+        max_files=PROFILING_CONFIG.get("max_files", 200)
+    )
+
+# Mount static files (for challenge images). Variant file names change with their content, so
+# browsers and CDNs may keep them forever; the originals are only cached briefly.
+VARIANTS_CONFIG = CONFIG["content"]["variants"]
+app.mount(
+    VARIANTS_CONFIG["url_prefix"],
+    CachedStaticFiles(
+        directory=project_path(VARIANTS_CONFIG["output_dir"]),
+        check_dir=False,
+        cache_control="public, max-age=31536000, immutable"
+    ),
+    name="variants"
+)
+app.mount(
+    "/static",
+    CachedStaticFiles(
+        directory=project_path(CONFIG["content"]["paths"]["static_dir"]),
+        cache_control=f"public, max-age={VARIANTS_CONFIG['static_max_age']}"
+    ),
+    name="static"
+)
 
 # Include all routes
 app.include_router(router)
@@ -42,12 +144,20 @@ if __name__ == "__main__":
     port = int(os.environ.get("PORT", CONFIG["app"]["port"]))
     host = os.environ.get("HOST", CONFIG["app"]["host"])
     
-    print(f"Starting server on {host}:{port}")
-    print(f"Environment: {os.environ.get('RAILWAY_ENVIRONMENT', 'local')}")
+    workers = worker_count()
+    try:
+        check_worker_setup()
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    
+    logger.info("Starting server on %s:%s with %d worker(s)", host, port, workers)
+    logger.info("Environment: %s", os.environ.get('RAILWAY_ENVIRONMENT', 'local'))
     
     uvicorn.run(
         "main:app", 
         host=host, 
         port=port, 
-        reload=CONFIG["app"]["debug"]
+        workers=workers,
+        # Auto-reload only supports a single worker
+        reload=CONFIG["app"]["debug"] and workers == 1
     )
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Full-dataset evaluation of the image recognition pipeline.
+
+Every photo in validation.csv is checked against its own label (a positive
+case) and against --negatives wrong labels (negative cases), with
+--concurrency checks in flight through analyze_image_async, the same path the
+API uses (--no-batch and --no-cache turn off the micro-batcher and the result
+cache, to compare their effect on accuracy and latency). Each raw result is
+appended to a JSONL file, so the run can be re-scored later (--rescore)
+without calling the API again. The report covers accuracy, precision/recall/F1,
+per-item confusion counts, latency percentiles and a sweep of
+confidence_threshold.
+
+Which tiers answer depends on the threshold (answers near it escalate), so
+each case also records every model tier's own answer, from one individual
+request per tier, and the sweep replays the escalation at each threshold.
+--no-tier-answers skips those extra calls; the sweep then only re-applies the
+threshold to the answers given under the configured one.
+
+--backend evaluates another recognition backend than the configured one. Run
+it with "local" on players' photos (not the catalog images it matches
+against) before setting image_recognition.resilience.fallback to "local".
+
+    python validation/evaluate.py --negatives 2 --concurrency 8
+    python validation/evaluate.py --backend local
+    python validation/evaluate.py --rescore .cache/eval/results.jsonl
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+VALIDATION_DIR = Path(__file__).parent
+PROJECT_ROOT = VALIDATION_DIR.parent
+# Add the parent directory to sys.path so we can import from the app module
+sys.path.append(str(PROJECT_ROOT))
+
+
+def load_validation_rows() -> List[Dict[str, str]]:
+    """(filename, label) rows of validation.csv"""
+    rows = []
+    with open(VALIDATION_DIR / "validation.csv", 'r') as f:
+        for row in csv.DictReader(f):
+            rows.append({
+                "filename": row['filename'].strip(),
+                "label": row['name'].strip().strip('"')
+            })
+    return rows
+
+
+def build_cases(rows: List[Dict[str, str]], negatives: int, seed: int) -> List[Dict]:
+    """One positive case per photo plus `negatives` cases pairing it with other labels"""
+    rng = random.Random(seed)
+    labels = sorted({row["label"] for row in rows})
+    cases = []
+    for row in rows:
+        cases.append({"filename": row["filename"], "label": row["label"], "true_label": row["label"], "expected": True})
+        wrong_labels = [label for label in labels if label != row["label"]]
+        for label in rng.sample(wrong_labels, min(negatives, len(wrong_labels))):
+            cases.append({"filename": row["filename"], "label": label, "true_label": row["label"], "expected": False})
+    return cases
+
+
+async def record_tier_answers(image_data: bytes, label: str) -> Optional[List[Dict]]:
+    """Each model tier's answer for the case, in tier order (None if a call failed)"""
+    from app import image_recognition
+
+    prepared = await image_recognition.preprocess_image_async(image_data, image_recognition.PREPROCESS_CONFIG)
+    answers = []
+    for tier in image_recognition.MODEL_TIERS:
+        try:
+            answer = await image_recognition.request_single(tier, prepared.data, label)
+        except Exception:
+            return None
+        answers.append({key: answer.get(key) for key in ("is_match", "confidence", "parse_failed")})
+    return answers
+
+
+async def run_cases(cases: List[Dict], concurrency: int, results_path: Path, backend: Optional[str] = None,
+                    batching: bool = True, cache: bool = True, tier_answers: bool = True) -> List[Dict]:
+    """
+    Analyze every case, at most `concurrency` at once, appending raw results to
+    results_path. backend replaces the configured recognition backend; batching
+    and cache switch the micro-batcher and the result cache off for the run.
+    """
+    from app import image_recognition
+    from app.image_recognition import (
+        analyze_image_async, start_recognition_backend, close_async_client, IMGREC_CONFIG
+    )
+    from app.preprocessing import shutdown_executor
+
+    if backend is not None:
+        image_recognition.recognition_backend = image_recognition.create_recognition_backend(backend)
+    if not batching:
+        image_recognition.BATCH_CONFIG['enabled'] = False
+    if not cache:
+        image_recognition.recognition_cache = None
+    # Only the OpenAI backend escalates between model tiers
+    tier_answers = tier_answers and image_recognition.recognition_backend.name == "openai"
+    await start_recognition_backend()
+    semaphore = asyncio.Semaphore(concurrency)
+    threshold = IMGREC_CONFIG.get('confidence_threshold', 0.7)
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    results = []
+    completed = 0
+
+    async def run_case(case: Dict) -> None:
+        nonlocal completed
+        image_path = VALIDATION_DIR / case["filename"]
+        async with semaphore:
+            record = {**case, "threshold": threshold}
+            if not image_path.exists():
+                record["error"] = "missing image file"
+            else:
+                image_data = image_path.read_bytes()
+                started = time.perf_counter()
+                result = await analyze_image_async(image_data, case["label"], confidence_threshold=threshold)
+                record["latency_seconds"] = time.perf_counter() - started
+                debug = result.get("debug_info", {})
+                record["result"] = result
+                record["error"] = debug.get("error")
+                record["rejected"] = debug.get("rejected")
+                # Quality-gate rejections are "no" verdicts, exactly as players see them
+                record["api_is_match"] = debug.get("api_is_match", False)
+                record["confidence"] = result["confidence"]
+                record["is_match"] = result["is_match"]
+                if tier_answers and not record["error"] and not record["rejected"]:
+                    record["tiers"] = await record_tier_answers(image_data, case["label"])
+        results.append(record)
+        with open(results_path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+        completed += 1
+        if completed % 10 == 0 or completed == len(cases):
+            print(f"   {completed}/{len(cases)} checked")
+
+    try:
+        await asyncio.gather(*(run_case(case) for case in cases))
+    finally:
+        await close_async_client()
+        shutdown_executor()
+    return results
+
+
+def load_results(path: Path) -> List[Dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def predict(record: Dict, threshold: float) -> bool:
+    """The app's verdict for a stored result, as it was served (see build_match_result)"""
+    return bool(record.get("api_is_match")) and record.get("confidence", 0.0) > threshold
+
+
+def predict_at(record: Dict, threshold: float) -> bool:
+    """
+    The app's verdict for a case at another threshold: the escalation is replayed
+    over the recorded tier answers (see request_analysis), or without them the
+    threshold is applied to the answer served under the configured one.
+    """
+    tiers = record.get("tiers")
+    if not tiers:
+        return predict(record, threshold)
+    from app.image_recognition import needs_escalation
+
+    for index, answer in enumerate(tiers):
+        if index == len(tiers) - 1 or not needs_escalation(answer, threshold):
+            return bool(answer.get("is_match")) and (answer.get("confidence") or 0.0) > threshold
+    return False
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def score(records: List[Dict], threshold: float, replay: bool = False) -> Dict:
+    """Confusion counts and derived metrics at one threshold (replay: see predict_at)"""
+    tp = fp = tn = fn = 0
+    for record in records:
+        predicted = predict_at(record, threshold) if replay else predict(record, threshold)
+        if record["expected"]:
+            tp += predicted
+            fn += not predicted
+        else:
+            fp += predicted
+            tn += not predicted
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "threshold": threshold,
+        "tp": tp, "fp": fp, "tn": tn, "fn": fn,
+        "accuracy": (tp + tn) / len(records) if records else 0.0,
+        "precision": precision,
+        "recall": recall,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    }
+
+
+def per_item_confusion(records: List[Dict], threshold: float) -> Dict[str, Dict[str, int]]:
+    """
+    Per label: tp/fn from photos of the item, fp/tn from other photos checked
+    against the item's label (how easily the label is falsely accepted).
+    """
+    items: Dict[str, Dict[str, int]] = {}
+    for record in records:
+        counts = items.setdefault(record["label"], {"tp": 0, "fn": 0, "fp": 0, "tn": 0})
+        predicted = predict(record, threshold)
+        if record["expected"]:
+            counts["tp" if predicted else "fn"] += 1
+        else:
+            counts["fp" if predicted else "tn"] += 1
+    return dict(sorted(items.items()))
+
+
+def build_report(records: List[Dict], threshold: float, sweep_step: float) -> Dict:
+    scored = [record for record in records if not record.get("error")]
+    latencies = sorted(record["latency_seconds"] for record in records if "latency_seconds" in record)
+    steps = int(round(1 / sweep_step))
+    sweep = [score(scored, round(i * sweep_step, 4), replay=True) for i in range(1, steps)]
+    best = max(sweep, key=lambda entry: entry["f1"]) if sweep else None
+    return {
+        "cases": len(records),
+        "scored": len(scored),
+        "errors": len(records) - len(scored),
+        "quality_gate_rejections": sum(1 for record in scored if record.get("rejected")),
+        "metrics": score(scored, threshold),
+        "per_item": per_item_confusion(scored, threshold),
+        "latency_seconds": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None
+        },
+        "threshold_sweep": sweep,
+        "best_threshold_by_f1": best["threshold"] if best else None
+    }
+
+
+def print_report(report: Dict) -> None:
+    metrics = report["metrics"]
+    print(f"\n📊 Evaluation: {report['scored']} scored cases ({report['errors']} errors, "
+          f"{report['quality_gate_rejections']} quality-gate rejections)")
+    print(f"   Threshold {metrics['threshold']}: accuracy {metrics['accuracy']:.1%}, precision "
+          f"{metrics['precision']:.1%}, recall {metrics['recall']:.1%}, F1 {metrics['f1']:.3f}")
+    latency = report["latency_seconds"]
+    if latency["p50"] is not None:
+        print(f"   Latency: p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s, p99 {latency['p99']:.2f}s")
+    print(f"\n{'item':22} {'tp':>4} {'fn':>4} {'fp':>4} {'tn':>4}")
+    for item, counts in report["per_item"].items():
+        print(f"{item:22} {counts['tp']:>4} {counts['fn']:>4} {counts['fp']:>4} {counts['tn']:>4}")
+    print(f"\n{'threshold':>9} {'accuracy':>9} {'precision':>9} {'recall':>9} {'f1':>6}")
+    for entry in report["threshold_sweep"]:
+        print(f"{entry['threshold']:>9.2f} {entry['accuracy']:>9.1%} {entry['precision']:>9.1%} "
+              f"{entry['recall']:>9.1%} {entry['f1']:>6.3f}")
+    print(f"\n🎯 Best threshold by F1: {report['best_threshold_by_f1']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate image recognition on the whole validation set")
+    parser.add_argument("--negatives", type=int, default=2, help="Wrong labels checked per photo")
+    parser.add_argument("--concurrency", type=int, default=8, help="Checks in flight at once")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for choosing negative labels")
+    parser.add_argument("--results", default=str(PROJECT_ROOT / ".cache" / "eval" / "results.jsonl"),
+                        help="JSONL file the raw results are appended to")
+    parser.add_argument("--backend", choices=["openai", "local", "cascade"],
+                        help="Recognition backend to evaluate (default: image_recognition.backend)")
+    parser.add_argument("--no-batch", action="store_true", help="Send every check on its own (no micro-batcher)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the recognition result cache")
+    parser.add_argument("--no-tier-answers", action="store_true",
+                        help="Skip recording each tier's answer (the sweep then does not replay escalation)")
+    parser.add_argument("--rescore", help="Score an existing results file instead of calling the API")
+    parser.add_argument("--threshold", type=float, help="Threshold to report (default: confidence_threshold)")
+    parser.add_argument("--sweep-step", type=float, default=0.05, help="Threshold sweep step")
+    parser.add_argument("--report", default=str(PROJECT_ROOT / ".cache" / "eval" / "report.json"),
+                        help="Where to write the JSON report")
+
+    args = parser.parse_args()
+
+    if args.rescore:
+        records = load_results(Path(args.rescore))
+        print(f"♻️  Re-scoring {len(records)} stored results from {args.rescore}")
+    else:
+        cases = build_cases(load_validation_rows(), args.negatives, args.seed)
+        results_path = Path(args.results)
+        if results_path.exists():
+            # A fresh run should not mix with the results of an earlier one
+            results_path.unlink()
+        print(f"🧪 Evaluating {len(cases)} cases with concurrency {args.concurrency}")
+        records = asyncio.run(run_cases(cases, args.concurrency, results_path, args.backend,
+                                         batching=not args.no_batch, cache=not args.no_cache,
+                                         tier_answers=not args.no_tier_answers))
+        print(f"💾 Raw results saved to {results_path}")
+
+    threshold = args.threshold
+    if threshold is None:
+        threshold = records[0].get("threshold", 0.7) if records else 0.7
+    report = build_report(records, threshold, args.sweep_step)
+    print_report(report)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {args.report}")
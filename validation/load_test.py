@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Load test for the House Hunt Challenge API.
+
+Runs concurrent virtual players through realistic game sessions: start a
+challenge, submit photos (the right item most of the time, a wrong one
+otherwise) until it is found or the attempts run out, check the stats, and
+repeat. Writes a JSON report with throughput and p50/p95/p99 latency per
+endpoint, and optionally compares it against a stored baseline, exiting
+non-zero on a regression.
+
+Every submitted photo is a random crop/rotation/exposure variant of a catalog
+image, so its perceptual hash differs and the recognition cache does not
+answer it (the report includes the cache hit rate the run saw). Pass
+--repeat-photos to submit the catalog images unchanged and measure the
+cached path instead.
+
+Against a running server:
+    python validation/load_test.py --url http://localhost:8000 --users 20 --duration 60
+
+In-process, with the offline stand-ins so no API credits are spent:
+    VISION_BACKEND=replay DATABASE_BACKEND=memory python validation/load_test.py --users 20
+
+Record a baseline on a known-good build, then gate later runs against it:
+    python validation/load_test.py ... --save-baseline validation/load_baseline.json
+    python validation/load_test.py ... --baseline validation/load_baseline.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import yaml
+from PIL import Image, ImageEnhance, ImageOps
+
+PROJECT_ROOT = Path(__file__).parent.parent
+# Add the parent directory to sys.path so we can import the app for in-process runs
+sys.path.append(str(PROJECT_ROOT))
+
+
+def load_sample_images() -> Dict[str, bytes]:
+    """JPEG bytes of each challenge item's reference photo, by item name"""
+    with open(PROJECT_ROOT / "config.yaml") as f:
+        config = yaml.safe_load(f)
+    images_dir = PROJECT_ROOT / config["content"]["paths"]["images_dir"]
+    images = {}
+    for item in config["content"]["items"]:
+        path = images_dir / item["image"]
+        if path.exists():
+            images[item["name"]] = path.read_bytes()
+    if not images:
+        raise FileNotFoundError(f"No sample images found in {images_dir}")
+    return images
+
+
+def perturb_photo(photo: bytes, rng: random.Random) -> bytes:
+    """
+    A new photo of the same item: randomly rotated, cropped, mirrored and exposed,
+    then re-encoded, so its perceptual hash misses the recognition cache.
+    """
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(photo))).convert("RGB")
+    image = image.rotate(rng.uniform(-20, 20), resample=Image.Resampling.BILINEAR)
+    width, height = image.size
+    crop_width, crop_height = int(width * rng.uniform(0.55, 0.85)), int(height * rng.uniform(0.55, 0.85))
+    left, top = rng.randint(0, width - crop_width), rng.randint(0, height - crop_height)
+    image = image.crop((left, top, left + crop_width, top + crop_height))
+    if rng.random() < 0.5:
+        image = ImageOps.mirror(image)
+    image = ImageEnhance.Brightness(image).enhance(rng.uniform(0.8, 1.2))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=rng.randint(70, 90))
+    return output.getvalue()
+
+
+def cache_counters(recognition_stats: Optional[Dict]) -> Dict[str, int]:
+    """Lookups and hits of the recognition cache from /api/recognition-stats (zeros if it is disabled)"""
+    cache = (recognition_stats or {}).get("cache") or {}
+    hits = cache.get("hits", 0) + cache.get("near_hits", 0) + cache.get("coalesced", 0)
+    return {"lookups": hits + cache.get("misses", 0), "hits": hits}
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    """Latencies and status codes per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.sessions = 0
+        self.challenges = 0
+        self.found = 0
+
+    def record(self, endpoint: str, seconds: float, status: int) -> None:
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        counts = self.statuses.setdefault(endpoint, {})
+        counts[str(status)] = counts.get(str(status), 0) + 1
+
+    def report(self, elapsed: float, settings: Dict, cache: Dict[str, int]) -> Dict:
+        endpoints = {}
+        for endpoint, values in self.latencies.items():
+            values = sorted(values)
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items() if status == "0" or status.startswith("5"))
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "throughput_rps": len(values) / elapsed,
+                "error_rate": errors / len(values),
+                "rejected_rate": statuses.get("429", 0) / len(values),
+                "statuses": statuses,
+                "mean_ms": 1000 * sum(values) / len(values),
+                "p50_ms": 1000 * percentile(values, 50),
+                "p95_ms": 1000 * percentile(values, 95),
+                "p99_ms": 1000 * percentile(values, 99),
+                "max_ms": 1000 * values[-1]
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            "settings": settings,
+            "elapsed_seconds": elapsed,
+            "requests": total,
+            "throughput_rps": total / elapsed,
+            "sessions": self.sessions,
+            "challenges": self.challenges,
+            "challenges_found": self.found,
+            "recognition_cache": {**cache, "hit_rate": cache["hits"] / cache["lookups"] if cache["lookups"] else 0.0},
+            "endpoints": endpoints
+        }
+
+
+async def timed(recorder: Recorder, endpoint: str, send) -> Optional[httpx.Response]:
+    """Send a request, recording its latency under endpoint; None on a transport error"""
+    started = time.perf_counter()
+    try:
+        response = await send()
+    except httpx.HTTPError:
+        recorder.record(endpoint, time.perf_counter() - started, 0)
+        return None
+    recorder.record(endpoint, time.perf_counter() - started, response.status_code)
+    return response
+
+
+async def play_session(client: httpx.AsyncClient, recorder: Recorder, images: Dict[str, bytes],
+                       args: argparse.Namespace, rng: random.Random) -> None:
+    """One player session: a few challenges with up to max_attempts photos each"""
+    # A fresh cookie jar makes the server start a new session
+    client.cookies.clear()
+    recorder.sessions += 1
+    session_id = None
+    for _ in range(args.challenges):
+        response = await timed(recorder, "POST /api/new-challenge", lambda: client.post("/api/new-challenge"))
+        if response is None or response.status_code != 200:
+            return
+        challenge = response.json()
+        session_id = challenge["session_id"]
+        recorder.challenges += 1
+        for _ in range(args.max_attempts):
+            await asyncio.sleep(rng.expovariate(1 / args.think_time) if args.think_time > 0 else 0)
+            if rng.random() < args.match_probability and challenge["item"]["name"] in images:
+                photo = images[challenge["item"]["name"]]
+            else:
+                photo = images[rng.choice(list(images))]
+            if not args.repeat_photos:
+                photo = await asyncio.to_thread(perturb_photo, photo, random.Random(rng.random()))
+            response = await timed(
+                recorder, "POST /api/submit-photo/{id}",
+                lambda: client.post(f"/api/submit-photo/{challenge['challenge_id']}",
+                                    files={"photo": ("photo.jpg", photo, "image/jpeg")})
+            )
+            if response is None:
+                break
+            if response.status_code == 429:
+                # Back off as the server asks
+                await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+                continue
+            result = response.json()
+            if result.get("completed"):
+                recorder.found += result.get("status") == "success"
+                break
+    if session_id is not None:
+        await timed(recorder, "GET /api/session-stats/{id}", lambda: client.get(f"/api/session-stats/{session_id}"))
+    await timed(recorder, "GET /api/stats", lambda: client.get("/api/stats"))
+
+
+async def virtual_user(index: int, make_client, recorder: Recorder, images: Dict[str, bytes],
+                       args: argparse.Namespace, deadline: float) -> None:
+    rng = random.Random(args.seed + index if args.seed is not None else None)
+    # Stagger start-up so sessions do not arrive in lockstep
+    await asyncio.sleep(rng.uniform(0, args.ramp_up))
+    async with make_client() as client:
+        sessions = 0
+        while time.monotonic() < deadline and (not args.sessions or sessions < args.sessions):
+            await play_session(client, recorder, images, args, rng)
+            sessions += 1
+
+
+async def run_load_test(args: argparse.Namespace) -> Dict:
+    images = load_sample_images()
+    recorder = Recorder()
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.url:
+        limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+        make_client = lambda: httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits)
+        lifespan = None
+    else:
+        from main import app
+        transport = httpx.ASGITransport(app=app)
+        make_client = lambda: httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout)
+        # ASGITransport does not run the lifespan, so start/stop the app's resources here
+        lifespan = app.router.lifespan_context(app)
+
+    async def recognition_stats() -> Optional[Dict]:
+        async with make_client() as client:
+            response = await client.get("/api/recognition-stats")
+        return response.json() if response.status_code == 200 else None
+
+    if lifespan is not None:
+        await lifespan.__aenter__()
+    try:
+        cache_before = cache_counters(await recognition_stats())
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            virtual_user(index, make_client, recorder, images, args, deadline) for index in range(args.users)
+        ))
+        elapsed = time.monotonic() - started
+        cache_after = cache_counters(await recognition_stats())
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+    settings = {key: value for key, value in vars(args).items() if key not in ("baseline", "save_baseline", "output")}
+    settings["target"] = args.url or "in-process"
+    settings["vision_backend"] = os.getenv("VISION_BACKEND")
+    settings["database_backend"] = os.getenv("DATABASE_BACKEND")
+    cache = {key: cache_after[key] - cache_before[key] for key in cache_after}
+    return recorder.report(elapsed, settings, cache)
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float, error_tolerance: float,
+                        min_delta_ms: float) -> List[str]:
+    """
+    Regressions of report against baseline: an endpoint's p50/p95/p99 more than
+    `tolerance` (relative) and min_delta_ms (absolute, to ignore noise on fast
+    endpoints) slower, overall throughput more than `tolerance` lower, or an
+    error rate more than `error_tolerance` (absolute) higher. Runs whose
+    recognition cache hit rates differ by more than `tolerance` measure
+    different paths and are reported as not comparable.
+    """
+    regressions = []
+    base_cache = baseline.get("recognition_cache")
+    hit_rate = report["recognition_cache"]["hit_rate"]
+    if base_cache is None or abs(hit_rate - base_cache["hit_rate"]) > tolerance:
+        base_rate = f"{base_cache['hit_rate']:.1%}" if base_cache is not None else "not recorded"
+        regressions.append(f"recognition cache hit rate {hit_rate:.1%} vs baseline {base_rate}: "
+                           f"not comparable, re-record the baseline")
+    for endpoint, base in baseline["endpoints"].items():
+        current = report["endpoints"].get(endpoint)
+        if current is None:
+            regressions.append(f"{endpoint}: no requests in this run")
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if current[key] > max(base[key] * (1 + tolerance), base[key] + min_delta_ms):
+                regressions.append(f"{endpoint}: {key} {current[key]:.1f} > baseline {base[key]:.1f} (+{tolerance:.0%})")
+        if current["error_rate"] > base["error_rate"] + error_tolerance:
+            regressions.append(f"{endpoint}: error rate {current['error_rate']:.2%} > baseline {base['error_rate']:.2%}")
+    if report["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(
+            f"throughput {report['throughput_rps']:.1f} rps < baseline {baseline['throughput_rps']:.1f} rps (-{tolerance:.0%})"
+        )
+    return regressions
+
+
+def print_summary(report: Dict) -> None:
+    print(f"\n📊 {report['requests']} requests in {report['elapsed_seconds']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s), {report['sessions']} sessions, "
+          f"{report['challenges_found']}/{report['challenges']} challenges found, "
+          f"recognition cache hit rate {report['recognition_cache']['hit_rate']:.1%} "
+          f"({report['recognition_cache']['hits']}/{report['recognition_cache']['lookups']})")
+    print(f"{'endpoint':34} {'reqs':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'err':>6} {'429':>6}")
+    for endpoint, stats in sorted(report["endpoints"].items()):
+        print(f"{endpoint:34} {stats['requests']:>6} {stats['throughput_rps']:>7.1f} {stats['p50_ms']:>8.1f} "
+              f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f} {stats['error_rate']:>6.1%} {stats['rejected_rate']:>6.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the House Hunt Challenge API")
+    parser.add_argument("--url", help="Base URL of a running server (default: run the app in-process)")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual players")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to keep starting sessions")
+    parser.add_argument("--sessions", type=int, default=0, help="Sessions per player (0: until --duration)")
+    parser.add_argument("--challenges", type=int, default=3, help="Challenges per session")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Photos per challenge before moving on")
+    parser.add_argument("--match-probability", type=float, default=0.7, help="Chance a photo shows the right item")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean seconds between a player's photos")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Players start within this many seconds")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--repeat-photos", action="store_true",
+                        help="Submit the catalog images unchanged (mostly recognition cache hits)")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible sessions")
+    parser.add_argument("--output", default=str(PROJECT_ROOT / ".cache" / "load_report.json"), help="Report path")
+    parser.add_argument("--baseline", help="Fail (exit 1) if the report regresses against this baseline report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative latency/throughput regression")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Latency increases below this are noise")
+    parser.add_argument("--error-tolerance", type=float, default=0.01, help="Allowed absolute error rate increase")
+    parser.add_argument("--save-baseline", help="Also write the report here as the new baseline")
+
+    args = parser.parse_args()
+
+    print(f"🚦 Load testing {args.url or 'the app in-process'} with {args.users} players for {args.duration:.0f}s")
+    report = asyncio.run(run_load_test(args))
+    print_summary(report)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📝 Report written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance, args.error_tolerance,
+                                          args.min_delta_ms)
+        if regressions:
+            print("\n❌ Performance regressions against the baseline:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions against the baseline")
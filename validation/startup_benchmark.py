@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the House Hunt Challenge API.
+
+Measures, in fresh interpreter processes, how long `import main` takes, how
+long until the app lifespan is ready, and how long until the first /health
+response, and breaks import time down by top-level package (python -X
+importtime) so a newly added eager import shows up by name. Writes a JSON
+report and optionally compares it against a stored baseline, exiting non-zero
+on a regression, like load_test.py.
+
+Runs with the offline stand-ins, so no credentials or network are needed:
+    python validation/startup_benchmark.py --runs 5
+    python validation/startup_benchmark.py --save-baseline validation/startup_baseline.json
+    python validation/startup_benchmark.py --baseline validation/startup_baseline.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+OFFLINE_ENV = {"VISION_BACKEND": "replay", "DATABASE_BACKEND": "memory", "LOG_LEVEL": "WARNING"}
+
+# Runs in the child process: import the app, run its lifespan and send one request
+READY_SCRIPT = """
+import time, json, asyncio
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def first_request():
+    import httpx
+    async with main.app.router.lifespan_context(main.app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/health")
+        served = time.perf_counter()
+    return ready, served, response.status_code
+
+ready, served, status = asyncio.run(first_request())
+print(json.dumps({"import_ms": 1000 * (imported - started), "ready_ms": 1000 * (ready - started),
+                  "first_response_ms": 1000 * (served - started), "status": status}))
+"""
+
+
+def child_env() -> Dict[str, str]:
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("SUPABASE_URL", "SUPABASE_ANON_KEY", "OPENAI_API_KEY")}
+    env.update(OFFLINE_ENV)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")]))
+    return env
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for each line of -X importtime output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def measure_imports() -> Dict:
+    """Import-time breakdown of `import main` in a fresh interpreter"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=PROJECT_ROOT,
+                            env=child_env(), capture_output=True, text=True, check=True)
+    modules = parse_importtime(result.stderr)
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in modules:
+        by_package[name.split(".")[0]] += self_us
+    return {
+        "total_ms": sum(self_us for _, self_us, _ in modules) / 1000,
+        "packages": {name: us / 1000 for name, us in by_package.items()},
+        "modules": {name: self_us / 1000 for name, self_us, _ in modules},
+    }
+
+
+def measure_ready() -> Dict:
+    """Time to import, lifespan ready and first /health response in a fresh interpreter"""
+    result = subprocess.run([sys.executable, "-c", READY_SCRIPT], cwd=PROJECT_ROOT, env=child_env(),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(runs: int, top: int) -> Dict:
+    import_runs = [measure_imports() for _ in range(runs)]
+    ready_runs = [measure_ready() for _ in range(runs)]
+    statuses = {run["status"] for run in ready_runs}
+
+    def median_of(runs_: List[Dict], key: str) -> Dict[str, float]:
+        names = set().union(*(run[key] for run in runs_))
+        return {name: statistics.median(run[key].get(name, 0.0) for run in runs_) for name in names}
+
+    packages = median_of(import_runs, "packages")
+    modules = median_of(import_runs, "modules")
+    return {
+        "runs": runs,
+        "python": sys.version.split()[0],
+        "import_ms": statistics.median(run["import_ms"] for run in ready_runs),
+        "ready_ms": statistics.median(run["ready_ms"] for run in ready_runs),
+        "first_response_ms": statistics.median(run["first_response_ms"] for run in ready_runs),
+        "health_status": sorted(statuses),
+        "importtime_total_ms": statistics.median(run["total_ms"] for run in import_runs),
+        "packages_ms": dict(sorted(packages.items(), key=lambda item: -item[1])[:top]),
+        "slowest_modules_ms": dict(sorted(modules.items(), key=lambda item: -item[1])[:top]),
+    }
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """
+    Regressions of report against baseline: import, ready or first-response
+    time more than `tolerance` (relative) and min_delta_ms (absolute) slower,
+    and packages that became slow to import (new eager heavy imports).
+    """
+    def slower(current: float, base: float) -> bool:
+        return current > max(base * (1 + tolerance), base + min_delta_ms)
+
+    regressions = []
+    for key in ("import_ms", "ready_ms", "first_response_ms"):
+        if slower(report[key], baseline[key]):
+            regressions.append(f"{key} {report[key]:.0f} > baseline {baseline[key]:.0f} (+{tolerance:.0%})")
+    for package, ms in report["packages_ms"].items():
+        if slower(ms, baseline["packages_ms"].get(package, 0.0)):
+            regressions.append(f"import of {package}: {ms:.0f} ms > baseline "
+                               f"{baseline['packages_ms'].get(package, 0.0):.0f} ms")
+    if report["health_status"] != [200]:
+        regressions.append(f"/health answered {report['health_status']}")
+    return regressions
+
+
+def print_summary(report: Dict) -> None:
+    print(f"\n⏱️  import {report['import_ms']:.0f} ms, lifespan ready {report['ready_ms']:.0f} ms, "
+          f"first /health response {report['first_response_ms']:.0f} ms (median of {report['runs']} runs)")
+    print(f"\n{'package':32} {'import ms':>10}")
+    for package, ms in report["packages_ms"].items():
+        print(f"{package:32} {ms:>10.1f}")
+    print(f"\n{'module (self time)':50} {'ms':>8}")
+    for module, ms in report["slowest_modules_ms"].items():
+        print(f"{module:50} {ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the House Hunt Challenge API startup")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per measurement (median reported)")
+    parser.add_argument("--top", type=int, default=15, help="Packages/modules listed in the breakdown")
+    parser.add_argument("--output", default=str(PROJECT_ROOT / ".cache" / "startup_report.json"), help="Report path")
+    parser.add_argument("--baseline", help="Fail (exit 1) if the report regresses against this baseline report")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=50.0, help="Slowdowns below this are noise")
+    parser.add_argument("--save-baseline", help="Also write the report here as the new baseline")
+
+    args = parser.parse_args()
+
+    print(f"🚀 Measuring startup over {args.runs} fresh processes")
+    report = run_benchmark(args.runs, args.top)
+    print_summary(report)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📝 Report written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\n❌ Startup regressions against the baseline:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions against the baseline")